@@ -0,0 +1,109 @@
+#!./.venv/bin/python3
+"""bench_clangd_rules.py
+Time the .clangd rule regexes before and after regex_trie factoring.
+
+Both rule lists come from classifier.build_rules() over scopes.json
+(optimize=False / True) and are checked to accept the same identifiers first
+(generate_clangd_config.verify_rules()). The identifiers are those in the
+code of a generated corpus (generate_corpus.py, comments and string literals
+removed), each occurrence counted, as clangd evaluates the rules per token.
+
+Each identifier is searched with the rules in order until one matches, like
+clangd does with llvm::Regex; the time is measured per rule on the
+identifiers that reach it, best of --repeat runs (the two lists take
+turns). The script prints the
+total and per-identifier time of both lists and the rules with the largest
+change.
+
+Usage: python3 benchmarks/bench_clangd_rules.py [--lines 20000] [--corpus FILE] [--repeat 5]
+"""
+from __future__ import annotations
+
+import argparse
+import gc
+import json
+import pathlib
+import re
+import sys
+import time
+from typing import List, Optional, Sequence, Tuple
+
+REPO_ROOT = pathlib.Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(REPO_ROOT / "scripts"))
+
+from classifier import build_rules  # noqa: E402
+from generate_clangd_config import verify_rules  # noqa: E402
+from generate_corpus import IDENT_RE, CorpusGenerator  # noqa: E402
+
+# Comments and string literals, which clangd does not highlight as identifiers.
+INERT_RE = re.compile(r'//[^\n]*|/\*.*?\*/|"(?:[^"\\\n]|\\.)*"', re.S)
+TOP_RULES = 8
+
+
+def corpus_source(corpus: Optional[pathlib.Path], lines: int) -> str:
+    if corpus is not None:
+        return corpus.read_text(encoding="utf-8")
+    generator = CorpusGenerator.load(1, REPO_ROOT)
+    return "\n".join(generator.build(lines, 1 << 62).lines) + "\n"
+
+
+def _time_pass(compiled: Sequence["re.Pattern[str]"], identifiers: List[str], best: List[float]) -> None:
+    remaining = identifiers
+    for index, pattern in enumerate(compiled):
+        search = pattern.search
+        start = time.perf_counter()
+        misses = [name for name in remaining if search(name) is None]
+        best[index] = min(best[index], time.perf_counter() - start)
+        remaining = misses
+
+
+def time_rules(rule_lists: Sequence[Sequence[Tuple[str, str]]], identifiers: List[str], repeat: int) -> List[List[float]]:
+    """Seconds spent in each rule of each list, best of ``repeat`` first-match passes.
+
+    The lists take turns in every repeat, so drift in machine speed affects
+    them alike.
+    """
+    compiled = [[re.compile(regex) for regex, _ in rules] for rules in rule_lists]
+    best = [[float("inf")] * len(rules) for rules in rule_lists]
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            for patterns, times in zip(compiled, best):
+                _time_pass(patterns, identifiers, times)
+    finally:
+        gc.enable()
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Time the .clangd rules before and after regex factoring.")
+    parser.add_argument("--lines", type=int, default=20_000, help="lines of generated corpus (default: 20000)")
+    parser.add_argument("--corpus", type=pathlib.Path, help="C++ file to take identifiers from instead")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per rule list (default: 5)")
+    args = parser.parse_args()
+
+    scopes = json.loads((REPO_ROOT / "scopes.json").read_text(encoding="utf-8"))
+    keywords, prefixes = scopes["keywords"], scopes["prefixes"]
+    original = build_rules(keywords, prefixes, optimize=False)
+    optimized = build_rules(keywords, prefixes)
+    samples = verify_rules(original, optimized, keywords, prefixes)
+    print(f"{len(original)} rules, identical on {samples} samples")
+
+    identifiers = IDENT_RE.findall(INERT_RE.sub(" ", corpus_source(args.corpus, args.lines)))
+    print(f"{len(identifiers)} identifiers ({len(set(identifiers))} distinct)\n")
+
+    before, after = time_rules((original, optimized), identifiers, args.repeat)
+    for label, rules, times in (("flat", original, before), ("factored", optimized, after)):
+        total = sum(times)
+        size = sum(len(regex) for regex, _ in rules)
+        print(f"  {label:<9} {size:6} regex chars  {total * 1e3:8.1f} ms  {total / len(identifiers) * 1e9:7.0f} ns/identifier")
+    print(f"  change    {(sum(after) / sum(before) - 1) * 100:+.1f} %\n")
+
+    print("Largest changes per rule:")
+    changes = sorted(range(len(original)), key=lambda i: -abs(before[i] - after[i]))
+    for i in changes[:TOP_RULES]:
+        print(f"  {original[i][1]:<48} {before[i] * 1e3:7.2f} ms -> {after[i] * 1e3:7.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+#!./.venv/bin/python3
+"""bench_lexer.py
+Check that Highlighterr extraction stays linear on pathological input.
+
+Each case builds an adversarial HighlighterrCxx.cpp at 256 KiB, 512 KiB and
+1 MiB and times highlighterr_extract.scan_cpp() on it. For comparison the
+line-based regex that extract_keywords.py used before the lexer
+(LEGACY_IGNORE_RE, a chain of lazy [^\\n]*? quantifiers) is timed on inputs
+of a few KiB only: it is roughly cubic on these cases.
+
+A case fails if doubling the input more than triples the time (--max-ratio),
+and the script then exits with status 1.
+
+Usage: python3 benchmarks/bench_lexer.py [--max-ratio 3.0]
+"""
+from __future__ import annotations
+
+import argparse
+import pathlib
+import re
+import sys
+import time
+from typing import Callable, Dict, List
+
+REPO_ROOT = pathlib.Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(REPO_ROOT / "scripts"))
+
+from highlighterr_extract import scan_cpp  # noqa: E402
+
+# The pre-lexer pattern for "{ ... EClassification::X ... } ... ignore(kw)",
+# applied with search() to every line.
+LEGACY_IGNORE_RE = re.compile(
+    rb"\{[^\n]*?EClassification::(EClassification_[A-Za-z0-9_]+)[^\n]*?\}[^\n]*?ignore\(\s*([A-Za-z0-9_]+)\s*\)")
+
+SIZES = (256 * 1024, 512 * 1024, 1024 * 1024)
+LEGACY_SIZES = (1024, 2048, 4096)
+
+
+def _repeat(unit: bytes, size: int) -> bytes:
+    return unit * (size // len(unit))
+
+
+# Adversarial inputs by name; each builder returns about ``size`` bytes.
+CASES: Dict[str, Callable[[int], bytes]] = {
+    # One long line of brace entries without a trailing ignore(): every "{"
+    # makes the legacy pattern scan to the end of the line.
+    "long line of entries": lambda size: _repeat(b"{ EClassification::EClassification_Type } ", size),
+    # Unterminated string and comment openers.
+    "unterminated strings": lambda size: _repeat(b'{ "', size),
+    "unterminated comments": lambda size: _repeat(b"/* { ", size),
+    # Almost-matching keyword registrations.
+    "truncated registrations": lambda size: _repeat(b'f_AddDefaultKeyword("kw", EClassification::', size),
+    # Deeply nested disabled regions.
+    "nested #if 0": lambda size: _repeat(b"#if 0\n{\n", size // 2) + _repeat(b"#endif\n", size // 2),
+}
+
+
+def _time(func: Callable[[], object]) -> float:
+    best = float("inf")
+    for _ in range(3):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _legacy_scan(source: bytes) -> None:
+    for line in source.split(b"\n"):
+        LEGACY_IGNORE_RE.search(line)
+
+
+def _report(label: str, sizes, timings: List[float]) -> float:
+    ratios = [b / a if a else 0.0 for a, b in zip(timings, timings[1:])]
+    cells = "  ".join(f"{size // 1024:>5} KiB {t * 1000:9.1f} ms" for size, t in zip(sizes, timings))
+    print(f"  {label:<8} {cells}  ×{max(ratios):.1f} per doubling")
+    return max(ratios)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Time Highlighterr extraction on pathological input.")
+    parser.add_argument(
+        "--max-ratio", type=float, default=3.0,
+        help="largest allowed slowdown when the input doubles (default: 3.0)",
+    )
+    parser.add_argument("--skip-legacy", action="store_true", help="do not time the legacy regex")
+    args = parser.parse_args()
+
+    failed = []
+    for name, build in CASES.items():
+        print(f"\n==> {name}")
+        ratio = _report("lexer", SIZES, [_time(lambda s=build(size): scan_cpp(s)) for size in SIZES])
+        if ratio > args.max_ratio:
+            failed.append(name)
+        if not args.skip_legacy:
+            _report("legacy", LEGACY_SIZES, [_time(lambda s=build(size): _legacy_scan(s)) for size in LEGACY_SIZES])
+
+    if failed:
+        print(f"\nNot linear: {', '.join(failed)}")
+        sys.exit(1)
+    print("\nExtraction time grows linearly in every case.")
+
+
+if __name__ == "__main__":
+    main()
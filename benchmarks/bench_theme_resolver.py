@@ -0,0 +1,76 @@
+#!./.venv/bin/python3
+"""bench_theme_resolver.py
+Time theme resolution with theme_resolver.py: building the theme trie from
+tokenColors and resolving every scope stack the extension emits, the work
+VS Code repeats when a theme is applied (matches are cached per scope name
+afterwards, as ThemeModel does).
+
+The themes are malterlib.json, malterlibSRGB.json and malterlibNoTokens.json,
+then synthetic themes of 100 × scale rules (synthetic.theme()) to show how
+the cost grows with the rule count. The synthetic scopes are resolved too.
+Each measurement is the best of --repeat runs.
+
+Usage: python3 benchmarks/bench_theme_resolver.py [--scale 1 10 100] [--repeat 5]
+"""
+from __future__ import annotations
+
+import argparse
+import pathlib
+import sys
+import time
+from typing import Any, Dict, List, Sequence, Tuple
+
+REPO_ROOT = pathlib.Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(REPO_ROOT / "scripts"))
+sys.path.insert(0, str(REPO_ROOT / "benchmarks"))
+
+from json_loader import load_relaxed, loads_relaxed  # noqa: E402
+from pipeline import Context  # noqa: E402
+from synthetic import color_examples, theme as synthetic_theme  # noqa: E402
+from theme_resolver import THEMES, Theme, emitted_stacks  # noqa: E402
+
+
+def time_theme(data: Dict[str, Any], stacks: Sequence[Tuple[str, ...]], repeat: int) -> Tuple[Theme, float, float]:
+    """The theme and the best build and resolve times in seconds."""
+    build = resolve = float("inf")
+    theme = Theme(data)
+    for _ in range(repeat):
+        start = time.perf_counter()
+        theme = Theme(data)
+        middle = time.perf_counter()
+        for stack in stacks:
+            theme.resolve(stack)
+        end = time.perf_counter()
+        build, resolve = min(build, middle - start), min(resolve, end - middle)
+    return theme, build, resolve
+
+
+def report(label: str, theme: Theme, stacks: int, build: float, resolve: float) -> None:
+    print(f"  {label:<28} {theme.model.selectors:6} selectors  build {build * 1e3:8.2f} ms  "
+          f"resolve {resolve * 1e3:8.2f} ms  ({resolve / stacks * 1e6:6.1f} µs per stack, {stacks} stacks)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Time theme trie construction and scope resolution.")
+    parser.add_argument("--scale", type=int, nargs="+", default=[1, 10, 100], help="synthetic theme scales (default: 1 10 100)")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per theme (default: 5)")
+    args = parser.parse_args()
+
+    stacks = emitted_stacks(Context())
+    print("Themes:")
+    for rel in THEMES:
+        theme, build, resolve = time_theme(load_relaxed(REPO_ROOT / rel), stacks, args.repeat)
+        report(pathlib.Path(rel).name, theme, len(stacks), build, resolve)
+
+    print("Synthetic themes:")
+    for scale in args.scale:
+        palette = [str(entry["color"]) for entry in color_examples(scale)]
+        data = loads_relaxed(synthetic_theme(scale, palette))
+        scoped: List[Tuple[str, ...]] = list(stacks)
+        scoped.extend(sorted({(scope,) for rule in data["tokenColors"] for scope in rule["scope"]}))
+        theme, build, resolve = time_theme(data, scoped, args.repeat)
+        report(f"{scale}x", theme, len(scoped), build, resolve)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+#!./.venv/bin/python3
+"""classifier_conformance.py
+Differential test of the generated .clangd rules against the reference
+classifier (scripts/classifier.py), which implements the rules of
+src/semanticTokens.ts over scopes.json.
+
+The identifiers checked are, in order:
+
+    • every keyword, and every keyword with a character added or removed
+    • every prefix followed by each concept letter, an uppercase letter, a
+      digit, a lowercase letter, "_" and nothing, with assorted tails
+    • E / CF edge cases (ETest vs ETest_Value, CFString vs CFStringRef, ...)
+    • random identifiers built from prefix and keyword fragments, up to --count
+
+Only C++ identifiers ([A-Za-z_][A-Za-z0-9_]*) are checked: keywords such as
+"#pragma" and "[[" are neither checked nor used as fragments, and candidates
+that are not identifiers are skipped. Highlighterr also counts U+00C0-U+00DF
+as uppercase after a prefix, which the .clangd rules cannot express (see
+UPPER_CLASS in classifier.py), so those are not generated either.
+
+Both sides classify the same list with classify_many(). clangd may report
+an identifier as any token kind, whatever its scope suggests (a member
+reached through a dependent base is Unknown, for instance), and the kind
+decides which sections of .clangd are tried before Unknown. The list is
+therefore classified once as Unknown and once as every kind a section of
+.clangd names (classifier.section_kinds()); any other kind sees the Unknown
+section alone, so this covers every kind clangd can report. An identifier
+is a mismatch if any of these gives a scope other than the classifier's.
+The script prints the mismatch count with examples grouped by expected and
+actual scope, with the kinds each group occurs for, and the identifiers per
+second of each side, and exits with status 1 if there is any mismatch.
+
+Usage: python3 benchmarks/classifier_conformance.py [--count 2000000] [--seed 1] [--root DIR]
+"""
+from __future__ import annotations
+
+import argparse
+import collections
+import pathlib
+import random
+import re
+import sys
+import time
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Set, Tuple
+
+REPO_ROOT = pathlib.Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(REPO_ROOT / "scripts"))
+
+from classifier import ClangdRules, Classifier, section_kinds  # noqa: E402
+from scope_automaton import CONCEPT_CHARS  # noqa: E402
+
+# Characters tried right after a prefix.
+NEXT_CHARS = CONCEPT_CHARS + "AZ09az_"
+TAILS = ("", "Test", "test", "Test_Value", "_", "Ref", "TestRef", "X1", "a")
+EDGE_CASES = (
+    "E", "EA", "ETest", "ETest_Value", "E_Test", "ETest_", "Etest", "E1", "E1_x",
+    "CF", "CFRef", "CFString", "CFStringRef", "CFString_Ref", "CFRefs", "CFref", "CF1Ref", "CFStr256", "CFUStrRef",
+)
+EXAMPLES_PER_GROUP = 5
+IDENTIFIER_RE = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+
+
+def _fixed_identifiers(keywords: Sequence[str], prefixes: Sequence[str]) -> Iterator[str]:
+    for keyword in keywords:
+        yield keyword
+        yield keyword + "x"
+        yield keyword + "X"
+        yield keyword[:-1]
+    for prefix in prefixes:
+        for ch in NEXT_CHARS:
+            for tail in TAILS:
+                yield prefix + ch + tail
+                yield prefix + ch + "X" + tail
+        yield prefix
+    yield from EDGE_CASES
+
+
+def generate_identifiers(keywords: Sequence[str], prefixes: Sequence[str], count: int, seed: int) -> List[str]:
+    """``count`` identifiers (at least the fixed ones), deterministic for ``seed``."""
+    keywords = [keyword for keyword in keywords if IDENTIFIER_RE.fullmatch(keyword)]
+    is_identifier = IDENTIFIER_RE.fullmatch
+    names = [name for name in dict.fromkeys(_fixed_identifiers(keywords, prefixes)) if is_identifier(name)]
+    rng = random.Random(seed)
+    fragments = list(prefixes) + list(keywords) + list(NEXT_CHARS) + ["Test", "Value", "Ref", "_", "1"]
+    choice = rng.choice
+    while len(names) < count:
+        parts = [choice(prefixes), choice(NEXT_CHARS)]
+        for _ in range(rng.randrange(3)):
+            parts.append(choice(fragments))
+        name = "".join(parts)
+        if is_identifier(name):
+            names.append(name)
+    return names
+
+
+def token_kinds(root: pathlib.Path) -> List[str]:
+    """Unknown and every token kind with a section of its own in ``root``/.clangd."""
+    return ["Unknown"] + section_kinds((root / ".clangd").read_text(encoding="utf-8"))
+
+
+def _timed(classify_many: Callable[[List[str]], List[Optional[str]]], names: List[str]) -> Tuple[List[Optional[str]], float]:
+    start = time.perf_counter()
+    result = classify_many(names)
+    return result, time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare the .clangd rules with the reference classifier.")
+    parser.add_argument("--count", type=int, default=2_000_000, help="number of identifiers (default: 2000000)")
+    parser.add_argument("--seed", type=int, default=1, help="random seed (default: 1)")
+    parser.add_argument("--root", type=pathlib.Path, default=REPO_ROOT, help="directory with the generated files")
+    args = parser.parse_args()
+
+    classifier = Classifier.load(args.root)
+    names = generate_identifiers(sorted(classifier.keywords), sorted(classifier.prefixes), args.count, args.seed)
+    distinct = len(set(names))
+    print(f"{len(names)} identifiers ({distinct} distinct), {len(ClangdRules.load(args.root).rules)} .clangd rules for Unknown")
+
+    expected, classifier_time = _timed(classifier.classify_many, names)
+    print(f"  {'classifier':<24} {classifier_time:7.2f} s  {len(names) / classifier_time:12,.0f} identifiers/s")
+
+    groups: Dict[Tuple[Optional[str], Optional[str]], Dict[str, None]] = collections.defaultdict(dict)
+    group_kinds: Dict[Tuple[Optional[str], Optional[str]], Dict[str, None]] = collections.defaultdict(dict)
+    mismatched: Set[str] = set()
+    for kind in token_kinds(args.root):
+        rules = ClangdRules.load(args.root, kind)
+        actual, clangd_time = _timed(rules.classify_many, names)
+        print(f"  {'.clangd ' + kind:<24} {clangd_time:7.2f} s  {len(names) / clangd_time:12,.0f} identifiers/s")
+        for name, want, got in zip(names, expected, actual):
+            if want != got:
+                mismatched.add(name)
+                groups[(want, got)][name] = None
+                group_kinds[(want, got)][kind] = None
+
+    if not mismatched:
+        print("\nThe .clangd rules agree with the classifier on every identifier, for every token kind.")
+        return
+
+    print(f"\n{len(mismatched)} distinct identifiers classified differently:")
+    for key, group in sorted(groups.items(), key=lambda item: -len(item[1])):
+        want, got = key
+        examples = ", ".join(list(group)[:EXAMPLES_PER_GROUP])
+        print(f"  {len(group):8}  expected {want}, .clangd {got} as {'|'.join(group_kinds[key])}: {examples}")
+    sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+#!./.venv/bin/python3
+"""run_benchmarks.py
+Time the generator stages against synthetic inputs at several scales.
+
+For every scale factor a synthetic repository is built in a temporary
+directory (see synthetic.py) and the stages that produce the timed stages'
+inputs are run once to populate it. Each timed stage is then run --repeat
+times, every time with a fresh Context so that reading and parsing its inputs
+is part of the measurement; queued outputs are discarded rather than flushed,
+so repeats see identical inputs.
+
+The on-disk caches (output_writer.cache_dir()) are kept in the temporary
+tree. Every repeat is a cold run, with those caches and their in-memory
+copies emptied first, followed by a warm run that finds them filled; both
+are reported, so the cold numbers measure the stage itself and the warm ones
+what a rerun with an unchanged cache costs.
+
+Results are compared with benchmarks/baseline.json when it exists. A stage
+whose cold or warm median is more than --threshold (default 25%) slower than
+its baseline, and slower by at least --min-delta seconds, is reported as a
+regression and makes the script exit with status 1. --save-baseline stores
+the current results instead. Baselines are machine specific and are not
+committed.
+
+Usage: python3 benchmarks/run_benchmarks.py [--scale 1 10 100] [--repeat N] [--save-baseline]
+"""
+from __future__ import annotations
+
+import argparse
+import contextlib
+import importlib
+import io
+import json
+import os
+import pathlib
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Tuple
+
+BENCH_DIR = pathlib.Path(__file__).resolve().parent
+REPO_ROOT = BENCH_DIR.parent
+sys.path.insert(0, str(REPO_ROOT / "scripts"))
+sys.path.insert(0, str(BENCH_DIR))
+
+import color_utils  # noqa: E402
+import json_loader  # noqa: E402
+from output_writer import CACHE_DIR_ENV_VAR, cache_dir  # noqa: E402
+from pipeline import Context  # noqa: E402
+from synthetic import build_tree  # noqa: E402
+
+BASELINE_PATH = BENCH_DIR / "baseline.json"
+
+# Stages run once, in this order, to produce the inputs of the timed stages.
+SETUP_STAGES = (
+    "parse_prefix_map",
+    "generate_classifications",
+    "extract_keywords",
+    "combine_scopes",
+)
+
+# Stages that are timed.
+BENCHMARKED_STAGES = (
+    "extract_keywords",
+    "combine_scopes",
+    "generate_clangd_config",
+    "deduplicate_token_colors",
+    "convert_theme_to_srgb",
+)
+
+
+def _run_quietly(module_name: str, context: Context) -> None:
+    with contextlib.redirect_stdout(io.StringIO()):
+        importlib.import_module(module_name).run(context)
+
+
+def prepare(root: pathlib.Path) -> None:
+    context = Context(root=root)
+    for module_name in SETUP_STAGES:
+        _run_quietly(module_name, context)
+    context.flush()
+
+
+def clear_caches() -> None:
+    shutil.rmtree(cache_dir(), ignore_errors=True)
+    color_utils.clear_memory_cache()
+    json_loader.clear_memory_cache()
+
+
+def _time_once(module_name: str, root: pathlib.Path) -> float:
+    context = Context(root=root)
+    start = time.perf_counter()
+    _run_quietly(module_name, context)
+    return time.perf_counter() - start
+
+
+def time_stage(module_name: str, root: pathlib.Path, repeat: int) -> Tuple[List[float], List[float]]:
+    """Cold and warm timings of ``repeat`` runs each."""
+    cold, warm = [], []
+    for _ in range(repeat):
+        clear_caches()
+        cold.append(_time_once(module_name, root))
+        warm.append(_time_once(module_name, root))
+    return cold, warm
+
+
+def run_scale(scale: int, stages: Tuple[str, ...], repeat: int) -> Dict[str, Dict[str, float]]:
+    results: Dict[str, Dict[str, float]] = {}
+    with tempfile.TemporaryDirectory(prefix=f"malterlib-bench-{scale}x-") as tmp:
+        root = build_tree(pathlib.Path(tmp), scale)
+        previous = os.environ.get(CACHE_DIR_ENV_VAR)
+        os.environ[CACHE_DIR_ENV_VAR] = str(root / ".cache")
+        try:
+            prepare(root)
+            for module_name in stages:
+                cold, warm = time_stage(module_name, root, repeat)
+                result = results[module_name] = {
+                    "median_s": statistics.median(cold), "min_s": min(cold),
+                    "warm_median_s": statistics.median(warm), "warm_min_s": min(warm),
+                }
+                print(
+                    f"  {module_name:<28} cold median {result['median_s']:8.4f} s  min {result['min_s']:8.4f} s"
+                    f"   warm median {result['warm_median_s']:8.4f} s  min {result['warm_min_s']:8.4f} s"
+                )
+                sys.stdout.flush()
+        finally:
+            clear_caches()
+            if previous is None:
+                del os.environ[CACHE_DIR_ENV_VAR]
+            else:
+                os.environ[CACHE_DIR_ENV_VAR] = previous
+    return results
+
+
+def load_baseline(path: pathlib.Path) -> Dict[str, Any]:
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        return {}
+
+
+def find_regressions(
+    results: Dict[str, Dict[str, Dict[str, float]]],
+    baseline: Dict[str, Any],
+    threshold: float,
+    min_delta: float,
+) -> List[str]:
+    regressions = []
+    for scale, stages in results.items():
+        for module_name, result in stages.items():
+            reference = baseline.get("results", {}).get(scale, {}).get(module_name)
+            if not reference:
+                continue
+            for label, key in (("cold", "median_s"), ("warm", "warm_median_s")):
+                if key not in reference:
+                    continue
+                before, after = reference[key], result[key]
+                if after > before * (1 + threshold) and after - before >= min_delta:
+                    regressions.append(
+                        f"{module_name} at {scale}x ({label}): {before:.4f} s -> {after:.4f} s "
+                        f"(+{(after / before - 1) * 100:.0f}%)"
+                    )
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the generator stages against synthetic inputs.")
+    parser.add_argument("--scale", type=int, nargs="+", default=[1, 10, 100], help="scale factors (default: 1 10 100)")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per stage and scale (default: 3)")
+    parser.add_argument("--stage", action="append", choices=BENCHMARKED_STAGES, help="only time this stage (repeatable)")
+    parser.add_argument(
+        "--threshold", type=float, default=0.25,
+        help="relative slowdown over the baseline reported as a regression (default: 0.25)",
+    )
+    parser.add_argument(
+        "--min-delta", type=float, default=0.005,
+        help="ignore slowdowns smaller than this many seconds (default: 0.005)",
+    )
+    parser.add_argument("--baseline", type=pathlib.Path, default=BASELINE_PATH, help="baseline file")
+    parser.add_argument("--save-baseline", action="store_true", help="store the results as the new baseline")
+    args = parser.parse_args()
+    if args.repeat < 1:
+        parser.error("--repeat must be at least 1")
+
+    stages = tuple(args.stage) if args.stage else BENCHMARKED_STAGES
+    results: Dict[str, Dict[str, Dict[str, float]]] = {}
+    for scale in args.scale:
+        print(f"\n==> {scale}x")
+        sys.stdout.flush()
+        results[str(scale)] = run_scale(scale, stages, args.repeat)
+
+    if args.save_baseline:
+        baseline = load_baseline(args.baseline)
+        merged = baseline.get("results", {})
+        for scale, stage_results in results.items():
+            merged.setdefault(scale, {}).update(stage_results)
+        args.baseline.write_text(json.dumps({
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "results": merged,
+        }, indent=2) + "\n", encoding="utf-8")
+        print(f"\nWrote {args.baseline}")
+        return
+
+    baseline = load_baseline(args.baseline)
+    if not baseline:
+        print(f"\nNo baseline at {args.baseline}; run with --save-baseline to create one.")
+        return
+    regressions = find_regressions(results, baseline, args.threshold, args.min_delta)
+    if regressions:
+        print(f"\nRegressions (more than {args.threshold * 100:.0f}% slower than baseline):")
+        for line in regressions:
+            print(f"  {line}")
+        sys.exit(1)
+    print("\nNo regressions against baseline.")
+
+
+if __name__ == "__main__":
+    main()
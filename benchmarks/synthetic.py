@@ -0,0 +1,163 @@
+"""synthetic.py
+Builders for scaled synthetic inputs used by run_benchmarks.py.
+
+A synthetic tree mirrors the real layout: a repository root (themes/,
+colorexamples.json, settingsTemplate.json, templates, ...) next to a
+Highlighterr/HighlighterrCxx checkout. Scale 1 is roughly today's size; the
+tables grow linearly with the scale factor:
+
+  • ms_PrefixMap entries         ~ 90 × scale
+  • f_AddDefaultKeyword_* calls  ~ 620 × scale
+  • tokenColors rules            100 × scale
+  • colorexamples.json colours   40 × scale
+
+The EClassification enum is copied from classifications.json unchanged, so the
+number of distinct scopes (and therefore clangd modifier sets) stays realistic.
+All content is generated from a seeded RNG and is identical between runs.
+"""
+from __future__ import annotations
+
+import json
+import pathlib
+import random
+import shutil
+import string
+from typing import Dict, List
+
+REPO_ROOT = pathlib.Path(__file__).resolve().parents[1]
+
+# Files copied verbatim into the synthetic repository root.
+COPIED_FILES = (
+    "settingsTemplate.json",
+    "darkModern.json",
+    ".clangd-template",
+    "README-template.md",
+    "package.json",
+)
+
+BASE_PREFIXES = 90
+BASE_KEYWORDS = 620
+BASE_THEME_RULES = 100
+BASE_COLOR_EXAMPLES = 40
+
+
+def _classifications() -> List[str]:
+    return list(json.loads((REPO_ROOT / "classifications.json").read_text(encoding="utf-8")))
+
+
+def _random_hex(rng: random.Random) -> str:
+    return "#" + "".join(f"{rng.randrange(256):02x}" for _ in range(3))
+
+
+def _unique_names(rng: random.Random, count: int, alphabet: str, min_len: int, max_len: int, existing=()) -> List[str]:
+    names = set(existing)
+    out: List[str] = []
+    while len(out) < count:
+        name = "".join(rng.choice(alphabet) for _ in range(rng.randint(min_len, max_len)))
+        if name not in names:
+            names.add(name)
+            out.append(name)
+    return out
+
+
+def highlighterr_sources(scale: int, seed: int = 1) -> Dict[str, str]:
+    """Return synthetic HighlighterrCxx.cpp / .h contents."""
+    rng = random.Random(seed)
+    classes = _classifications()
+    real_prefixes = json.loads((REPO_ROOT / "prefixmap.json").read_text(encoding="utf-8"))
+
+    # Keep the real prefixes (they exercise the E/CF special cases) and pad
+    # with synthetic lower-case prefixes ending in an underscore.
+    prefixes = dict(real_prefixes)
+    extra = _unique_names(
+        rng, max(0, BASE_PREFIXES * scale - len(prefixes)), string.ascii_lowercase, 2, 5, existing=prefixes
+    )
+    for name in extra:
+        prefixes[name + "_"] = {"classification": rng.choice(classes), "variable": rng.random() < 0.5}
+
+    cpp: List[str] = ['#include "HighlighterrCxx.h"', "", "namespace NHighlighterr", "{"]
+    cpp.append("\tCHighlighterrCxx::CPrefixMapEntry const CHighlighterrCxx::ms_PrefixMap[] =")
+    cpp.append("\t{")
+    for prefix, info in prefixes.items():
+        example = f"{prefix}Example"
+        flag = "true" if info["variable"] else "false"
+        cpp.append(
+            f'\t\t{{ "{prefix}", EClassification::{info["classification"]}, {flag} }}, // ignore({example})'
+        )
+    cpp.append("\t};")
+    cpp.append("")
+
+    keywords = _unique_names(rng, BASE_KEYWORDS * scale, string.ascii_lowercase + "_", 3, 14)
+    per_function = 500
+    for start in range(0, len(keywords), per_function):
+        cpp.append(f"\tvoid CHighlighterrCxx::f_AddDefaultKeywords{start // per_function}()")
+        cpp.append("\t{")
+        for kw in keywords[start:start + per_function]:
+            variant = rng.choice(("", "_C", "_Cpp", "_CLike"))
+            cpp.append(f'\t\tf_AddDefaultKeyword{variant}("{kw}", EClassification::{rng.choice(classes)});')
+        cpp.append(f'\t\tf_AddDefaultKeyword_JS("function{start}", EClassification::{classes[0]});')
+        cpp.append("\t}")
+        cpp.append("")
+    cpp.append("}")
+
+    header = ["#pragma once", "", "namespace NHighlighterr", "{", "\tenum class EClassification", "\t{"]
+    header += [f"\t\t{name}," for name in classes]
+    header += ["\t};", "}", ""]
+    return {"HighlighterrCxx.cpp": "\n".join(cpp) + "\n", "HighlighterrCxx.h": "\n".join(header)}
+
+
+def color_examples(scale: int, seed: int = 2) -> List[Dict[str, object]]:
+    rng = random.Random(seed)
+    real = json.loads((REPO_ROOT / "colorexamples.json").read_text(encoding="utf-8"))
+    out = list(real)
+    seen = {entry["color"].lower() for entry in real}
+    while len(out) < BASE_COLOR_EXAMPLES * scale:
+        color = _random_hex(rng)
+        if color in seen:
+            continue
+        seen.add(color)
+        out.append({"color": color, "examples": [f"example{len(out)}"]})
+    return out
+
+
+def theme(scale: int, palette: List[str], seed: int = 3) -> str:
+    """Return a JSON5 theme (with comments) holding 100 × scale tokenColors rules."""
+    rng = random.Random(seed)
+    import json5
+
+    base = json5.loads((REPO_ROOT / "themes" / "malterlib.json").read_text(encoding="utf-8"))
+    rules = []
+    for i in range(BASE_THEME_RULES * scale):
+        scopes = [f"malterlib.synthetic.s{rng.randrange(BASE_THEME_RULES * scale * 2)}" for _ in range(rng.randint(1, 8))]
+        settings: Dict[str, str] = {"foreground": rng.choice(palette) if rng.random() < 0.8 else _random_hex(rng)}
+        if rng.random() < 0.1:
+            settings["fontStyle"] = rng.choice(("bold", "italic", "underline"))
+        rules.append({"scope": scopes, "settings": settings})
+    base["tokenColors"] = rules
+
+    text = json.dumps(base, indent=4)
+    # Sprinkle comments and a trailing comma so the JSON5 code paths are used.
+    text = text.replace('    "tokenColors": [', '    // Synthetic rules\n    "tokenColors": [', 1)
+    return text.replace('\n    ]\n}', ',\n    ]\n}', 1)
+
+
+def build_tree(dest: pathlib.Path, scale: int) -> pathlib.Path:
+    """Create a synthetic repository under ``dest`` and return its root."""
+    root = dest / "MalterlibVSCode"
+    highlighterr = dest / "Highlighterr" / "HighlighterrCxx"
+    (root / "themes").mkdir(parents=True, exist_ok=True)
+    highlighterr.mkdir(parents=True, exist_ok=True)
+
+    for rel in COPIED_FILES:
+        src = REPO_ROOT / rel
+        if src.exists():
+            shutil.copyfile(src, root / rel)
+
+    for name, text in highlighterr_sources(scale).items():
+        (highlighterr / name).write_text(text, encoding="utf-8")
+
+    examples = color_examples(scale)
+    (root / "colorexamples.json").write_text(json.dumps(examples, indent=4) + "\n", encoding="utf-8")
+    palette = [str(entry["color"]) for entry in examples]
+    (root / "themes" / "malterlib.json").write_text(theme(scale, palette), encoding="utf-8")
+    return root
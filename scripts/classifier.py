@@ -0,0 +1,283 @@
+"""classifier.py
+Reference implementation of the identifier classification rules, over
+scopes.json, and of the generated .clangd rule list.
+
+    • Classifier  – the rules of classifyIdentifier() in src/semanticTokens.ts
+                    (and Highlighterr): exact keywords, then the longest
+                    matching prefix; a non-variable prefix must be followed by
+                    an uppercase letter or digit, a variable prefix may have
+                    one of the "binpfro" concept letters in between; "E" and
+                    "CF" have the enum / "...Ref" special cases
+    • ClangdRules – the .clangd rules clangd tries for a token of one kind:
+                    the sections listing that kind, then Unknown, with the
+                    modifier sets mapped back to scopes through
+                    semanticScopesForPackage.json; the first matching rule
+                    wins, as in clangd
+    • build_rules – the (regex, scope) rules generate_clangd_config.py
+                    writes to .clangd, before modifiers are assigned; also
+                    used by scope_pruning.py
+
+Classifier and ClangdRules classify one identifier with classify() or a
+batch with classify_many(), which classifies each distinct identifier once
+and returns scopes (None for unclassified identifiers) in input order.
+
+benchmarks/classifier_conformance.py uses the two as a differential oracle.
+"""
+from __future__ import annotations
+
+import json
+import pathlib
+import re
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from regex_trie import factor_alternatives, trie_regex
+from rule_order import overlap
+from scope_automaton import CONCEPT_CHARS, SPECIAL_PREFIXES
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+
+# Characters Highlighterr's isUpperCase() accepts (A-Z, 0-9, U+00C0-U+00DF)
+UPPER_CHARS = frozenset(
+    [chr(c) for c in range(ord("A"), ord("Z") + 1)]
+    + [chr(c) for c in range(ord("0"), ord("9") + 1)]
+    + [chr(c) for c in range(0xC0, 0xE0)]
+)
+
+# UPPER_CHARS in the .clangd rules: A-Z and the digits. clangd's regex engine
+# works on bytes, so identifiers with U+00C0-U+00DF after a prefix are left to
+# the Unknown fallbacks.
+UPPER_CLASS = "[A-Z0-9]"
+
+# Tail every prefix is followed by, per kind of prefix.
+PREFIX_TAIL = f"{UPPER_CLASS}[A-Za-z0-9_]*"
+VARIABLE_TAIL = f"([{CONCEPT_CHARS}]?{UPPER_CLASS}[A-Za-z0-9_]*)"
+
+_RULE_RE = re.compile(r"^\s*- regex: '((?:[^']|'')*)'\s*$")
+_ADD_RE = re.compile(r"^\s*add: \[([^\]]*)\]")
+
+
+def _classify_all(classify, names: Iterable[str]) -> List[Optional[str]]:
+    seen: Dict[str, Optional[str]] = {}
+    out: List[Optional[str]] = []
+    append = out.append
+    get = seen.get
+    for name in names:
+        scope = get(name, seen)
+        if scope is seen:
+            scope = seen[name] = classify(name)
+        append(scope)  # type: ignore[arg-type]
+    return out
+
+
+class Classifier:
+    """Classification by keyword table and prefix map (see module docstring)."""
+
+    def __init__(self, keywords: Dict[str, str], prefixes: Dict[str, Dict[str, Any]], classifications: Dict[str, str]):
+        self.keywords = dict(keywords)
+        # Prefix -> (scope if followed by an uppercase letter, variable?, special rule)
+        self.prefixes: Dict[str, Tuple[str, bool, Optional[Tuple[str, str, Optional[str]]]]] = {}
+        for prefix, info in prefixes.items():
+            variable = bool(info["variable"])
+            special = None
+            if not variable and prefix in SPECIAL_PREFIXES:
+                kind, argument, cls = SPECIAL_PREFIXES[prefix]
+                special = (kind, argument, classifications.get(cls))
+            self.prefixes[prefix] = (info["scope"], variable, special)
+        self.max_prefix_length = max((len(p) for p in self.prefixes), default=0)
+
+    @classmethod
+    def from_scopes(cls, scopes: Dict[str, Any], classifications: Dict[str, str]) -> "Classifier":
+        return cls(scopes.get("keywords", {}), scopes.get("prefixes", {}), classifications)
+
+    @classmethod
+    def load(cls, root: pathlib.Path = ROOT) -> "Classifier":
+        """Classifier over ``root``/scopes.json and classifications.json."""
+        scopes = json.loads((root / "scopes.json").read_text(encoding="utf-8"))
+        classifications = json.loads((root / "classifications.json").read_text(encoding="utf-8"))
+        return cls.from_scopes(scopes, classifications)
+
+    def classify(self, name: str) -> Optional[str]:
+        scope = self.keywords.get(name)
+        if scope is not None:
+            return scope
+
+        prefixes = self.prefixes
+        length = len(name)
+        for i in range(min(self.max_prefix_length, length - 1), -1, -1):
+            entry = prefixes.get(name[:i])
+            if entry is None:
+                continue
+            scope, variable, special = entry
+            ch = name[i]
+            if ch in UPPER_CHARS:
+                if special is not None:
+                    kind, argument, special_scope = special
+                    if (kind == "noUnderscore" and "_" not in name) or (kind == "suffix" and name.endswith(argument)):
+                        return special_scope
+                return scope
+            if variable and ch in CONCEPT_CHARS and i + 1 < length and name[i + 1] in UPPER_CHARS:
+                return scope
+        return None
+
+    def classify_many(self, names: Iterable[str]) -> List[Optional[str]]:
+        return _classify_all(self.classify, names)
+
+
+def section_kinds(clangd_text: str) -> List[str]:
+    """Token kinds named by the kind-specific sections of a .clangd file, in file order.
+
+    A token of any other kind is matched against the Unknown section alone.
+    """
+    kinds: Dict[str, None] = {}
+    for line in clangd_text.splitlines():
+        if line.strip().endswith(":") and not line.lstrip().startswith("-") and line.startswith("    "):
+            kinds.update(dict.fromkeys(kind for kind in line.strip()[:-1].split("|") if kind != "Unknown"))
+    return list(kinds)
+
+
+class ClangdRules:
+    """First-match evaluation of .clangd rules (see module docstring)."""
+
+    def __init__(self, rules: List[Tuple[str, str]]):
+        self.rules = rules
+        # One alternation of anchored rules, tried in order; the wrapping group
+        # closes last, so lastgroup names the first rule that matched.
+        self._combined = re.compile("|".join(f"(?P<r{i}>(?:{regex}))" for i, (regex, _) in enumerate(rules)))
+        self._scopes = {f"r{i}": scope for i, (_, scope) in enumerate(rules)}
+        self._indices = {f"r{i}": i for i in range(len(rules))}
+
+    @classmethod
+    def parse(cls, clangd_text: str, semantic_scopes: Dict[str, Any], kind: str = "Unknown") -> "ClangdRules":
+        """Rules clangd tries for a token of ``kind``, with scopes from semanticScopesForPackage.json.
+
+        Those are the rules of every section listing ``kind`` (e.g.
+        "Type|Class:"), in file order, followed by the Unknown section.
+        """
+        selector_scopes: Dict[str, str] = {}
+        for entry in semantic_scopes.get("semanticTokenScopes", []):
+            for selector, textmate in entry.get("scopes", {}).items():
+                selector_scopes[selector] = textmate[0].replace(".", "-")
+
+        sections: Dict[bool, List[Tuple[str, str]]] = {True: [], False: []}
+        lines = clangd_text.splitlines()
+        current: Optional[List[Tuple[str, str]]] = None
+        for i, line in enumerate(lines):
+            if line.strip().endswith(":") and not line.lstrip().startswith("-"):
+                kinds = line.strip()[:-1].split("|")
+                current = sections[kinds == ["Unknown"]] if kind in kinds or kinds == ["Unknown"] else None
+                continue
+            m = _RULE_RE.match(line)
+            if current is None or not m or i + 1 >= len(lines):
+                continue
+            add = _ADD_RE.match(lines[i + 1])
+            if add:
+                mods = [mod.strip().lower() for mod in add.group(1).split(",") if mod.strip()]
+                scope = selector_scopes.get("*." + ".".join(mods))
+                if scope is not None:
+                    current.append((m.group(1).replace("''", "'"), scope))
+        return cls(sections[False] + sections[True])
+
+    @classmethod
+    def load(cls, root: pathlib.Path = ROOT, kind: str = "Unknown") -> "ClangdRules":
+        """Rules for ``kind`` from ``root``/.clangd and semanticScopesForPackage.json."""
+        semantic_scopes = json.loads((root / "semanticScopesForPackage.json").read_text(encoding="utf-8"))
+        return cls.parse((root / ".clangd").read_text(encoding="utf-8"), semantic_scopes, kind)
+
+    def classify(self, name: str) -> Optional[str]:
+        m = self._combined.match(name)
+        return self._scopes[m.lastgroup] if m else None  # type: ignore[index]
+
+    def classify_many(self, names: Iterable[str]) -> List[Optional[str]]:
+        return _classify_all(self.classify, names)
+
+    def first_match(self, name: str) -> int:
+        """Index of the first rule matching ``name``, or -1."""
+        m = self._combined.match(name)
+        return self._indices[m.lastgroup] if m else -1  # type: ignore[index]
+
+
+def _combine(alternatives: List[str]) -> str:
+    joined = "|".join(alternatives)
+    return rf"^({joined})$" if "|" in joined else rf"^{joined}$"
+
+
+def build_rules(
+    keywords: Dict[str, str], prefixes: Dict[str, Dict[str, object]], optimize: bool = True
+) -> List[Tuple[str, str]]:
+    """Build regex rules mirroring the TypeScript classifier logic (without mods yet).
+
+    With ``optimize`` each rule's alternation is factored by regex_trie; the
+    rules and their order are the same either way.
+    """
+    rules: List[Tuple[str, str]] = []  # (regex, scope) – modifiers assigned later
+
+    # 1. Exact keyword rules (grouped per scope) – highest precedence
+    scope_to_keywords: Dict[str, List[str]] = defaultdict(list)
+    for kw, scope in keywords.items():
+        scope_to_keywords[scope].append(kw)
+
+    for scope, kw_list in sorted(scope_to_keywords.items()):
+        kw_list_sorted = sorted(kw_list)
+        if optimize:
+            regex = f"^{trie_regex(kw_list_sorted)}$"
+        else:
+            regex = _combine([re.escape(k) for k in kw_list_sorted])
+        rules.append((regex, scope))
+
+    # 2. Prefix rules – (literal prefix, tail regex) pairs grouped per scope for merging.
+    # Parts arrive longest prefix first, which is the precedence clangd must
+    # keep. A part joins the last rule of its scope unless a later rule of
+    # another scope has a part matching some of the same identifiers (C[A-Z]...
+    # after CF[A-Z]...); merging would move it in front of that part, so it
+    # starts a new rule of the same scope instead.
+    prefix_groups: List[Tuple[str, List[Tuple[str, str]]]] = []
+
+    def shadows(literal: str, tail: str, other: str, other_tail: str) -> bool:
+        return other.startswith(literal) and overlap(
+            f"^{re.escape(literal)}{tail}$", f"^{re.escape(other)}{other_tail}$"
+        ) is not None
+
+    def add_part(scope: str, literal: str, tail: str) -> None:
+        for index in range(len(prefix_groups) - 1, -1, -1):
+            group_scope, parts = prefix_groups[index]
+            if group_scope == scope:
+                parts.append((literal, tail))
+                return
+            if any(shadows(literal, tail, other, other_tail) for other, other_tail in parts):
+                break
+        prefix_groups.append((scope, [(literal, tail)]))
+
+    prefix_entries = sorted(prefixes.items(), key=lambda kv: len(kv[0]), reverse=True)
+
+    for prefix, info in prefix_entries:
+        variable = bool(info["variable"])  # type: ignore[index]
+        default_scope = str(info.get("scope", ""))
+
+        if prefix == "E":
+            # Positive special-case: (enumerator scope from JSON)
+            add_part(default_scope, "E", f"{UPPER_CLASS}[A-Za-z0-9_]*_[A-Za-z0-9_]*")
+
+            # General rule enum type (no underscore)
+            add_part("malterlib-enum", "E", f"{UPPER_CLASS}[A-Za-z0-9]*")
+            continue
+
+        if prefix == "CF":
+            # Positive special-case: CoreFoundation type ending in Ref
+            add_part("malterlib-type", "CF", f"(Ref|{UPPER_CLASS}[A-Za-z0-9_]*Ref)")
+
+            # General CF rule (function scope from JSON)
+            add_part(default_scope, "CF", PREFIX_TAIL)
+            continue
+
+        add_part(default_scope, prefix, VARIABLE_TAIL if variable else PREFIX_TAIL)
+
+    # Combine and append to rules list preserving group ordering
+    for scope, parts in prefix_groups:
+        if optimize:
+            regex = f"^{factor_alternatives(parts)}$"
+        else:
+            regex = _combine([re.escape(literal) + tail for literal, tail in parts])
+        rules.append((regex, scope))
+
+    return rules
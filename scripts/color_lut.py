@@ -0,0 +1,253 @@
+#!./.venv/bin/python3
+"""color_lut.py
+Precomputed 3D lookup tables for vectorized Display P3 ↔ sRGB conversion.
+
+A LUT is baked once from the same ICC transform color_utils uses (one
+LittleCMS call over every grid point) and cached as a .npy file in
+output_writer.cache_dir() that is memory-mapped on later loads. Conversion is
+then pure NumPy:
+
+    • size 256 – every 8-bit input has its own entry (48 MiB); lookups are a
+      single fancy-index and match LittleCMS exactly
+    • size 17/33/65 – a coarse grid (14 KiB / 105 KiB / 804 KiB) evaluated
+      with trilinear interpolation
+
+Grid points sit on the 8-bit values nearest to an even spacing, so the
+corners of the cube and the greys are sampled exactly.
+
+Accuracy against the LittleCMS transform, as ΔE*ab (CIE76) in the destination
+space over all 256³ inputs (run this script with --report to re-measure):
+
+    size   P3 → sRGB (mean / p99 / max)   sRGB → P3 (mean / p99 / max)
+      17     0.41 / 1.99 / 3.69             0.25 / 1.11 / 1.96
+      33     0.19 / 1.06 / 2.47             0.20 / 1.01 / 2.07
+      65     0.11 / 0.78 / 1.77             0.15 / 0.87 / 2.10
+     256     exact                          exact
+
+The tolerance is stated in just-noticeable differences (JND_DELTA_E, the
+usual ΔE*ab 2.3 for a JND): a grid of TOLERANCE_SIZES may leave at most 1% of
+all colours visibly off (p99 ≤ 1 JND) and none by more than 2 JNDs. It is
+checked separately for each profile pair, i.e. for the profiles
+color_utils.profile_source() resolves on this machine, and --report exits
+with status 1, naming the profiles, if a grid misses it. The 33 and 65 point
+grids meet it by a wide margin in the measurements above; 17 points are
+only suitable for previews and are not checked.
+
+P3 → sRGB errors come from the perceptual gamut mapping near the saturated
+P3 primaries, and shrink with the grid size. sRGB → P3 is never off by more than one 8-bit step per channel; what
+remains is rounding, which is why a finer grid does not help there.
+
+Requires NumPy (optional; nothing else in the pipeline needs it).
+
+Usage: python3 scripts/color_lut.py [--size N] [--direction p3-to-srgb|srgb-to-p3] [--report]
+"""
+from __future__ import annotations
+
+import argparse
+import io
+import pathlib
+import sys
+from typing import Iterable, List
+
+try:
+    import numpy as np
+except ImportError as exc:
+    raise RuntimeError(
+        "color_lut requires the 'numpy' package. Install it with 'pip install numpy'."
+    ) from exc
+
+import icc_profiles
+from color_utils import (
+    DISPLAY_P3, RENDERING_INTENT, SRGB, _parse_hex, get_transform, profile_hash, profile_source,
+)
+from output_writer import cache_dir, write_if_changed
+
+LUT_SIZES = (17, 33, 65, 256)
+DEFAULT_SIZE = 33
+
+# ΔE*ab (CIE76) of a just-noticeable difference (Sharma, Digital Color Imaging
+# Handbook). A LUT of TOLERANCE_SIZES may differ from LittleCMS by more than
+# this for at most 1% of all colours, and by more than MAX_JNDS of them for none.
+JND_DELTA_E = 2.3
+P99_JNDS = 1
+MAX_JNDS = 2
+TOLERANCE_SIZES = (33, 65, 256)
+
+DIRECTIONS = {
+    "p3-to-srgb": (DISPLAY_P3, SRGB),
+    "srgb-to-p3": (SRGB, DISPLAY_P3),
+}
+
+# Chromaticities used to compute ΔE in each profile's space
+_PRIMARIES = {
+    DISPLAY_P3: icc_profiles.DISPLAY_P3_PRIMARIES,
+    SRGB: icc_profiles.SRGB_PRIMARIES,
+}
+
+
+def grid_axis(size: int) -> np.ndarray:
+    """8-bit input values sampled along each axis of a ``size``-point grid."""
+    return np.round(np.linspace(0, 255, size)).astype(np.int32)
+
+
+def _transform_array(rgb: np.ndarray, src: str, dst: str) -> np.ndarray:
+    """Run an (N, 3) uint8 array through the LittleCMS transform."""
+    from PIL import Image, ImageCms
+
+    flat = np.ascontiguousarray(rgb, dtype=np.uint8).reshape(-1, 3)
+    image = Image.frombytes("RGB", (len(flat), 1), flat.tobytes())
+    converted = ImageCms.applyTransform(image, get_transform(src, dst))
+    return np.frombuffer(converted.tobytes(), dtype=np.uint8).reshape(rgb.shape)
+
+
+class ColorLUT:
+    """A baked src → dst transform; ``table[r, g, b]`` holds grid outputs."""
+
+    def __init__(self, table: np.ndarray):
+        self.table = table
+        self.size = table.shape[0]
+        self.axis = grid_axis(self.size)
+
+    @classmethod
+    def bake(cls, src: str, dst: str, size: int = DEFAULT_SIZE) -> "ColorLUT":
+        axis = grid_axis(size).astype(np.uint8)
+        grid = np.stack(np.meshgrid(axis, axis, axis, indexing="ij"), axis=-1)
+        return cls(_transform_array(grid, src, dst))
+
+    @staticmethod
+    def cache_path(src: str, dst: str, size: int) -> pathlib.Path:
+        key = f"{profile_hash(src)[:16]}-{profile_hash(dst)[:16]}-{RENDERING_INTENT}"
+        return cache_dir() / f"lut-{src}-to-{dst}-{size}-{key}.npy"
+
+    @classmethod
+    def load(cls, src: str, dst: str, size: int = DEFAULT_SIZE) -> "ColorLUT":
+        """Memory-map the cached LUT, baking and caching it first if needed.
+
+        The cache file name includes both profile hashes, so a changed
+        profile gets a new table.
+        """
+        if size not in LUT_SIZES:
+            raise ValueError(f"Unsupported LUT size {size}; expected one of {LUT_SIZES}")
+        path = cls.cache_path(src, dst, size)
+        if not path.exists():
+            buffer = io.BytesIO()
+            np.save(buffer, cls.bake(src, dst, size).table)
+            write_if_changed(path, buffer.getvalue())
+        return cls(np.load(path, mmap_mode="r"))
+
+    def apply(self, rgb: np.ndarray) -> np.ndarray:
+        """Convert an (..., 3) array of 8-bit colours."""
+        rgb = np.asarray(rgb)
+        if self.size == 256:
+            index = rgb.astype(np.intp)
+            return np.asarray(self.table[index[..., 0], index[..., 1], index[..., 2]])
+
+        values = rgb.astype(np.float32)
+        lower = np.clip(np.searchsorted(self.axis, rgb, side="right") - 1, 0, self.size - 2)
+        low_value = self.axis[lower]
+        frac = (values - low_value) / (self.axis[lower + 1] - low_value)
+
+        out = np.zeros(rgb.shape, dtype=np.float32)
+        for corner in range(8):
+            bits = [(corner >> channel) & 1 for channel in range(3)]
+            weight = np.ones(rgb.shape[:-1], dtype=np.float32)
+            index = []
+            for channel, bit in enumerate(bits):
+                weight *= frac[..., channel] if bit else 1 - frac[..., channel]
+                index.append(lower[..., channel] + bit)
+            out += weight[..., None] * self.table[index[0], index[1], index[2]]
+        return np.clip(np.rint(out), 0, 255).astype(np.uint8)
+
+    def convert_hex_many(self, hex_colors: Iterable[str]) -> List[str]:
+        """Hex-string front end to apply(); alpha is preserved like color_utils."""
+        parsed = [_parse_hex(hex_color) for hex_color in hex_colors]
+        if not parsed:
+            return []
+        rgb = np.frombuffer(b"".join(rgb for rgb, _ in parsed), dtype=np.uint8).reshape(-1, 3)
+        converted = self.apply(rgb)
+        return [f"#{bytes(c).hex()}{alpha or ''}" for c, (_, alpha) in zip(converted, parsed)]
+
+
+def _srgb_curve_to_linear(rgb: np.ndarray) -> np.ndarray:
+    v = rgb.astype(np.float64) / 255
+    return np.where(v >= 0.04045, ((v + 0.055) / 1.055) ** 2.4, v / 12.92)
+
+
+def to_lab(rgb: np.ndarray, profile: str) -> np.ndarray:
+    """CIELAB (D65) of 8-bit colours in the Display P3 or sRGB space."""
+    matrix = np.array(icc_profiles.rgb_to_xyz_matrix(_PRIMARIES[profile], icc_profiles.D65_WHITE))
+    xyz = _srgb_curve_to_linear(rgb) @ matrix.T
+    t = xyz / matrix.sum(axis=1)  # relative to the XYZ of RGB white
+    f = np.where(t > (6 / 29) ** 3, np.cbrt(t), t / (3 * (6 / 29) ** 2) + 4 / 29)
+    return np.stack((116 * f[..., 1] - 16, 500 * (f[..., 0] - f[..., 1]), 200 * (f[..., 1] - f[..., 2])), axis=-1)
+
+
+def all_colors() -> np.ndarray:
+    """Every 8-bit RGB colour as a (256³, 3) array."""
+    values = np.arange(256, dtype=np.uint8)
+    return np.stack(np.meshgrid(values, values, values, indexing="ij"), axis=-1).reshape(-1, 3)
+
+
+def accuracy_report(src: str, dst: str, size: int, samples: np.ndarray) -> dict:
+    """Compare a LUT with the LittleCMS transform over ``samples``."""
+    lut = ColorLUT.load(src, dst, size)
+    reference = _transform_array(samples, src, dst)
+    approx = lut.apply(samples)
+    delta_e = np.linalg.norm(to_lab(approx, dst) - to_lab(reference, dst), axis=-1)
+    return {
+        "size": size,
+        "samples": len(samples),
+        "exact": float(np.mean(np.all(approx == reference, axis=-1))),
+        "max_channel_diff": int(np.max(np.abs(approx.astype(np.int16) - reference))),
+        "mean_delta_e": float(delta_e.mean()),
+        "p99_delta_e": float(np.percentile(delta_e, 99)),
+        "max_delta_e": float(delta_e.max()),
+    }
+
+
+def tolerance_failures(report: dict) -> List[str]:
+    """How ``report`` misses the JND-based tolerance; empty if it does not."""
+    failures = []
+    if report["p99_delta_e"] > P99_JNDS * JND_DELTA_E:
+        failures.append(f"p99 ΔE {report['p99_delta_e']:.3f} > {P99_JNDS * JND_DELTA_E:.1f}")
+    if report["max_delta_e"] > MAX_JNDS * JND_DELTA_E:
+        failures.append(f"max ΔE {report['max_delta_e']:.3f} > {MAX_JNDS * JND_DELTA_E:.1f}")
+    return failures
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Bake P3/sRGB lookup tables and report their accuracy.")
+    parser.add_argument("--size", type=int, choices=LUT_SIZES, action="append", help="LUT size (repeatable; default: all)")
+    parser.add_argument("--direction", choices=DIRECTIONS, action="append", help="conversion (repeatable; default: both)")
+    parser.add_argument("--report", action="store_true", help="compare each LUT with LittleCMS over all 256³ colours")
+    args = parser.parse_args()
+
+    samples = all_colors() if args.report else None
+    failed: List[str] = []
+    for direction in args.direction or DIRECTIONS:
+        src, dst = DIRECTIONS[direction]
+        profiles = f"{profile_source(src)} → {profile_source(dst)}"
+        if samples is not None:
+            print(f"{direction}: {profiles}")
+        for size in args.size or LUT_SIZES:
+            path = ColorLUT.cache_path(src, dst, size)
+            ColorLUT.load(src, dst, size)
+            print(f"{direction} {size}: {path}")
+            if samples is not None:
+                r = accuracy_report(src, dst, size, samples)
+                print(
+                    f"  exact {r['exact'] * 100:.1f}%  max channel diff {r['max_channel_diff']}  "
+                    f"ΔE mean {r['mean_delta_e']:.3f}  p99 {r['p99_delta_e']:.3f}  max {r['max_delta_e']:.3f}"
+                )
+                if size in TOLERANCE_SIZES:
+                    failed.extend(f"{direction} {size} ({profiles}): {f}" for f in tolerance_failures(r))
+
+    if failed:
+        print(f"Outside the tolerance of {P99_JNDS}/{MAX_JNDS} JND (ΔE {JND_DELTA_E}) for p99/max:", file=sys.stderr)
+        for line in failed:
+            print(f"  {line}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
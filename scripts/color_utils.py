@@ -6,55 +6,208 @@ Currently provides:
       to sRGB using an ICC transform (Display P3 ➔ sRGB, perceptual intent)
     • srgb_hex_to_displayp3_hex – perceptually maps an sRGB hex colour
       to Display P3 using an ICC transform (sRGB ➔ Display P3, perceptual intent)
+    • displayp3_hex_to_srgb_hex_many / srgb_hex_to_displayp3_hex_many – batch
+      variants that convert any number of colours with a single N×1 image and
+      one transform call
+
+Scripts that convert more than a handful of colours should collect them first
+and use the batch variants; the per-colour functions pay for an image and a
+LittleCMS call for every colour that is not cached yet.
+
+Converted colours are memoized in memory and persisted in
+color-conversions.json under output_writer.cache_dir(), keyed by the content hash of both ICC profiles
+and the rendering intent. Transforms are only built when a colour is missing
+from the cache, so a repeat run over unchanged colours does no ICC work.
+
+ICC profiles are looked up by name ("display-p3", "srgb") when a transform is
+first needed:
+
+    1. a path in the MALTERLIB_DISPLAY_P3_ICC / MALTERLIB_SRGB_ICC environment
+       variable, if set;
+    2. the macOS ColorSync profile, if present (keeps output identical to
+       what has always been generated on macOS);
+    3. the built-in profile from icc_profiles.py (generated Display P3,
+       Pillow's sRGB), so conversion also works on Linux.
+
+Profiles, their hashes and the (source, destination, intent) transforms are
+built once per version of the profile files, identified by path, size and
+modification time, so an edited profile is picked up without a restart.
 
 Requirements: Pillow (with LittleCMS) must be available.
 """
-from PIL import Image, ImageCms
-
-# Paths to system ICC profiles on macOS. If they are missing the script will
-# raise immediately, which is the desired behaviour for our usage.
-P3_PROFILE_PATH = "/System/Library/ColorSync/Profiles/Display P3.icc"
-SRGB_PROFILE_PATH = "/System/Library/ColorSync/Profiles/sRGB Profile.icc"
-
-P3_PROFILE = ImageCms.getOpenProfile(P3_PROFILE_PATH)
-SRGB_PROFILE = ImageCms.getOpenProfile(SRGB_PROFILE_PATH)
-
-# Build transforms and reuse them for all colours.
-# P3 → sRGB transform
-TRANSFORM_P3_TO_SRGB = ImageCms.buildTransformFromOpenProfiles(
-    P3_PROFILE,
-    SRGB_PROFILE,
-    "RGB",
-    "RGB",
-    renderingIntent=ImageCms.Intent.PERCEPTUAL,
-)
-
-# sRGB → P3 transform (inverse)
-TRANSFORM_SRGB_TO_P3 = ImageCms.buildTransformFromOpenProfiles(
-    SRGB_PROFILE,
-    P3_PROFILE,
-    "RGB",
-    "RGB",
-    renderingIntent=ImageCms.Intent.PERCEPTUAL,
-)
+import functools
+import hashlib
+import io
+import json
+import os
+import pathlib
+import re
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
 
+import icc_profiles
+from output_writer import cache_dir, write_text_if_changed
 
-def displayp3_hex_to_srgb_hex(hex_color: str) -> str:
-    """Convert a Display-P3 hex colour (e.g. "#ff00ff" or "#ff00ff80") to sRGB.
+DISPLAY_P3 = "display-p3"
+SRGB = "srgb"
 
-    Parameters
-    ----------
-    hex_color: str
-        Hex string representing a colour in the Display-P3 colourspace
-        (leading '#', 8-bit per channel). Supports both 6-character RGB
-        and 8-character RGBA formats.
+# ImageCms.Intent.PERCEPTUAL; kept as a plain int so that importing this
+# module does not load Pillow.
+RENDERING_INTENT = 0
 
-    Returns
-    -------
-    str
-        Hex string for the perceptually-mapped colour in sRGB.
-        Alpha channel (if present) is preserved unchanged.
+# Where each profile may come from, in order of preference.
+PROFILE_ENV_VARS = {
+    DISPLAY_P3: "MALTERLIB_DISPLAY_P3_ICC",
+    SRGB: "MALTERLIB_SRGB_ICC",
+}
+SYSTEM_PROFILE_PATHS = {
+    DISPLAY_P3: "/System/Library/ColorSync/Profiles/Display P3.icc",
+    SRGB: "/System/Library/ColorSync/Profiles/sRGB Profile.icc",
+}
+BUILTIN_PROFILES: Dict[str, Callable[[], bytes]] = {
+    DISPLAY_P3: icc_profiles.display_p3_profile,
+    SRGB: icc_profiles.srgb_profile,
+}
+
+# Persistent cache of converted colours. Entries are keyed by the SHA-256 of
+# the source and destination profile contents and the rendering intent, so an
+# updated profile simply stops matching its old entries. Delete the file to
+# reclaim the space used by stale entries.
+CACHE_NAME = "color-conversions.json"
+CACHE_VERSION = 1
+
+
+def profile_source(name: str) -> str:
+    """Where the profile ``name`` is loaded from: a file path or "built-in"."""
+    override = os.environ.get(PROFILE_ENV_VARS[name])
+    if override:
+        return override
+    if os.path.exists(SYSTEM_PROFILE_PATHS[name]):
+        return SYSTEM_PROFILE_PATHS[name]
+    return "built-in"
+
+
+# (name, source, st_mtime_ns, st_size) of a profile; the size and time are 0
+# for built-in profiles.
+ProfileStamp = Tuple[str, str, int, int]
+
+
+def _profile_stamp(name: str) -> ProfileStamp:
+    """Identifies the current version of the profile ``name``.
+
+    Looked up on every call, so a long-running process (update_all.py
+    --watch --in-process) sees a profile file that was replaced or edited.
     """
+    source = profile_source(name)
+    if source == "built-in":
+        return (name, source, 0, 0)
+    stat = os.stat(source)
+    return (name, source, stat.st_mtime_ns, stat.st_size)
+
+
+@functools.lru_cache(maxsize=None)
+def _stamped_profile_bytes(stamp: ProfileStamp) -> bytes:
+    name, source = stamp[:2]
+    if source == "built-in":
+        return BUILTIN_PROFILES[name]()
+    return pathlib.Path(source).read_bytes()
+
+
+def _profile_bytes(name: str) -> bytes:
+    return _stamped_profile_bytes(_profile_stamp(name))
+
+
+@functools.lru_cache(maxsize=None)
+def _stamped_profile_hash(stamp: ProfileStamp) -> str:
+    return hashlib.sha256(_stamped_profile_bytes(stamp)).hexdigest()
+
+
+def profile_hash(name: str) -> str:
+    """SHA-256 of the profile ``name`` as resolved by profile_source()."""
+    return _stamped_profile_hash(_profile_stamp(name))
+
+
+@functools.lru_cache(maxsize=None)
+def _stamped_transform(src: ProfileStamp, dst: ProfileStamp, intent: int):
+    from PIL import ImageCms
+
+    return ImageCms.buildTransformFromOpenProfiles(
+        ImageCms.ImageCmsProfile(io.BytesIO(_stamped_profile_bytes(src))),
+        ImageCms.ImageCmsProfile(io.BytesIO(_stamped_profile_bytes(dst))),
+        "RGB",
+        "RGB",
+        renderingIntent=intent,
+    )
+
+
+def get_transform(src: str, dst: str, intent: int = RENDERING_INTENT):
+    """ICC transform between two named profiles, built on first use."""
+    return _stamped_transform(_profile_stamp(src), _profile_stamp(dst), intent)
+
+
+class _ConversionCache:
+    """Converted colours per transform, memoized in memory and kept on disk.
+
+    The file is read on first use. Newly converted colours are merged into
+    whatever is on disk at the time they are saved, so stages running in
+    parallel only ever add to each other's entries.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._tables: Optional[Dict[str, Dict[str, str]]] = None
+
+    @property
+    def path(self) -> pathlib.Path:
+        return cache_dir(self.name)
+
+    def clear(self) -> None:
+        """Forget the in-memory copy; the next lookup reads the file again."""
+        self._tables = None
+
+    def _read(self) -> Dict[str, Dict[str, str]]:
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except (FileNotFoundError, ValueError):
+            return {}
+        if not isinstance(data, dict) or data.get("version") != CACHE_VERSION:
+            return {}
+        return data.get("transforms", {})
+
+    def table(self, key: str) -> Dict[str, str]:
+        if self._tables is None:
+            self._tables = self._read()
+        return self._tables.setdefault(key, {})
+
+    def save(self) -> None:
+        tables = self._read()
+        for key, table in (self._tables or {}).items():
+            tables.setdefault(key, {}).update(table)
+        self._tables = tables
+        data = {"version": CACHE_VERSION, "transforms": tables}
+        try:
+            write_text_if_changed(self.path, json.dumps(data, indent=1, sort_keys=True) + "\n")
+        except OSError:
+            pass  # A read-only checkout still gets the in-memory cache.
+
+
+_CACHE = _ConversionCache(CACHE_NAME)
+
+
+def clear_memory_cache() -> None:
+    """Drop the converted colours held in memory (the file is left alone)."""
+    _CACHE.clear()
+
+
+_HEX_RE = re.compile(r"#?(?:[0-9a-fA-F]{6}|[0-9a-fA-F]{8})")
+
+
+def is_hex_color(value: object) -> bool:
+    """True if ``value`` is a hex colour accepted by the conversion functions."""
+    return isinstance(value, str) and _HEX_RE.fullmatch(value) is not None
+
+
+def _parse_hex(hex_color: str) -> Tuple[bytes, Optional[str]]:
+    """Split a hex colour into its RGB bytes and (unchanged) alpha digits."""
     # Remove leading '#', parse into integer 0–255 triplet.
     hex_str = hex_color.lstrip("#")
 
@@ -67,59 +220,94 @@ def displayp3_hex_to_srgb_hex(hex_color: str) -> str:
     elif len(hex_str) != 6:
         raise ValueError(f"Invalid hex colour: {hex_color}")
 
-    rgb_int = tuple(int(hex_str[i : i + 2], 16) for i in (0, 2, 4))
+    try:
+        return bytes.fromhex(hex_str), alpha_str
+    except ValueError:
+        raise ValueError(f"Invalid hex colour: {hex_color}") from None
 
-    # Build a 1×1 image in Display-P3 RGB and run the ICC transform.
-    img_p3 = Image.new("RGB", (1, 1), rgb_int)
-    img_srgb = ImageCms.applyTransform(img_p3, TRANSFORM_P3_TO_SRGB)
 
-    r, g, b = img_srgb.getpixel((0, 0))
+def _convert_many(hex_colors: Iterable[str], src: str, dst: str) -> List[str]:
+    """Convert every colour from profile ``src`` to profile ``dst``.
 
-    # Append alpha channel if it was present
-    if alpha_str is not None:
-        return f"#{r:02x}{g:02x}{b:02x}{alpha_str}"
-    else:
-        return f"#{r:02x}{g:02x}{b:02x}"
+    Colours found in the conversion cache are not transformed again; the
+    remaining distinct RGB values are converted with one N×1 image and added
+    to the cache. Results are returned in input order with any alpha channel
+    appended unchanged.
+    """
+    parsed = [_parse_hex(hex_color) for hex_color in hex_colors]
+    if not parsed:
+        return []
 
+    key = f"{profile_hash(src)}:{profile_hash(dst)}:{RENDERING_INTENT}"
+    converted_by_rgb = _CACHE.table(key)
 
-def srgb_hex_to_displayp3_hex(hex_color: str) -> str:
-    """Convert an sRGB hex colour (e.g. "#ff00ff" or "#ff00ff80") to Display P3.
+    missing = list(dict.fromkeys(rgb.hex() for rgb, _ in parsed if rgb.hex() not in converted_by_rgb))
+    if missing:
+        from PIL import Image, ImageCms
+
+        # Build an N×1 image holding every new colour and transform it at once.
+        img_src = Image.frombytes("RGB", (len(missing), 1), bytes.fromhex("".join(missing)))
+        converted = ImageCms.applyTransform(img_src, get_transform(src, dst)).tobytes()
+        for i, rgb in enumerate(missing):
+            converted_by_rgb[rgb] = converted[i * 3 : i * 3 + 3].hex()
+        _CACHE.save()
+
+    return [f"#{converted_by_rgb[rgb.hex()]}{alpha_str or ''}" for rgb, alpha_str in parsed]
+
+
+def displayp3_hex_to_srgb_hex_many(hex_colors: Iterable[str]) -> List[str]:
+    """Convert Display-P3 hex colours to sRGB in one transform call.
+
+    Accepts the same formats as displayp3_hex_to_srgb_hex() and returns the
+    converted colours in input order. Raises ValueError if any colour is
+    malformed.
+    """
+    return _convert_many(hex_colors, DISPLAY_P3, SRGB)
+
+
+def srgb_hex_to_displayp3_hex_many(hex_colors: Iterable[str]) -> List[str]:
+    """Convert sRGB hex colours to Display P3 in one transform call.
+
+    Accepts the same formats as srgb_hex_to_displayp3_hex() and returns the
+    converted colours in input order. Raises ValueError if any colour is
+    malformed.
+    """
+    return _convert_many(hex_colors, SRGB, DISPLAY_P3)
+
+
+def displayp3_hex_to_srgb_hex(hex_color: str) -> str:
+    """Convert a Display-P3 hex colour (e.g. "#ff00ff" or "#ff00ff80") to sRGB.
 
     Parameters
     ----------
     hex_color: str
-        Hex string representing a colour in the sRGB colourspace
+        Hex string representing a colour in the Display-P3 colourspace
         (leading '#', 8-bit per channel). Supports both 6-character RGB
         and 8-character RGBA formats.
 
     Returns
     -------
     str
-        Hex string for the perceptually-mapped colour in Display P3.
+        Hex string for the perceptually-mapped colour in sRGB.
         Alpha channel (if present) is preserved unchanged.
     """
-    # Remove leading '#', parse into integer 0–255 triplet.
-    hex_str = hex_color.lstrip("#")
+    return _convert_many((hex_color,), DISPLAY_P3, SRGB)[0]
 
-    # Check for alpha channel
-    alpha_str = None
-    if len(hex_str) == 8:
-        # Extract alpha channel (last 2 characters)
-        alpha_str = hex_str[6:8]
-        hex_str = hex_str[0:6]
-    elif len(hex_str) != 6:
-        raise ValueError(f"Invalid hex colour: {hex_color}")
-
-    rgb_int = tuple(int(hex_str[i : i + 2], 16) for i in (0, 2, 4))
 
-    # Build a 1×1 image in sRGB RGB and run the ICC transform.
-    img_srgb = Image.new("RGB", (1, 1), rgb_int)
-    img_p3 = ImageCms.applyTransform(img_srgb, TRANSFORM_SRGB_TO_P3)
+def srgb_hex_to_displayp3_hex(hex_color: str) -> str:
+    """Convert an sRGB hex colour (e.g. "#ff00ff" or "#ff00ff80") to Display P3.
 
-    r, g, b = img_p3.getpixel((0, 0))
+    Parameters
+    ----------
+    hex_color: str
+        Hex string representing a colour in the sRGB colourspace
+        (leading '#', 8-bit per channel). Supports both 6-character RGB
+        and 8-character RGBA formats.
 
-    # Append alpha channel if it was present
-    if alpha_str is not None:
-        return f"#{r:02x}{g:02x}{b:02x}{alpha_str}"
-    else:
-        return f"#{r:02x}{g:02x}{b:02x}" 
\ No newline at end of file
+    Returns
+    -------
+    str
+        Hex string for the perceptually-mapped colour in Display P3.
+        Alpha channel (if present) is preserved unchanged.
+    """
+    return _convert_many((hex_color,), SRGB, DISPLAY_P3)[0]
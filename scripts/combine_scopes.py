@@ -1,60 +1,78 @@
 #!./.venv/bin/python3
 """
 Combine keywords.json, prefixmap.json, and classifications.json into a single scopes.json file for direct use in the extension.
+
+Also writes classifier.json, the same tables compiled by scope_automaton.py into the flat arrays src/semanticTokens.ts loads.
+
+With MALTERLIB_PRUNE_SCOPES=1 the keywords and prefixes that do not change any classification (see
+scope_pruning.py) are reported and left out of scopes.json and classifier.json, and so out of .clangd. Without it
+the analysis does not run. The variable is a stage option, so the manifest records it and changing it reruns the
+stage.
 """
-import json
-import pathlib
-
-ROOT = pathlib.Path(__file__).resolve().parents[1]
-KEYWORDS = ROOT / "keywords.json"
-PREFIXMAP = ROOT / "prefixmap.json"
-CLASSIFICATIONS = ROOT / "classifications.json"
-OUT_PATH = ROOT / "scopes.json"
-
-with KEYWORDS.open("r", encoding="utf-8") as f:
-    keywords_json = json.load(f)
-with PREFIXMAP.open("r", encoding="utf-8") as f:
-    prefixmap_json = json.load(f)
-with CLASSIFICATIONS.open("r", encoding="utf-8") as f:
-    classifications_json = json.load(f)
-
-# Build keywords: keyword -> scope
-keywords = {}
-for k, v in keywords_json.items():
-    if isinstance(v, dict):
-        if v.get("example"):  # Exclude example keywords
-            continue
-        cls = v.get("classification")
-    else:
-        cls = v
-    scope = classifications_json.get(cls)
-    if scope:
-        keywords[k] = scope
-
-# Build prefixes: prefix -> {scope, variable}
-prefixes = {}
-for prefix, info in prefixmap_json.items():
-    if isinstance(info, dict):
-        cls = info.get("classification")
-        variable = bool(info.get("variable"))
-    else:
-        cls = info
-        variable = False
-    scope = classifications_json.get(cls)
-    if scope:
-        prefixes[prefix] = {"scope": scope, "variable": variable}
-
-# Build scopes (all unique scopes)
-scopes_list = sorted(set(list(keywords.values()) + [v["scope"] for v in prefixes.values()]))
-
-scopes = {
-    "keywords": keywords,
-    "prefixes": prefixes,
-    "scopes": scopes_list
-}
-
-with OUT_PATH.open("w", encoding="utf-8") as f:
-    json.dump(scopes, f, indent=2)
-    f.write("\n")
-
-print(f"Wrote {OUT_PATH.relative_to(ROOT)} with {len(keywords)} keywords, {len(prefixes)} prefixes, {len(scopes_list)} unique scopes.") 
\ No newline at end of file
+import os
+
+from pipeline import Context, run_standalone
+from scope_automaton import compile_classifier, dumps
+from scope_pruning import find_redundant
+
+PRUNE_ENV_VAR = "MALTERLIB_PRUNE_SCOPES"
+
+
+def run(context: Context) -> None:
+    keywords_json = context.load_json("keywords.json")
+    prefixmap_json = context.load_json("prefixmap.json")
+    classifications_json = context.load_json("classifications.json")
+
+    # Build keywords: keyword -> scope
+    keywords = {}
+    for k, v in keywords_json.items():
+        if isinstance(v, dict):
+            if v.get("example"):  # Exclude example keywords
+                continue
+            cls = v.get("classification")
+        else:
+            cls = v
+        scope = classifications_json.get(cls)
+        if scope:
+            keywords[k] = scope
+
+    # Build prefixes: prefix -> {scope, variable}
+    prefixes = {}
+    for prefix, info in prefixmap_json.items():
+        if isinstance(info, dict):
+            cls = info.get("classification")
+            variable = bool(info.get("variable"))
+        else:
+            cls = info
+            variable = False
+        scope = classifications_json.get(cls)
+        if scope:
+            prefixes[prefix] = {"scope": scope, "variable": variable}
+
+    # Build scopes (all unique scopes)
+    scopes_list = sorted(set(list(keywords.values()) + [v["scope"] for v in prefixes.values()]))
+
+    scopes = {
+        "keywords": keywords,
+        "prefixes": prefixes,
+        "scopes": scopes_list
+    }
+
+    if os.environ.get(PRUNE_ENV_VAR) == "1":
+        pruning = find_redundant(scopes, classifications_json)
+        for line in pruning.report(scopes):
+            print(line)
+        scopes = pruning.apply(scopes)
+        keywords, prefixes, scopes_list = scopes["keywords"], scopes["prefixes"], scopes["scopes"]
+
+    context.write_json("scopes.json", scopes)
+
+    classifier = compile_classifier(scopes, classifications_json)
+    context.write_text("classifier.json", dumps(classifier), classifier)
+
+    print(f"Wrote scopes.json with {len(keywords)} keywords, {len(prefixes)} prefixes, {len(scopes_list)} unique scopes.")
+    print(f"Wrote classifier.json with {len(classifier['prefixes']['scope'])} trie states.")
+
+
+if __name__ == "__main__":
+    run_standalone(run)
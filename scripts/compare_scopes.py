@@ -1,7 +1,5 @@
 #!./.venv/bin/python3
-import json
-import re
-import json5
+from pipeline import Context, run_standalone
 
 # Scopes that should be ignored in the comparison (not reported as missing)
 EXCEPTION_SCOPES = {
@@ -20,22 +18,9 @@ EXCEPTION_SCOPES = {
     "malterlib.unknown"
 }
 
-def clean_json_comments_and_commas(content):
-    """Remove JavaScript-style comments, trailing commas, and tabs from JSON content"""
-    # Remove single-line comments
-    content = re.sub(r'//.*$', '', content, flags=re.MULTILINE)
-    # Remove multi-line comments (if any)
-    content = re.sub(r'/\*.*?\*/', '', content, flags=re.DOTALL)
-    # Remove trailing commas before }} or ]]
-    content = re.sub(r',\s*([}\]])', r'\1', content)
-    # Replace tabs with spaces
-    content = content.replace('\t', '    ')
-    return content
-
-def extract_theme_scopes():
-    """Extract all malterlib.* scopes from the theme file using json5 for relaxed parsing"""
-    with open('themes/malterlib.json', 'r') as f:
-        theme_data = json5.load(f)
+def extract_theme_scopes(context):
+    """Extract all malterlib.* scopes from the theme file (JSON5)"""
+    theme_data = context.load_json('themes/malterlib.json', relaxed=True)
     
     theme_scopes = set()
     
@@ -51,10 +36,9 @@ def extract_theme_scopes():
     
     return theme_scopes
 
-def extract_package_scopes():
+def extract_package_scopes(context):
     """Extract all malterlib.* scopes from package.json semanticTokenScopes"""
-    with open('package.json', 'r') as f:
-        package_data = json.load(f)
+    package_data = context.load_json('package.json')
     
     package_scopes = set()
     
@@ -68,9 +52,9 @@ def extract_package_scopes():
     
     return package_scopes
 
-def main():
-    theme_scopes = extract_theme_scopes()
-    package_scopes = extract_package_scopes()
+def run(context: Context) -> None:
+    theme_scopes = extract_theme_scopes(context)
+    package_scopes = extract_package_scopes(context)
     
     print("=== SCOPE COMPARISON ===")
     print(f"Total scopes in theme: {len(theme_scopes)}")
@@ -92,4 +76,4 @@ def main():
     print()
     
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    run_standalone(run) 
\ No newline at end of file
@@ -3,12 +3,9 @@
 Convert themes/malterlib.json from Display P3 to sRGB color space.
 Creates themes/malterlibSRGB.json with converted colors.
 """
-import json
-import json5
-import pathlib
-
 # Import the utility function for colour conversion.
-from color_utils import displayp3_hex_to_srgb_hex
+from color_utils import displayp3_hex_to_srgb_hex_many
+from pipeline import Context, run_standalone
 
 def convert_colors_in_object(obj, convert_func, is_colors_object=False):
     """Recursively convert colors in an object"""
@@ -32,20 +29,29 @@ def convert_colors_in_object(obj, convert_func, is_colors_object=False):
     else:
         return obj
 
-def main():
+def run(context: Context) -> None:
     # Define paths
-    root = pathlib.Path(__file__).resolve().parents[1]
+    root = context.root
     input_path = root / "themes" / "malterlib.json"
     output_path = root / "themes" / "malterlibSRGB.json"
 
     print(f"Converting {input_path} to sRGB...")
 
     # Read the theme file
-    with open(input_path, 'r') as f:
-        theme_data = json5.load(f)
+    theme_data = context.load_json("themes/malterlib.json", relaxed=True)
+
+    # Collect every colour first, then convert them all in one transform call
+    found_colors = []
+
+    def collect(color):
+        found_colors.append(color)
+        return color
+
+    convert_colors_in_object(theme_data, collect)
+    srgb_by_color = dict(zip(found_colors, displayp3_hex_to_srgb_hex_many(found_colors)))
 
     # Convert colors in the theme
-    converted_theme = convert_colors_in_object(theme_data, displayp3_hex_to_srgb_hex)
+    converted_theme = convert_colors_in_object(theme_data, srgb_by_color.__getitem__)
 
     # Update the theme name and add color space info
     if isinstance(converted_theme, dict):
@@ -55,40 +61,15 @@ def main():
         converted_theme['colorSpace'] = 'srgb'
 
     # Write the converted theme
-    with open(output_path, 'w') as f:
-        json.dump(converted_theme, f, indent=4)
+    context.write_json("themes/malterlibSRGB.json", converted_theme, indent=4, trailing_newline=False)
 
     print(f"✅ Converted theme saved to {output_path}")
 
     # Report statistics
-    original_colors = 0
-    converted_colors = 0
-
-    def count_colors(obj, is_colors_object=False):
-        nonlocal original_colors, converted_colors
-        if isinstance(obj, dict):
-            for k, v in obj.items():
-                # Count colors in top-level "colors" object
-                if is_colors_object and isinstance(v, str) and v.startswith("#"):
-                    original_colors += 1
-                    converted_colors += 1
-                # Count colors in tokenColors (foreground/background)
-                elif k in ["foreground", "background"] and isinstance(v, str) and v.startswith("#"):
-                    original_colors += 1
-                    converted_colors += 1
-                # Special handling for the "colors" key
-                elif k == "colors" and isinstance(v, dict):
-                    count_colors(v, is_colors_object=True)
-                else:
-                    count_colors(v, is_colors_object=False)
-        elif isinstance(obj, list):
-            for item in obj:
-                count_colors(item, is_colors_object=False)
-
-    count_colors(theme_data)
+    original_colors = converted_colors = len(found_colors)
 
     print(f"Found {original_colors} colors in the theme")
     print(f"Converted {converted_colors} colors from Display P3 to sRGB using ICC perceptual mapping")
 
 if __name__ == "__main__":
-    main()
+    run_standalone(run)
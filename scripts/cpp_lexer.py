@@ -0,0 +1,124 @@
+"""cpp_lexer.py
+Streaming tokenizer for the subset of C++ used by the Highlighterr sources.
+
+The lexer is a single master regex applied with finditer() over bytes (a
+memory map works), so tokens are produced lazily. Every alternative either
+matches or fails after looking at a bounded number of characters, and
+unterminated strings and comments simply extend to the end of the input, so
+lexing is linear in the input size whatever the input looks like.
+
+Token kinds:
+
+    IDENT       identifiers and keywords
+    STRING      "..." (value is the contents, escapes left as written), and
+                raw strings R"delim(...)delim"
+    CHAR        '...'
+    NUMBER      pp-numbers (1'000, 0x1F, 1.5e-3f, ...)
+    SCOPE       ::
+    PUNCT       any other single character: { } ( ) , ; = ...
+    COMMENT     // and /* */ comments (value is the whole comment)
+    DIRECTIVE   a preprocessor line, including continuation lines
+
+Whitespace is skipped. tokens() additionally drops everything inside
+"#if 0" regions (including their nested conditionals) up to the matching
+#else, #elif or #endif.
+"""
+from __future__ import annotations
+
+import re
+from typing import Any, Iterator, List, NamedTuple, Tuple
+
+IDENT = "IDENT"
+STRING = "STRING"
+CHAR = "CHAR"
+NUMBER = "NUMBER"
+SCOPE = "SCOPE"
+PUNCT = "PUNCT"
+COMMENT = "COMMENT"
+DIRECTIVE = "DIRECTIVE"
+
+_TOKEN_RE = re.compile(
+    rb"(?P<directive>(?<![^\n])[ \t]*\#(?:[^\n\\]|\\[\s\S])*)"
+    # A newline also takes the next line's indentation, unless a directive follows.
+    rb"|(?P<ws>[ \t\r\f\v]*\n(?:[ \t]*(?=[^ \t\#\n]))?|[ \t\r\f\v]+)"
+    rb"|(?P<comment>//[^\n]*|/\*[\s\S]*?(?:\*/|\Z))"
+    rb"|(?P<raw>(?:u8|[uUL])?R\"(?P<delim>[^()\\\s\"]{0,16})\((?P<raw_body>[\s\S]*?)(?:\)(?P=delim)\"|\Z))"
+    rb"|(?:u8|[uUL])?\"(?P<string>(?:[^\"\\\n]|\\[\s\S])*)\"?"
+    rb"|(?P<char>(?:u8|[uUL])?'(?:[^'\\\n]|\\[\s\S])*'?)"
+    rb"|(?P<ident>[A-Za-z_$][A-Za-z0-9_$]*)"
+    rb"|(?P<number>\.?[0-9](?:[eEpP][+-]|[A-Za-z0-9_.']|'[0-9A-Za-z])*)"
+    rb"|(?P<scope>::)"
+    rb"|(?P<punct>[\s\S])"
+)
+
+_KINDS = {
+    "directive": DIRECTIVE,
+    "comment": COMMENT,
+    "char": CHAR,
+    "ident": IDENT,
+    "number": NUMBER,
+    "scope": SCOPE,
+    "punct": PUNCT,
+}
+# Token kinds that may span lines (strings cannot contain a raw newline).
+_MULTILINE = {"directive", "comment", "raw"}
+
+_CONDITIONAL_RE = re.compile(rb"[ \t]*#[ \t]*(if|ifdef|ifndef|elif|else|endif)\b[ \t]*([^\n]*)")
+
+
+class Token(NamedTuple):
+    kind: str
+    value: bytes
+    line: int  # 1-based line of the token's first character
+
+
+def raw_tokens(source: Any) -> Iterator[Token]:
+    """All tokens in ``source`` (bytes-like), including those in #if 0 regions."""
+    line = 1
+    for m in _TOKEN_RE.finditer(source):
+        kind = m.lastgroup
+        if kind == "ws":
+            if b"\n" in m.group(0):
+                line += 1
+            continue
+        if kind == "string":
+            yield Token(STRING, m.group("string"), line)
+            continue
+        text = m.group(0)
+        if kind == "raw":
+            yield Token(STRING, m.group("raw_body"), line)
+        else:
+            yield Token(_KINDS[kind], text, line)
+        if kind in _MULTILINE:
+            line += text.count(b"\n")
+
+
+def _is_false(condition: bytes) -> bool:
+    condition = condition.split(b"//")[0].split(b"/*")[0].strip()
+    return condition in (b"0", b"false", b"(0)")
+
+
+def tokens(source: Any) -> Iterator[Token]:
+    """Tokens of ``source`` outside "#if 0" regions."""
+    # One entry per open conditional: whether the enclosing code is skipped,
+    # and whether the current branch is.
+    stack: List[Tuple[bool, bool]] = []
+    for token in raw_tokens(source):
+        if token.kind == DIRECTIVE:
+            m = _CONDITIONAL_RE.match(token.value)
+            if m:
+                directive, condition = m.group(1), m.group(2)
+                if directive in (b"if", b"ifdef", b"ifndef"):
+                    outer = bool(stack) and stack[-1][1]
+                    stack.append((outer, outer or (directive == b"if" and _is_false(condition))))
+                elif directive in (b"elif", b"else") and stack:
+                    # Only literal false conditions are evaluated; any other
+                    # branch is kept.
+                    outer = stack[-1][0]
+                    stack[-1] = (outer, outer or (directive == b"elif" and _is_false(condition)))
+                elif directive == b"endif" and stack:
+                    stack.pop()
+                continue
+        if stack and stack[-1][1]:
+            continue
+        yield token
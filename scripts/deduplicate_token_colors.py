@@ -1,12 +1,13 @@
 #!./.venv/bin/python3
 import json
-import json5
 from collections import defaultdict
 
-def load_color_order():
+from pipeline import Context, StageError, run_standalone
+from theme_resolver import differences, emitted_scopes, parse_rules
+
+def load_color_order(context):
     """Load the color order from colorexamples.json"""
-    with open('colorexamples.json', 'r') as f:
-        color_examples = json.load(f)
+    color_examples = context.load_json('colorexamples.json')
     
     # Create a mapping of color (lowercase) to its position in the array
     color_order = {}
@@ -87,14 +88,14 @@ def deduplicate_token_colors(theme_data):
     
     return new_token_colors
 
-def main():
+def run(context: Context) -> None:
     # Load color order
-    color_order = load_color_order()
+    color_order = load_color_order(context)
     print(f"Loaded {len(color_order)} colors from colorexamples.json")
     
     # Read the theme file
-    with open('themes/malterlib.json', 'r') as f:
-        theme_data = json5.load(f)
+    # Shallow copy: the parsed theme is shared with other stages in this context
+    theme_data = dict(context.load_json('themes/malterlib.json', relaxed=True))
     
     # Get original count
     original_count = len(theme_data.get('tokenColors', []))
@@ -118,12 +119,22 @@ def main():
     # Sort token colors by priority
     new_token_colors.sort(key=lambda x: get_token_color_priority(x, color_order))
     
+    # Merging and sorting move rules, which can change which of two equally specific rules wins;
+    # leave the theme untouched unless every scope still resolves to the same style
+    probe_count, changed = differences(
+        parse_rules(theme_data.get('tokenColors', [])), parse_rules(new_token_colors), emitted_scopes(context))
+    if changed:
+        lines = [f"Error: {len(changed)} of {probe_count} scope/parent probes would resolve differently after merging; "
+                 f"themes/malterlib.json left unchanged:"]
+        for (chain, scope), before, after in changed[:20]:
+            lines.append(f"  {' '.join(chain + (scope,))}: {before[1]} -> {after[1]}")
+        raise StageError("\n".join(lines))
+
     # Update the theme data
     theme_data['tokenColors'] = new_token_colors
     
     # Write back to file
-    with open('themes/malterlib.json', 'w') as f:
-        json.dump(theme_data, f, indent=4)
+    context.write_json('themes/malterlib.json', theme_data, indent=4, trailing_newline=False)
     
     # Report statistics
     print(f"Original tokenColors entries: {original_count}")
@@ -156,6 +167,8 @@ def main():
     else:
         print(f"\n✅ No duplicate scopes found - all scopes were unique")
     
+    print(f"\n✅ All {probe_count} scope/parent probes resolve to the same style")
+
     print("\nFirst 10 entries after sorting:")
     for i, token_color in enumerate(new_token_colors[:10]):
         settings = token_color.get('settings', {})
@@ -177,4 +190,4 @@ def main():
             print(f"      First scope: {scopes[0]}")
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    run_standalone(run) 
\ No newline at end of file
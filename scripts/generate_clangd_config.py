@@ -10,11 +10,31 @@ The rules replicate (approximately) the runtime classification logic found in
 src/extension.ts – namely:
   1. Exact keyword matches.
   2. Prefix based matches (variable vs non-variable).  Longer prefixes have
-     precedence.
+     precedence, so a scope's prefixes share one rule only where that keeps
+     every shorter prefix behind the longer ones it overlaps.
   3. Two special-case prefixes handled in the TypeScript:
         – "E"  → enum (identifiers must not contain an underscore)
         – "CF" → CoreFoundation types that end with "Ref"
 
+The rules come from classifier.build_rules(), which scope_pruning.py shares.
+The alternation inside each rule is factored by regex_trie.py (common
+prefixes, character classes, optional leading characters) and checked to
+accept the same identifiers as the flat alternation before anything is
+written; benchmarks/bench_clangd_rules.py times the two.
+
+With .clangd-template, the rules tagged in its kind-specific sections
+(Parameter, Field, ...) are filled in there, so tokens of those kinds are
+resolved by them first. The Unknown section, which clangd falls back to for
+every token kind, is the catch-all and gets every rule: clangd can report any
+identifier as Unknown (a dependent name) or as a kind its scope does not
+suggest, so no rule is left out of it.
+
+The rules of the Unknown section are ordered by identifier-profile.json, the
+committed canonical profile (see identifier_profile.py), so that those
+matching the most profiled identifiers come first. rule_order.py finds every pair of rules with
+different scopes that can match the same identifier, and those pairs keep
+their order, so the first matching rule is the same for every identifier.
+
 Each distinct Malterlib TextMate scope is assigned a *unique* set of modifiers
 (Custom0 … Custom10).  Since 11 modifiers can encode 2¹¹ – 1 distinct sets,
 this easily covers all existing scopes while satisfying clangd's requirement
@@ -25,34 +45,16 @@ Running the script:
 """
 from __future__ import annotations
 
-import json
-import pathlib
 import re
-import sys
-from typing import Dict, List, Tuple
+from itertools import combinations
+from typing import Dict, List, Set, Tuple
 from collections import defaultdict
 
-ROOT = pathlib.Path(__file__).resolve().parents[1]
-SCOPES_JSON = ROOT / "scopes.json"
-CLANGD_YAML = ROOT / ".clangd"
-SEMANTIC_SCOPES_JSON = ROOT / "semanticScopesForPackage.json"
-
-if not SCOPES_JSON.exists():
-    print(f"Error: {SCOPES_JSON} not found", file=sys.stderr)
-    sys.exit(1)
-
-# ---------------------------------------------------------------------------
-# Load scopes.json (combined data used by the VS Code extension)
-# ---------------------------------------------------------------------------
-with SCOPES_JSON.open(encoding="utf-8") as fp:
-    data = json.load(fp)
-
-keywords: Dict[str, str] = data.get("keywords", {})  # identifier -> scope
-prefixes: Dict[str, Dict[str, object]] = data.get("prefixes", {})
-
-# Collect all distinct scope strings deterministically
-prefix_scope_values: List[str] = [str(info.get("scope", "")) for info in prefixes.values()]
-all_scopes: List[str] = sorted(set(list(keywords.values()) + prefix_scope_values))
+from classifier import ClangdRules, build_rules
+from identifier_profile import PROFILE_NAME, PROFILE_VERSION
+from pipeline import Context, StageError, run_standalone
+from regex_trie import finite_language
+from rule_order import evaluations_per_token, order_rules, precedence
 
 # ---------------------------------------------------------------------------
 # Helper: assign each unique scope a unique *set* of CustomX modifiers.
@@ -60,135 +62,132 @@ all_scopes: List[str] = sorted(set(list(keywords.values()) + prefix_scope_values
 # Maximum number of modifiers that clangd currently supports (Custom0 … Custom8)
 MAX_AVAILABLE_MODIFIERS = 9
 
-# ---------------------------------------------------------------------------
-# Determine the *minimal* number of modifiers required to uniquely encode the
-# set of scopes.  With _m_ modifiers we can form (2^m − 1) non-empty unique
-# sets, so we pick the smallest _m_ that satisfies that capacity.
-# ---------------------------------------------------------------------------
-
-num_scopes = len(all_scopes)
-# Compute the minimal m such that (2**m - 1) >= num_scopes
-required_modifiers = 0
-while (1 << required_modifiers) - 1 < num_scopes:
-    required_modifiers += 1
-
-if required_modifiers > MAX_AVAILABLE_MODIFIERS:
-    print(
-        f"Error: {num_scopes} scopes exceed encoding capacity of {MAX_AVAILABLE_MODIFIERS} modifiers",
-        file=sys.stderr,
-    )
-    sys.exit(1)
-
-# We will only use Custom0 … Custom{required_modifiers-1}
-USED_MODIFIERS = required_modifiers
-
-# ---------------------------------------------------------------------------
-# Build regex rules mirroring the TypeScript classifier logic (without mods yet).
-# ---------------------------------------------------------------------------
-RULES: List[Tuple[str, str]] = []  # (regex, scope) – modifiers assigned later
-
-# 1. Exact keyword rules (grouped per scope) – highest precedence
-scope_to_keywords: Dict[str, List[str]] = defaultdict(list)
-for kw, scope in keywords.items():
-    scope_to_keywords[scope].append(kw)
-
-for scope, kw_list in sorted(scope_to_keywords.items()):
-    kw_list_sorted = sorted(kw_list)
-    joined = "|".join(re.escape(k) for k in kw_list_sorted)
-    if '|' in joined:
-        regex = rf"^({joined})$"
-    else:
-        regex = rf"^{joined}$"
-    RULES.append((regex, scope))
-
-# 2. Prefix rules – processed below and appended to RULES as they are generated
-
-# Pre-computed character class for concept chars used by matchVariablePrefix in TS
-CONCEPT_CHARS = "binpfro"
-CONCEPT_CLASS = f"[{CONCEPT_CHARS}]"
 
-# Group prefix regexes per scope for merging
-scope_to_prefix_regexes: Dict[str, List[str]] = defaultdict(list)
+def required_modifier_count(num_scopes: int) -> int:
+    """Determine the *minimal* number of modifiers required to uniquely encode
+    ``num_scopes`` scopes.  With _m_ modifiers we can form (2^m − 1) non-empty
+    unique sets, so we pick the smallest _m_ that satisfies that capacity.
+    """
+    required_modifiers = 0
+    while (1 << required_modifiers) - 1 < num_scopes:
+        required_modifiers += 1
 
-PREFIX_ENTRIES = sorted(prefixes.items(), key=lambda kv: len(kv[0]), reverse=True)
+    if required_modifiers > MAX_AVAILABLE_MODIFIERS:
+        raise StageError(
+            f"Error: {num_scopes} scopes exceed encoding capacity of {MAX_AVAILABLE_MODIFIERS} modifiers"
+        )
+    return required_modifiers
 
-for prefix, info in PREFIX_ENTRIES:
-    variable = bool(info["variable"])  # type: ignore[index]
-    default_scope = str(info.get("scope", ""))
 
-    if prefix == "E":
-        # Positive special-case: (enumerator scope from JSON)
-        general_regex = r"^E[A-Z][A-Za-z0-9_]*_[A-Za-z0-9_]*$"
-        scope_to_prefix_regexes[default_scope].append(general_regex)
+# Positive and negative samples the factored prefix rules are checked on,
+# appended to every prefix: each tail accepted by one of the rules, and
+# near misses.
+PREFIX_SAMPLE_TAILS = (
+    "", "A", "Z", "0", "a", "_", "bA", "pTest", "oX_1", "zTest", "Test", "Test_Value", "TestRef", "Test_Ref",
+    "T1", "Ref", "TestRefs", "test", "_Test", "Te-st",
+)
 
-        # General rule enum type (no underscore)
-        enum_regex = r"^E[A-Z][A-Za-z0-9]*$"  # no underscore allowed
-        scope_to_prefix_regexes["malterlib-enum"].append(enum_regex)
-        continue
 
-    if prefix == "CF":
-        # Positive special-case: CoreFoundation type ending in Ref
-        cf_type_regex = r"^CF[A-Z][A-Za-z0-9_]*Ref$"
-        scope_to_prefix_regexes["malterlib-type"].append(cf_type_regex)
+# Header of a kind-specific section in .clangd-template, e.g. "    Type|Class:"
+SECTION_HEADER_RE = re.compile(r"^\s+([A-Za-z]+(?:\|[A-Za-z]+)*):\s*$")
 
-        # General CF rule (function scope from JSON)
-        general_regex = r"^CF[A-Z][A-Za-z0-9_]*$"
-        scope_to_prefix_regexes[default_scope].append(general_regex)
-        continue
 
-    escaped = re.escape(prefix)
-    if variable:
-        regex = rf"^{escaped}({CONCEPT_CLASS}?[A-Z][A-Za-z0-9_]*)$"
-    else:
-        regex = rf"^{escaped}[A-Z][A-Za-z0-9_]*$"
-
-    scope_to_prefix_regexes[default_scope].append(regex)
-
-# Combine and append to RULES list preserving scope insertion ordering
-for scope, regex_list in scope_to_prefix_regexes.items():
-    if not regex_list:
-        continue
-    stripped = [r[1:-1] if r.startswith("^") and r.endswith("$") else r for r in regex_list]
-    joined = "|".join(stripped)
-    if '|' in joined:
-        combined_regex = rf"^({joined})$"
-    else:
-        combined_regex = rf"^{joined}$"
-    RULES.append((combined_regex, scope))
+def verify_rules(
+    original: List[Tuple[str, str]], optimized: List[Tuple[str, str]], keywords: Dict[str, str],
+    prefixes: Dict[str, Dict[str, object]],
+) -> int:
+    """Check that ``optimized`` accepts the same identifiers as ``original``, rule by rule.
 
-# ---------------------------------------------------------------------------
-# Assign modifier sets sequentially based on rule appearance.
-# ---------------------------------------------------------------------------
-
-# Generate the concrete modifier names that will actually be used
-MOD_NAMES = [f"Custom{i}" for i in range(USED_MODIFIERS)]
+    Keyword rules have finite languages, which are compared exactly. Prefix
+    rules are compared on every prefix followed by PREFIX_SAMPLE_TAILS, and all
+    rules on every keyword with a character added, removed or changed.
+    Returns the number of samples; raises StageError on the first difference.
+    """
+    samples = set(keywords)
+    for keyword in keywords:
+        samples.update((keyword[:-1], keyword[1:], keyword + "x", keyword + "_", keyword.upper(), "x" + keyword))
+    samples.update(prefix + tail for prefix in prefixes for tail in PREFIX_SAMPLE_TAILS)
+    ordered = sorted(samples)
+
+    keyword_rule_count = len({scope for scope in keywords.values()})
+    for index, ((before, scope), (after, _)) in enumerate(zip(original, optimized)):
+        if index < keyword_rule_count:
+            expected = {k for k, s in keywords.items() if s == scope}
+            if finite_language(after[1:-1]) != expected:
+                raise StageError(f"Optimized keyword rule for {scope} does not match exactly its keywords: {after}")
+        before_re = re.compile(before)
+        after_re = re.compile(after)
+        for sample in ordered:
+            if bool(before_re.match(sample)) != bool(after_re.match(sample)):
+                raise StageError(f"Optimized rule for {scope} differs on {sample!r}: {before} vs {after}")
+    return len(ordered)
+
+
+def order_by_profile(
+    final_rules: List[Tuple[str, List[str], str]], profile: Dict[str, object]
+) -> List[Tuple[str, List[str], str]]:
+    """``final_rules``, those matching most identifiers in ``profile`` first.
+
+    Rules that overlap with a different scope keep their relative order (see
+    rule_order.py), and the result is checked to classify every profiled
+    identifier as before.
+    """
+    if profile.get("version") != PROFILE_VERSION:
+        raise StageError(f"Error: {PROFILE_NAME} has an unsupported version; regenerate it with identifier_profile.py")
+    identifiers: Dict[str, int] = profile.get("identifiers", {})  # type: ignore[assignment]
+
+    rules = [(regex, scope) for regex, _, scope in final_rules]
+    matcher = ClangdRules(rules)
+    first_matches: Dict[int, int] = defaultdict(int)
+    for name, count in identifiers.items():
+        first_matches[matcher.first_match(name)] += count
+
+    pairs = precedence(rules)
+    order = order_rules([first_matches.get(i, 0) for i in range(len(rules))], pairs)
+    ordered = [final_rules[i] for i in order]
+
+    reordered_matcher = ClangdRules([(regex, scope) for regex, _, scope in ordered])
+    for name in identifiers:
+        if reordered_matcher.classify(name) != matcher.classify(name):
+            raise StageError(f"Error: reordering the rules changes the scope of {name!r}")
+
+    before = evaluations_per_token(first_matches, range(len(rules)))
+    after = evaluations_per_token(first_matches, order)
+    print(
+        f"Ordered {len(rules)} Unknown rules by {PROFILE_NAME} ({sum(first_matches.values())} tokens, "
+        f"{len(pairs)} overlapping pairs kept in order): "
+        f"{before:.1f} -> {after:.1f} regex evaluations per token"
+    )
+    return ordered
 
-from itertools import combinations
 
-def modifier_combo_generator():
+def modifier_combo_generator(mod_names: List[str]):
     """Yield unique modifier combinations (order-independent, no repeats):
     singles, then pairs, triples, etc. Each list is sorted.
     """
-    for r in range(1, USED_MODIFIERS + 1):
-        for combo in combinations(MOD_NAMES, r):
+    for r in range(1, len(mod_names) + 1):
+        for combo in combinations(mod_names, r):
             yield list(combo)
 
-# Assign mods per first appearance of scope
-scope_to_mods_assigned: Dict[str, List[str]] = {}
-combo_iter = modifier_combo_generator()
 
-FINAL_RULES: List[Tuple[str, List[str], str]] = []
-for regex, scope in RULES:
-    mods = scope_to_mods_assigned.get(scope)
-    if mods is None:
-        mods = next(combo_iter)
-        scope_to_mods_assigned[scope] = mods
-    FINAL_RULES.append((regex, mods, scope))
+def assign_modifiers(rules: List[Tuple[str, str]], used_modifiers: int) -> List[Tuple[str, List[str], str]]:
+    """Assign modifier sets sequentially based on rule appearance."""
+    # Generate the concrete modifier names that will actually be used
+    mod_names = [f"Custom{i}" for i in range(used_modifiers)]
+
+    # Assign mods per first appearance of scope
+    scope_to_mods_assigned: Dict[str, List[str]] = {}
+    combo_iter = modifier_combo_generator(mod_names)
+
+    final_rules: List[Tuple[str, List[str], str]] = []
+    for regex, scope in rules:
+        mods = scope_to_mods_assigned.get(scope)
+        if mods is None:
+            mods = next(combo_iter)
+            scope_to_mods_assigned[scope] = mods
+        final_rules.append((regex, mods, scope))
+    return final_rules
 
-# ---------------------------------------------------------------------------
-# Write .clangd YAML – use template if available
-# ---------------------------------------------------------------------------
-TEMPLATE_PATH = ROOT / ".clangd-template"
 
 def build_unknown_section(remaining_rules: List[Tuple[str, List[str], str]]) -> List[str]:
     unknown_lines: List[str] = ["    Unknown:"]
@@ -199,33 +198,42 @@ def build_unknown_section(remaining_rules: List[Tuple[str, List[str], str]]) ->
         unknown_lines.append(f"        add: [{', '.join(mods)}]  # {scope_comment}")
     return unknown_lines
 
-if TEMPLATE_PATH.exists():
-    template_lines = TEMPLATE_PATH.read_text(encoding="utf-8").splitlines()
 
-    # Map scope -> list of (regex, mods) so we can pop as we consume
-    from collections import defaultdict as _dd
+def render_template(
+    template_lines: List[str], final_rules: List[Tuple[str, List[str], str]]
+) -> Tuple[List[str], Dict[int, Set[str]]]:
+    """Fill the kind-specific sections of .clangd-template with generated rules.
 
-    scope_to_remaining: Dict[str, List[Tuple[str, List[str]]]] = _dd(list)
-    for regex, mods, scope in FINAL_RULES:
-        scope_to_remaining[scope].append((regex, mods))
+    Returns the lines and, per index in ``final_rules``, the token kinds of
+    the sections the rule was placed in.
+    """
+    # Map scope -> indices of its rules so we can pop as we consume
+    scope_to_remaining: Dict[str, List[int]] = defaultdict(list)
+    for index, (_, _, scope) in enumerate(final_rules):
+        scope_to_remaining[scope].append(index)
 
+    placements: Dict[int, Set[str]] = defaultdict(set)
+    section_kinds: List[str] = []
     output_lines: List[str] = []
     i = 0
     while i < len(template_lines):
         line = template_lines[i]
         stripped = line.lstrip()
+        header_match = SECTION_HEADER_RE.match(line)
+        if header_match:
+            section_kinds = header_match.group(1).split("|")
         if stripped.startswith("- regex:") and (i + 1) < len(template_lines):
             add_line = template_lines[i + 1]
-            # Detect scope comment on add_line
+            # Detect scope comment on add_line (dotted, like the TextMate scope)
             comment_match = re.search(r"#\s*([A-Za-z0-9_.-]+)", add_line)
             if comment_match:
                 scope_tag = comment_match.group(1)
-                # Fetch next (regex, mods) for this scope if available
-                pair = None
-                if scope_to_remaining.get(scope_tag):
-                    pair = scope_to_remaining[scope_tag].pop(0)
-                if pair:
-                    regex_val, mods_val = pair
+                # Fetch next rule for this scope if available
+                remaining = scope_to_remaining.get(scope_tag.replace(".", "-"))
+                if remaining:
+                    index = remaining.pop(0)
+                    regex_val, mods_val, _ = final_rules[index]
+                    placements[index].update(section_kinds)
                     # Build new regex and add lines preserving indentation
                     regex_indent = line[: line.index("- regex:")]
                     regex_yaml = regex_val.replace("'", "''")
@@ -243,43 +251,86 @@ if TEMPLATE_PATH.exists():
         output_lines.append(line)
         i += 1
 
-    # Always append an Unknown section containing *all* rules
-    output_lines.extend(build_unknown_section([(r, m, s) for r, m, s in FINAL_RULES]))
+    return output_lines, placements
+
+
+def build_semantic_scopes(final_rules: List[Tuple[str, List[str], str]]) -> Dict[str, object]:
+    """Map each modifier selector back to its TextMate scope for package.json."""
+    selector_to_textmate: Dict[str, List[str]] = {}
+    for _, mods, scope in final_rules:
+        selector = "*." + ".".join(m.lower() for m in mods)
+        textmate_scope = scope.replace("-", ".")
+        scopes_list = selector_to_textmate.setdefault(selector, [])
+        if textmate_scope not in scopes_list:
+            scopes_list.append(textmate_scope)
+
+    return {
+        "semanticTokenScopes": [
+            {
+                "language": "cpp",
+                "scopes": selector_to_textmate,
+            }
+        ]
+    }
+
+
+def run(context: Context) -> None:
+    if not context.exists("scopes.json"):
+        raise StageError(f"Error: {context.path('scopes.json')} not found")
+
+    # -----------------------------------------------------------------------
+    # Load scopes.json (combined data used by the VS Code extension)
+    # -----------------------------------------------------------------------
+    data = context.load_json("scopes.json")
+
+    keywords: Dict[str, str] = data.get("keywords", {})  # identifier -> scope
+    prefixes: Dict[str, Dict[str, object]] = data.get("prefixes", {})
+
+    # Collect all distinct scope strings deterministically
+    prefix_scope_values: List[str] = [str(info.get("scope", "")) for info in prefixes.values()]
+    all_scopes: List[str] = sorted(set(list(keywords.values()) + prefix_scope_values))
+
+    # We will only use Custom0 … Custom{required_modifiers-1}
+    used_modifiers = required_modifier_count(len(all_scopes))
+
+    rules = build_rules(keywords, prefixes)
+    sample_count = verify_rules(build_rules(keywords, prefixes, optimize=False), rules, keywords, prefixes)
+    print(f"Verified {len(rules)} factored rules on {sample_count} samples")
+    final_rules = assign_modifiers(rules, used_modifiers)
+
+    # -----------------------------------------------------------------------
+    # Write .clangd YAML – use template if available
+    # -----------------------------------------------------------------------
+    if context.exists(".clangd-template"):
+        template_lines = context.read_text(".clangd-template").splitlines()
+        section_lines, placements = render_template(template_lines, final_rules)
+    else:
+        # Fallback to old autogenerated style
+        section_lines = ["SemanticTokens:", "  Rules:"]
+        placements = {}
 
-    CLANGD_YAML.write_text("\n".join(output_lines) + "\n", encoding="utf-8")
-    print(f"Wrote {CLANGD_YAML.relative_to(ROOT)} using template with {len(FINAL_RULES)} total rules in Unknown section")
-else:
-    # Fallback to old autogenerated style
-    clangd_lines: List[str] = ["SemanticTokens:", "  Rules:", "    Unknown:"]
-    for regex, mods, scope in FINAL_RULES:
-        # YAML single quotes – escape existing single quotes by doubling
-        regex_yaml = regex.replace("'", "''")
-        clangd_lines.append(f"      - regex: '{regex_yaml}'")
-        scope_comment = scope.replace('-', '.')
-        clangd_lines.append(f"        add: [{', '.join(mods)}]  # {scope_comment}")
+    if context.exists(PROFILE_NAME):
+        unknown_rules = order_by_profile(final_rules, context.load_json(PROFILE_NAME))
+    else:
+        unknown_rules = final_rules
+    output_lines = section_lines + build_unknown_section(unknown_rules)
+    text = "\n".join(output_lines) + "\n"
+    context.write_text(".clangd", text)
 
-    CLANGD_YAML.write_text("\n".join(clangd_lines) + "\n", encoding="utf-8")
-    print(f"Wrote {CLANGD_YAML.relative_to(ROOT)} with {len(FINAL_RULES)} rules (no template)")
+    placed = sum(len(kinds) > 0 for kinds in placements.values())
+    print(
+        f"Wrote .clangd with {placed + len(unknown_rules)} rules ({placed} in kind sections, "
+        f"{len(unknown_rules)} in Unknown), {len(text.encode())} bytes"
+    )
 
-# ---------------------------------------------------------------------------
-# Write semanticScopesForPackage.json
-# ---------------------------------------------------------------------------
-selector_to_textmate: Dict[str, List[str]] = {}
-for _, mods, scope in FINAL_RULES:
-    selector = "*." + ".".join(m.lower() for m in mods)
-    textmate_scope = scope.replace("-", ".")
-    scopes_list = selector_to_textmate.setdefault(selector, [])
-    if textmate_scope not in scopes_list:
-        scopes_list.append(textmate_scope)
-
-semantic_json = {
-    "semanticTokenScopes": [
-        {
-            "language": "cpp",
-            "scopes": selector_to_textmate,
-        }
-    ]
-}
-
-SEMANTIC_SCOPES_JSON.write_text(json.dumps(semantic_json, indent=2) + "\n", encoding="utf-8")
-print(f"Wrote {SEMANTIC_SCOPES_JSON.relative_to(ROOT)} with {len(selector_to_textmate)} selectors") 
\ No newline at end of file
+    # -----------------------------------------------------------------------
+    # Write semanticScopesForPackage.json
+    # -----------------------------------------------------------------------
+    semantic_json = build_semantic_scopes(final_rules)
+    selector_count = len(semantic_json["semanticTokenScopes"][0]["scopes"])  # type: ignore[index]
+    context.write_json("semanticScopesForPackage.json", semantic_json)
+    print(f"Wrote semanticScopesForPackage.json with {selector_count} selectors")
+
+
+if __name__ == "__main__":
+    run_standalone(run)
@@ -0,0 +1,327 @@
+#!./.venv/bin/python3
+"""generate_corpus.py
+Build synthetic Malterlib-style C++ sources with ground-truth semantic tokens,
+for measuring the semantic token provider and the .clangd rules at scale.
+
+Each requested size produces two files in the output directory, by default
+corpus/ in the cache directory (output_writer.cache_dir()):
+
+    • corpus-<lines>.cpp          – namespaces, classes, member functions,
+                                    enums and long generated-header style
+                                    constant tables, with block and line
+                                    comments, string literals,
+                                    #include <...> lines and [[attributes]]
+    • corpus-<lines>.tokens.json  – every token the provider should colour:
+                                    {"source", "scopes", "tokens"}, where
+                                    tokens is a flat list of
+                                    line, column, length, scope index
+                                    (0-based; scopes is the legend from
+                                    scopes.json)
+
+Identifiers are drawn from keywords.json and prefixmap.json; PREFIX_WEIGHTS
+skews the prefixes towards what real Malterlib code uses most. The ground
+truth is computed while writing: every identifier written as code (the same
+tokens the identifier regex in src/semanticTokens.ts finds) is classified
+with classifier.Classifier, and text in comments, strings and include paths
+is never a token. The generated code avoids what the provider does not
+attempt to parse (comment markers inside strings, hex or float literals).
+
+Output only depends on --seed and the input tables.
+
+Usage: python3 scripts/generate_corpus.py [--lines 1000 20000 ...] [--bytes N ...] [--seed 1] [--out DIR]
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import pathlib
+import random
+import re
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from classifier import Classifier
+from output_writer import cache_dir, write_text_if_changed
+from scope_automaton import CONCEPT_CHARS
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+CACHE_NAME = "corpus"
+
+# The identifier regex of the semantic token provider (identRe).
+IDENT_RE = re.compile(r"\[\[|\]\]|#[A-Za-z_][A-Za-z0-9_]*|[A-Za-z_][A-Za-z0-9_]*")
+
+# Relative frequency of identifier prefixes in Malterlib code; unlisted
+# prefixes get DEFAULT_PREFIX_WEIGHT.
+PREFIX_WEIGHTS: Dict[str, float] = {
+    "": 8, "C": 12, "f_": 12, "_": 10, "m_": 10, "mp_": 6, "fg_": 4, "fp_": 3, "N": 3, "E": 3,
+    "TC": 2, "t_C": 2, "c_": 2, "gc_": 2, "fs_": 1.5, "ms_": 1.5, "p_": 1.5, "_o": 1, "_f": 1,
+    "IC": 1, "F": 1, "D": 1, "k": 0.5, "CF": 0.5,
+}
+DEFAULT_PREFIX_WEIGHT = 0.3
+CONCEPT_PROBABILITY = 0.25
+
+# Keywords that show up in ordinary code, most common first.
+COMMON_KEYWORDS = (
+    "auto", "return", "if", "const", "void", "mint", "bool", "true", "false", "for", "else", "static",
+    "constexpr", "using", "template", "typename", "uint32", "int32", "zmint", "nullptr", "this", "noexcept",
+    "while", "break", "continue", "inline", "uint8", "fp64", "fp32", "smint", "umint", "case", "switch",
+)
+
+WORDS = (
+    "Value", "Name", "Count", "Index", "Buffer", "Data", "Result", "Path", "File", "Node", "Entry", "Context",
+    "State", "Flags", "Size", "Offset", "Handle", "Stream", "Key", "Map", "List", "Item", "Target", "Source",
+    "Config", "Option", "Error", "Callback", "Thread", "Lock", "Timer", "Event", "Message", "Request",
+    "Response", "Manager", "Registry", "Scope", "Token", "Range", "Actor", "Promise", "Trust", "Host",
+)
+INCLUDES = (
+    "Mib/Core/Core", "Mib/Concurrency/ConcurrencyManager", "Mib/Storage/Optional", "Mib/Encoding/JSON",
+    "Mib/Process/Platform", "Mib/Cryptography/Hashes/SHA", "Mib/Web/HTTP/URL", "Mib/Container/Vector",
+)
+ATTRIBUTES = ("nodiscard", "maybe_unused", "likely", "unlikely", "noreturn")
+
+Tokens = List[Tuple[int, int, int, int]]
+
+
+class _Writer:
+    """Accumulates source lines and the tokens on them."""
+
+    def __init__(self, classify: Callable[[str], Optional[int]]):
+        self.classify = classify
+        self.lines: List[str] = []
+        self.tokens: Tokens = []
+        self._line: List[str] = []
+        self._column = 0
+
+    def code(self, text: str) -> None:
+        """Write code; every identifier in ``text`` is a potential token."""
+        line = len(self.lines)
+        for m in IDENT_RE.finditer(text):
+            scope = self.classify(m.group())
+            if scope is not None:
+                self.tokens.append((line, self._column + m.start(), m.end() - m.start(), scope))
+        self._append(text)
+
+    def inert(self, text: str) -> None:
+        """Write a comment, string literal or include path."""
+        self._append(text)
+
+    def _append(self, text: str) -> None:
+        self._line.append(text)
+        self._column += len(text)
+
+    def end_line(self) -> None:
+        self.lines.append("".join(self._line))
+        self._line = []
+        self._column = 0
+
+    def line(self, indent: int, *parts: Tuple[bool, str]) -> None:
+        """One line of (is_code, text) parts."""
+        self.inert("\t" * indent)
+        for is_code, text in parts:
+            (self.code if is_code else self.inert)(text)
+        self.end_line()
+
+    def size(self) -> int:
+        return sum(len(line) + 1 for line in self.lines)
+
+
+class CorpusGenerator:
+    """Seeded generator of Malterlib-style C++ constructs."""
+
+    def __init__(self, prefixes: Sequence[str], keywords: Sequence[str], scopes: List[str], classifier: Classifier, seed: int):
+        self.rng = random.Random(seed)
+        self.prefixes = list(prefixes)
+        self.prefix_weights = [PREFIX_WEIGHTS.get(p, DEFAULT_PREFIX_WEIGHT) for p in self.prefixes]
+        self.variable = {p for p in prefixes if classifier.prefixes.get(p, ("", False, None))[1]}
+        self.keywords = [k for k in COMMON_KEYWORDS if k in keywords]
+        self.rare_keywords = [k for k in keywords if k[0].isalpha() and k not in COMMON_KEYWORDS]
+        self.scopes = scopes
+        scope_index = {scope: i for i, scope in enumerate(scopes)}
+        cache: Dict[str, Optional[int]] = {}
+
+        def classify(name: str) -> Optional[int]:
+            if name not in cache:
+                scope = classifier.classify(name)
+                cache[name] = None if scope is None else scope_index.get(scope)
+            return cache[name]
+
+        self.classify = classify
+
+    @classmethod
+    def load(cls, seed: int, root: pathlib.Path = ROOT) -> "CorpusGenerator":
+        """Generator over ``root``/keywords.json, prefixmap.json and scopes.json."""
+        keywords = json.loads((root / "keywords.json").read_text(encoding="utf-8"))
+        prefixes = json.loads((root / "prefixmap.json").read_text(encoding="utf-8"))
+        scopes = json.loads((root / "scopes.json").read_text(encoding="utf-8"))["scopes"]
+        keyword_names = [k for k, v in keywords.items() if not (isinstance(v, dict) and v.get("example"))]
+        return cls(sorted(prefixes), keyword_names, scopes, Classifier.load(root), seed)
+
+    # -- identifiers ---------------------------------------------------------
+
+    def words(self, low: int = 1, high: int = 3) -> str:
+        return "".join(self.rng.choice(WORDS) for _ in range(self.rng.randint(low, high)))
+
+    def ident(self, prefix: Optional[str] = None) -> str:
+        if prefix is None:
+            prefix = self.rng.choices(self.prefixes, self.prefix_weights)[0]
+        concept = ""
+        if prefix in self.variable and self.rng.random() < CONCEPT_PROBABILITY:
+            concept = self.rng.choice(CONCEPT_CHARS)
+        return prefix + concept + self.words()
+
+    def keyword(self) -> str:
+        if self.rare_keywords and self.rng.random() < 0.05:
+            return self.rng.choice(self.rare_keywords)
+        return self.rng.choice(self.keywords)
+
+    def type_name(self) -> str:
+        return self.rng.choice(("mint", "bool", "CStr", "uint32", "fp64", self.ident("C"), self.ident("C") + "<mint>"))
+
+    def expression(self) -> str:
+        rng = self.rng
+        kind = rng.randrange(4)
+        if kind == 0:
+            return str(rng.randrange(1000))
+        if kind == 1:
+            return f"{self.ident()}({self.ident('_')}, {rng.randrange(100)})"
+        if kind == 2:
+            return f"{self.ident('m_')} + {self.ident('_')}"
+        return f"{self.ident('fg_')}({self.ident()})"
+
+    # -- constructs ------------------------------------------------------------
+
+    def comment_block(self, w: _Writer, indent: int) -> None:
+        w.line(indent, (False, "/*"))
+        for _ in range(self.rng.randint(1, 4)):
+            w.line(indent, (False, f"\t{self.words(3, 8)} {self.ident()} {self.words(1, 3).lower()}"))
+        w.line(indent, (False, "*/"))
+
+    def statement(self, w: _Writer, indent: int) -> None:
+        rng = self.rng
+        kind = rng.randrange(8)
+        if kind == 0:
+            w.line(indent, (True, f"auto {self.ident('')} = {self.expression()};"))
+        elif kind == 1:
+            w.line(indent, (True, f"{self.ident('fg_')}("), (False, f'"{self.words(2, 5)}"'), (True, f", {self.ident()});"))
+        elif kind == 2:
+            w.line(indent, (True, f"if ({self.ident('mp_')})"))
+            w.line(indent + 1, (True, f"return {self.expression()};"))
+        elif kind == 3:
+            counter = "i" + self.words(1, 1)
+            w.line(indent, (True, f"for (mint {counter} = 0; {counter} < {self.ident('_')}; ++{counter})"))
+            w.line(indent + 1, (True, f"{self.ident('mp_')}[{counter}] = {self.ident('_')};"))
+        elif kind == 4:
+            w.line(indent, (True, f"{self.ident('m_')} = {self.expression()};"), (False, f" // {self.words(2, 5)}"))
+        elif kind == 5:
+            w.line(indent, (True, f"{self.keyword()} {self.ident()};"))
+        elif kind == 6:
+            w.line(indent, (False, "/* "), (False, f"{self.words()} {self.ident()}"), (False, " */"), (True, f" {self.ident('f_')}();"))
+        else:
+            w.line(indent, (True, f"{self.type_name()} {self.ident('')} = {self.expression()};"))
+
+    def class_definition(self, w: _Writer, indent: int) -> str:
+        rng = self.rng
+        name = self.ident("C")
+        if rng.random() < 0.3:
+            w.line(indent, (True, f"template <typename {self.ident('t_C')}, mint {self.ident('t_')}>"))
+        w.line(indent, (True, f"class {name} : public {self.ident('C')}"))
+        w.line(indent, (True, "{"))
+        w.line(indent, (True, "public:"))
+        for _ in range(rng.randint(2, 6)):
+            attribute = f"[[{rng.choice(ATTRIBUTES)}]] " if rng.random() < 0.3 else ""
+            w.line(
+                indent + 1,
+                (True, f"{attribute}{self.type_name()} {self.ident('f_')}({self.type_name()} const &{self.ident('_')}) const;"),
+            )
+        w.line(indent, (True, "private:"))
+        for _ in range(rng.randint(2, 6)):
+            w.line(indent + 1, (True, f"{self.type_name()} {self.ident('mp_')};"))
+        w.line(indent, (True, "};"))
+        return name
+
+    def function_definition(self, w: _Writer, indent: int, owner: str) -> None:
+        params = ", ".join(f"{self.type_name()} {self.ident('_')}" for _ in range(self.rng.randint(0, 3)))
+        w.line(indent, (True, f"{self.type_name()} {owner}::{self.ident('f_')}({params})"))
+        w.line(indent, (True, "{"))
+        for _ in range(self.rng.randint(3, 12)):
+            self.statement(w, indent + 1)
+        w.line(indent, (True, "}"))
+
+    def enum_definition(self, w: _Writer, indent: int) -> None:
+        name = self.ident("E")
+        w.line(indent, (True, f"enum {name}"))
+        w.line(indent, (True, "{"))
+        for i in range(self.rng.randint(2, 8)):
+            w.line(indent + 1, (True, f"{name}_{self.words(1, 2)} = {i},"))
+        w.line(indent, (True, "};"))
+
+    def constant_table(self, w: _Writer, indent: int) -> None:
+        """A run of generated-header style constants."""
+        for _ in range(self.rng.randint(20, 200)):
+            w.line(indent, (True, f"constexpr static uint32 {self.ident('gc_')} = {self.rng.randrange(1 << 16)};"))
+
+    def build(self, target_lines: int, target_bytes: int) -> _Writer:
+        rng = self.rng
+        w = _Writer(self.classify)
+        w.line(0, (True, "#pragma once"))
+        for path in rng.sample(INCLUDES, 4):
+            w.line(0, (True, "#include "), (False, f"<{path}>"))
+        w.end_line()
+        self.comment_block(w, 0)
+        w.line(0, (True, f"namespace {self.ident('N')}"))
+        w.line(0, (True, "{"))
+        while len(w.lines) < target_lines and w.size() < target_bytes:
+            kind = rng.random()
+            if kind < 0.45:
+                owner = self.class_definition(w, 1)
+                w.end_line()
+                for _ in range(rng.randint(1, 4)):
+                    self.function_definition(w, 1, owner)
+                    w.end_line()
+            elif kind < 0.6:
+                self.enum_definition(w, 1)
+            elif kind < 0.7:
+                self.constant_table(w, 1)
+            elif kind < 0.8:
+                self.comment_block(w, 1)
+            else:
+                self.function_definition(w, 1, self.ident("C"))
+            w.end_line()
+        w.line(0, (True, "}"))
+        return w
+
+
+def write_corpus(out_dir: pathlib.Path, stem: str, writer: _Writer, scopes: List[str]) -> pathlib.Path:
+    source = out_dir / f"{stem}.cpp"
+    write_text_if_changed(source, "\n".join(writer.lines) + "\n")
+    truth = {
+        "source": source.name,
+        "scopes": scopes,
+        "tokens": [value for token in writer.tokens for value in token],
+    }
+    write_text_if_changed(out_dir / f"{stem}.tokens.json", json.dumps(truth, separators=(",", ":")) + "\n")
+    return source
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Generate Malterlib-style C++ sources with ground-truth tokens.")
+    parser.add_argument("--lines", type=int, nargs="+", default=[], help="file sizes in lines (default: 1000)")
+    parser.add_argument("--bytes", type=int, nargs="+", default=[], help="file sizes in bytes")
+    parser.add_argument("--seed", type=int, default=1, help="random seed (default: 1)")
+    parser.add_argument("--out", type=pathlib.Path, help=f"output directory (default: {CACHE_NAME}/ in the cache directory)")
+    args = parser.parse_args()
+    out_dir = args.out or cache_dir(CACHE_NAME)
+
+    targets = [(lines, 1 << 62, f"corpus-{lines}") for lines in args.lines]
+    targets += [(1 << 62, size, f"corpus-{size}b") for size in args.bytes]
+    if not targets:
+        targets = [(1000, 1 << 62, "corpus-1000")]
+
+    for lines, size, stem in targets:
+        generator = CorpusGenerator.load(args.seed)
+        writer = generator.build(lines, size)
+        source = write_corpus(out_dir, stem, writer, generator.scopes)
+        print(f"{source}: {len(writer.lines)} lines, {writer.size()} bytes, {len(writer.tokens)} tokens")
+
+
+if __name__ == "__main__":
+    main()
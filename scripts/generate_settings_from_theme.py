@@ -15,27 +15,13 @@ The script is idempotent and intended to be invoked by update_all.py.
 """
 from __future__ import annotations
 
-import json
-import pathlib
 import copy
 from typing import Any, Dict, List, cast
 
-# External deps
-try:
-    import json5  # type: ignore
-except ImportError as exc:
-    raise RuntimeError(
-        "This script requires the 'json5' package. Install it with 'pip install json5'."
-    ) from exc
-
 # Centralised colour conversion helper.
-from color_utils import displayp3_hex_to_srgb_hex
+from color_utils import displayp3_hex_to_srgb_hex_many
 
-ROOT = pathlib.Path(__file__).resolve().parents[1]
-THEME_PATH = ROOT / "themes" / "malterlib.json"
-TEMPLATE_PATH = ROOT / "settingsTemplate.json"
-SETTINGS_PATH = ROOT / "settings.json"
-SETTINGS_SRGB_PATH = ROOT / "settingsSRGB.json"
+from pipeline import Context, run_standalone
 
 # ---------------------------------------------------------------------------
 # Helper functions
@@ -57,6 +43,20 @@ def convert_template_colors(obj: Any, convert_func):  # type: ignore[override]
     return obj
 
 
+def collect_foreground_colors(obj: Any, out: List[str]) -> List[str]:
+    """Append every hex `foreground` value found in `obj` to `out`."""
+    if isinstance(obj, dict):
+        for k, v in obj.items():
+            if k == "foreground" and isinstance(v, str) and v.startswith("#"):
+                out.append(v)
+            else:
+                collect_foreground_colors(v, out)
+    elif isinstance(obj, list):
+        for i in obj:
+            collect_foreground_colors(i, out)
+    return out
+
+
 def scope_dot_to_hyphen(scope: str) -> str:
     """Convert dot-separated scope to hyphen-separated variant."""
     return scope.replace(".", "-")
@@ -70,75 +70,73 @@ def copy_rule_with_converted_color(rule: Dict[str, Any], convert_func):
             new_rule["settings"]["foreground"] = convert_func(fg)
     return new_rule
 
-# ---------------------------------------------------------------------------
-# Load theme + template
-# ---------------------------------------------------------------------------
 
-with THEME_PATH.open("r", encoding="utf-8") as f:
-    raw_theme = f.read()
+def run(context: Context) -> None:
+    # -----------------------------------------------------------------------
+    # Load theme + template
+    # -----------------------------------------------------------------------
 
-# JSON5 parsing is mandatory and trusted to handle comments/trailing commas
-parsed = json5.loads(raw_theme)
+    # JSON5 parsing is mandatory and trusted to handle comments/trailing commas
+    parsed = context.load_json("themes/malterlib.json", relaxed=True)
 
-if not isinstance(parsed, dict):
-    raise TypeError("themes/malterlib.json must contain a JSON object at the root")
+    if not isinstance(parsed, dict):
+        raise TypeError("themes/malterlib.json must contain a JSON object at the root")
 
-theme: Dict[str, Any] = parsed  # type: ignore[assignment]
+    theme: Dict[str, Any] = parsed  # type: ignore[assignment]
 
-token_colors: List[Dict[str, Any]] = theme.get("tokenColors", [])
-if not token_colors:
-    raise ValueError(f"No 'tokenColors' array found in {THEME_PATH}")
+    token_colors: List[Dict[str, Any]] = theme.get("tokenColors", [])
+    if not token_colors:
+        raise ValueError(f"No 'tokenColors' array found in {context.path('themes/malterlib.json')}")
 
-with TEMPLATE_PATH.open("r", encoding="utf-8") as f:
-    settings_template: Dict[str, Any] = json.load(f)
+    settings_template: Dict[str, Any] = context.load_json("settingsTemplate.json")
 
-# Validate template root object
-if not isinstance(settings_template, dict):
-    raise TypeError("settingsTemplate.json must contain a JSON object at the root")
+    # Validate template root object
+    if not isinstance(settings_template, dict):
+        raise TypeError("settingsTemplate.json must contain a JSON object at the root")
 
-# ---------------------------------------------------------------------------
-# Build editor.tokenColorCustomizations.textMateRules
-# ---------------------------------------------------------------------------
+    # -----------------------------------------------------------------------
+    # Build editor.tokenColorCustomizations.textMateRules
+    # -----------------------------------------------------------------------
 
-text_mate_rules_display: List[Dict[str, Any]] = token_colors  # type: ignore[assignment]
+    text_mate_rules_display: List[Dict[str, Any]] = token_colors  # type: ignore[assignment]
 
-# Build sRGB-converted textMateRules
-text_mate_rules_srgb: List[Dict[str, Any]] = [
-    copy_rule_with_converted_color(rule, displayp3_hex_to_srgb_hex) for rule in token_colors
-]
+    # Collect the rule and template colours, then convert them in one batch
+    p3_colors = collect_foreground_colors(settings_template, collect_foreground_colors(token_colors, []))
+    to_srgb = dict(zip(p3_colors, displayp3_hex_to_srgb_hex_many(p3_colors))).__getitem__
 
-# ---------------------------------------------------------------------------
-# Assemble final settings objects (semantic token customisations omitted – we
-# rely on compatibility scopes).
-# ---------------------------------------------------------------------------
+    # Build sRGB-converted textMateRules
+    text_mate_rules_srgb: List[Dict[str, Any]] = [
+        copy_rule_with_converted_color(rule, to_srgb) for rule in token_colors
+    ]
 
-# Display-P3 variant
-settings_display: Dict[str, Any] = cast(Dict[str, Any], copy.deepcopy(settings_template))
-settings_display["editor.tokenColorCustomizations"] = {
-    "textMateRules": text_mate_rules_display
-}
+    # -----------------------------------------------------------------------
+    # Assemble final settings objects (semantic token customisations omitted –
+    # we rely on compatibility scopes).
+    # -----------------------------------------------------------------------
 
-# sRGB variant – convert template colours too
-settings_template_srgb = convert_template_colors(settings_template, displayp3_hex_to_srgb_hex)
-settings_srgb: Dict[str, Any] = cast(Dict[str, Any], copy.deepcopy(settings_template_srgb))
-settings_srgb["workbench.highlightingColorSpace"] = "srgb"
-settings_srgb["editor.tokenColorCustomizations"] = {
-    "textMateRules": text_mate_rules_srgb
-}
+    # Display-P3 variant
+    settings_display: Dict[str, Any] = cast(Dict[str, Any], copy.deepcopy(settings_template))
+    settings_display["editor.tokenColorCustomizations"] = {
+        "textMateRules": text_mate_rules_display
+    }
 
-# ---------------------------------------------------------------------------
-# Write files
-# ---------------------------------------------------------------------------
+    # sRGB variant – convert template colours too
+    settings_template_srgb = convert_template_colors(settings_template, to_srgb)
+    settings_srgb: Dict[str, Any] = cast(Dict[str, Any], copy.deepcopy(settings_template_srgb))
+    settings_srgb["workbench.highlightingColorSpace"] = "srgb"
+    settings_srgb["editor.tokenColorCustomizations"] = {
+        "textMateRules": text_mate_rules_srgb
+    }
+
+    # -----------------------------------------------------------------------
+    # Write files
+    # -----------------------------------------------------------------------
+
+    context.write_json("settings.json", settings_display)
+    context.write_json("settingsSRGB.json", settings_srgb)
 
-with SETTINGS_PATH.open("w", encoding="utf-8") as f:
-    json.dump(settings_display, f, indent=2)
-    f.write("\n")
+    print("Wrote settings.json and settingsSRGB.json based on colours from themes/malterlib.json.")
 
-with SETTINGS_SRGB_PATH.open("w", encoding="utf-8") as f:
-    json.dump(settings_srgb, f, indent=2)
-    f.write("\n")
 
-print(
-    f"Wrote {SETTINGS_PATH.relative_to(ROOT)} and {SETTINGS_SRGB_PATH.relative_to(ROOT)} "
-    "based on colours from themes/malterlib.json."
-) 
\ No newline at end of file
+if __name__ == "__main__":
+    run_standalone(run)
@@ -4,19 +4,53 @@ Generate a theme based on malterlib.json but with tokenColors from Dark Modern.
 Creates themes/malterlibNoTokens.json with Malterlib colors + Dark Modern tokens.
 Token colors are converted from sRGB to Display P3 to match the theme's color space.
 """
-import json
-import json5
-import pathlib
-from color_utils import srgb_hex_to_displayp3_hex
+from color_utils import is_hex_color, srgb_hex_to_displayp3_hex_many
+from pipeline import Context, run_standalone
 
+EDITOR_COLORS = {
+    "editor.background": "#1f1f1f",
+    "editor.foreground": "#cccccc",
+    "editorGutter.background": "#1f1f1f",
+}
 
-def convert_token_colors_to_p3(token_colors):
+
+def make_p3_converter(colors):
+    """Convert all valid sRGB colours in ``colors`` to Display P3 in one batch.
+
+    Returns a function mapping each of those colours to its Display P3 value;
+    it raises ValueError for colours that could not be converted.
+    """
+    valid = [color for color in colors if is_hex_color(color)]
+    p3_by_color = dict(zip(valid, srgb_hex_to_displayp3_hex_many(valid)))
+
+    def convert(color):
+        try:
+            return p3_by_color[color]
+        except (KeyError, TypeError):
+            raise ValueError(f"Invalid hex colour: {color}") from None
+
+    return convert
+
+
+def collect_colors(token_colors, semantic_token_colors):
+    """All colours used by the Dark Modern token and semantic token colors."""
+    colors = list(EDITOR_COLORS.values())
+    for entry in token_colors:
+        settings = entry.get("settings", {})
+        colors.extend(settings[key] for key in ("foreground", "background") if key in settings)
+    colors.extend(semantic_token_colors.values())
+    return colors
+
+
+def convert_token_colors_to_p3(token_colors, convert):
     """Convert token colors from sRGB to Display P3.
 
     Parameters
     ----------
     token_colors : list
         List of token color entries from the Dark Modern theme (sRGB).
+    convert : callable
+        Colour converter returned by make_p3_converter().
 
     Returns
     -------
@@ -26,19 +60,19 @@ def convert_token_colors_to_p3(token_colors):
     converted = []
     for entry in token_colors:
         converted_entry = entry.copy()
-        settings = converted_entry.get("settings", {})
+        settings = dict(converted_entry.get("settings", {}))
 
         # Convert foreground color if present
         if "foreground" in settings:
             try:
-                settings["foreground"] = srgb_hex_to_displayp3_hex(settings["foreground"])
+                settings["foreground"] = convert(settings["foreground"])
             except (ValueError, KeyError) as e:
                 print(f"Warning: Could not convert foreground color '{settings['foreground']}': {e}")
 
         # Convert background color if present
         if "background" in settings:
             try:
-                settings["background"] = srgb_hex_to_displayp3_hex(settings["background"])
+                settings["background"] = convert(settings["background"])
             except (ValueError, KeyError) as e:
                 print(f"Warning: Could not convert background color '{settings['background']}': {e}")
 
@@ -48,13 +82,15 @@ def convert_token_colors_to_p3(token_colors):
     return converted
 
 
-def convert_semantic_token_colors_to_p3(semantic_token_colors):
+def convert_semantic_token_colors_to_p3(semantic_token_colors, convert):
     """Convert semantic token colors from sRGB to Display P3.
 
     Parameters
     ----------
     semantic_token_colors : dict
         Dictionary mapping token types to color strings (sRGB).
+    convert : callable
+        Colour converter returned by make_p3_converter().
 
     Returns
     -------
@@ -64,16 +100,16 @@ def convert_semantic_token_colors_to_p3(semantic_token_colors):
     converted = {}
     for token_type, color in semantic_token_colors.items():
         try:
-            converted[token_type] = srgb_hex_to_displayp3_hex(color)
+            converted[token_type] = convert(color)
         except (ValueError, KeyError) as e:
             print(f"Warning: Could not convert semantic token color '{token_type}': '{color}': {e}")
             converted[token_type] = color  # Keep original on failure
     return converted
 
 
-def main():
+def run(context: Context) -> None:
     # Define paths
-    root = pathlib.Path(__file__).resolve().parents[1]
+    root = context.root
     input_path = root / "themes" / "malterlib.json"
     dark_modern_path = root / "darkModern.json"
     output_path = root / "themes" / "malterlibNoTokens.json"
@@ -81,20 +117,18 @@ def main():
     print(f"Generating theme with Dark Modern token colors from {input_path}...")
 
     # Read the malterlib theme file
-    with open(input_path, 'r') as f:
-        theme_data = json5.load(f)
+    theme_data = context.load_json("themes/malterlib.json", relaxed=True)
 
     # Try to read Dark Modern theme for tokenColors and semanticTokenColors
     token_colors = []
     semantic_token_colors = {}
-    if dark_modern_path.exists():
+    if context.exists("darkModern.json"):
         try:
-            with open(dark_modern_path, 'r') as f:
-                dark_modern_data = json5.load(f)
-                token_colors = dark_modern_data.get("tokenColors", [])
-                semantic_token_colors = dark_modern_data.get("semanticTokenColors", {})
-                print(f"Loaded {len(token_colors)} token colors from {dark_modern_path.name}")
-                print(f"Loaded {len(semantic_token_colors)} semantic token colors from {dark_modern_path.name}")
+            dark_modern_data = context.load_json("darkModern.json", relaxed=True)
+            token_colors = dark_modern_data.get("tokenColors", [])
+            semantic_token_colors = dark_modern_data.get("semanticTokenColors", {})
+            print(f"Loaded {len(token_colors)} token colors from {dark_modern_path.name}")
+            print(f"Loaded {len(semantic_token_colors)} semantic token colors from {dark_modern_path.name}")
         except Exception as e:
             print(f"Warning: Could not load Dark Modern theme: {e}")
             print("Theme will have no token colors (relying on semantic highlighting)")
@@ -107,27 +141,28 @@ def main():
         "semanticHighlighting": theme_data.get("semanticHighlighting"),
         "highlightingColorSpace": theme_data.get("highlightingColorSpace"),
         "colorSpace": theme_data.get("colorSpace"),
-        "colors": theme_data.get("colors", {})
+        "colors": dict(theme_data.get("colors", {}))
     }
 
+    # Collect every sRGB colour first and convert them in one batch
+    convert = make_p3_converter(collect_colors(token_colors, semantic_token_colors))
+
     # Convert hardcoded editor colors from sRGB to Display P3
-    new_theme["colors"]["editor.background"] = srgb_hex_to_displayp3_hex("#1f1f1f")
-    new_theme["colors"]["editor.foreground"] = srgb_hex_to_displayp3_hex("#cccccc")
-    new_theme["colors"]["editorGutter.background"] = srgb_hex_to_displayp3_hex("#1f1f1f")
+    for key, color in EDITOR_COLORS.items():
+        new_theme["colors"][key] = convert(color)
 
     # Add tokenColors if we have them (convert from sRGB to Display P3)
     if token_colors:
         print(f"Converting {len(token_colors)} token colors from sRGB to Display P3...")
-        new_theme["tokenColors"] = convert_token_colors_to_p3(token_colors)
+        new_theme["tokenColors"] = convert_token_colors_to_p3(token_colors, convert)
 
     # Add semanticTokenColors if we have them (convert from sRGB to Display P3)
     if semantic_token_colors:
         print(f"Converting {len(semantic_token_colors)} semantic token colors from sRGB to Display P3...")
-        new_theme["semanticTokenColors"] = convert_semantic_token_colors_to_p3(semantic_token_colors)
+        new_theme["semanticTokenColors"] = convert_semantic_token_colors_to_p3(semantic_token_colors, convert)
 
     # Write the new theme
-    with open(output_path, 'w') as f:
-        json.dump(new_theme, f, indent=4)
+    context.write_json("themes/malterlibNoTokens.json", new_theme, indent=4, trailing_newline=False)
 
     print(f"✅ Theme saved to {output_path}")
     print(f"Colors section: {len(new_theme['colors'])} Malterlib color definitions")
@@ -141,4 +176,4 @@ def main():
         print(f"Semantic token colors: none")
 
 if __name__ == "__main__":
-    main()
+    run_standalone(run)
@@ -0,0 +1,377 @@
+"""highlighterr_extract.py
+Extraction of the tables this extension mirrors from Highlighterr.
+
+HighlighterrCxx.cpp and HighlighterrCxx.h are memory-mapped and run through
+cpp_lexer once each; the constructs below are recognised on the token stream
+with a fixed-size window, so extraction is linear in the input size. Code in
+comments and in "#if 0" regions is ignored, and entries may be split across
+lines.
+
+    • ms_PrefixMap entries       { "prefix", EClassification::X, true|false }
+    • keyword registrations      f_AddDefaultKeyword[_C|_Cpp|_CLike]("kw", EClassification::X)
+    • JS keyword registrations   f_AddDefaultKeyword_JS(...)  (skipped)
+    • example identifiers        ignore("kw", EClassification::X, ...) and a
+                                 "// ignore(kw)" comment on the same line as a
+                                 { ... EClassification::X ... } entry
+    • the EClassification enum   enum class EClassification { ... }
+
+parse_prefix_map.py, extract_keywords.py and generate_classifications.py are
+thin writers over cpp_tables() and classification_names(), which memoize the
+result on the Context so stages sharing one context scan each file once.
+
+Between runs, results are cached per region in cache_dir("highlighterr"). The
+regions are the ms_PrefixMap array, each f_AddDefaultKeyword* function and
+the EClassification enum, located with one regex pass that relies on the
+Malterlib layout (the opening brace on its own line, the closing brace back
+at the same indentation). Each region is fingerprinted and only regions whose
+fingerprint is not cached are lexed, so an edit elsewhere in the file costs a
+hash and a locating pass. Anything between the regions that could change how
+they are read (conditional directives, block comments, raw strings, entries
+outside a region) makes the whole file one region instead.
+"""
+from __future__ import annotations
+
+import collections
+import hashlib
+import json
+import mmap
+import pathlib
+import re
+from dataclasses import dataclass
+from typing import Any, Callable, Deque, Dict, List, Optional, Sequence, Tuple, TypeVar
+
+from cpp_lexer import COMMENT, IDENT, PUNCT, SCOPE, STRING, Token, tokens
+from output_writer import cache_dir, write_text_if_changed
+from pipeline import HIGHLIGHTERR_CPP, HIGHLIGHTERR_H, Context, StageError
+
+T = TypeVar("T")
+
+_KEYWORD_FUNCTIONS = {
+    b"f_AddDefaultKeyword", b"f_AddDefaultKeyword_", b"f_AddDefaultKeyword_C",
+    b"f_AddDefaultKeyword_Cpp", b"f_AddDefaultKeyword_CLike",
+}
+_CLASSIFICATION_RE = re.compile(rb"EClassification_[A-Za-z0-9_]+\Z")
+_IGNORE_COMMENT_RE = re.compile(rb"ignore\(\s*([A-Za-z0-9_]+)\s*\)")
+
+# Longest token pattern recognised (a prefix-map entry).
+_WINDOW = 9
+
+CACHE_NAME = "highlighterr"
+CACHE_VERSION = 1
+# Cached entries are only valid for the scanner that produced them.
+_SCANNER_SOURCES = ("highlighterr_extract.py", "cpp_lexer.py")
+
+# Gap contents that make region-by-region scanning unsafe: anything that can
+# change how a region is lexed, and anything the scanners would extract
+# (every entry names an EClassification) that is not inside a region.
+_HAZARDS = (
+    rb"|(?P<hazard>^[ \t]*\#[ \t]*(?:if|ifdef|ifndef|elif|else|endif)\b|/\*|\bR\""
+    rb"|\bignore[ \t]*\(|\bf_AddDefaultKeyword\w*[ \t]*\([ \t]*\"|\bEClassification\s*::)"
+)
+_CPP_REGION_RE = re.compile(
+    rb"^(?P<indent>[ \t]*)[^\n;{}]*?(?:\bms_PrefixMap[ \t]*\[[ \t]*\][ \t]*="
+    rb"|\bf_AddDefaultKeyword\w*[ \t]*\([^\n;(){}]*\)[ \t]*(?:const)?)[ \t]*(?://[^\n]*)?\r?\n(?P=indent)\{"
+    + _HAZARDS,
+    re.MULTILINE,
+)
+_H_REGION_RE = re.compile(
+    rb"^(?P<indent>[ \t]*)enum[ \t]+class[ \t]+EClassification\b[^\n;{}]*\r?\n(?P=indent)\{"
+    + _HAZARDS,
+    re.MULTILINE,
+)
+
+
+@dataclass
+class CppTables:
+    """Tables extracted from HighlighterrCxx.cpp, in source order."""
+
+    prefix_map: Dict[str, Dict[str, Any]]
+    keywords: Dict[str, Dict[str, Any]]
+
+
+def _scan_mapped(path: pathlib.Path, scan: Callable[[Any], T]) -> T:
+    """Run ``scan`` over a read-only memory map of ``path``."""
+    with path.open("rb") as f:
+        try:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # empty file
+            return scan(b"")
+        with mapped:
+            return scan(mapped)
+
+
+def _text(value: bytes) -> str:
+    return value.decode("utf-8", errors="ignore")
+
+
+def _is(token: Token, kind: str, value: Optional[bytes] = None) -> bool:
+    return token.kind == kind and (value is None or token.value == value)
+
+
+def _classification(window: Deque[Token], start: int) -> Optional[str]:
+    """Name matched by EClassification :: EClassification_X at ``window[start:]``."""
+    if (
+        _is(window[start], IDENT, b"EClassification")
+        and _is(window[start + 1], SCOPE)
+        and window[start + 2].kind == IDENT
+        and _CLASSIFICATION_RE.match(window[start + 2].value)
+    ):
+        return _text(window[start + 2].value)
+    return None
+
+
+def _scan_cpp_entries(source: Any) -> Dict[str, List[list]]:
+    """Entries found in (part of) HighlighterrCxx.cpp, in source order.
+
+    The result is plain JSON so that it can be cached per region.
+    """
+    prefix_map: List[list] = []
+    examples: List[list] = []
+    registered: List[list] = []
+
+    # The last _WINDOW code tokens (comments excluded).
+    window: Deque[Token] = collections.deque(maxlen=_WINDOW)
+    # First "{" on the current line, the first classification after it and
+    # whether a "}" followed: what a trailing "// ignore(kw)" refers to.
+    brace_line = 0
+    brace_cls: Optional[str] = None
+    brace_closed = False
+
+    for token in tokens(source):
+        if token.kind == COMMENT:
+            m = _IGNORE_COMMENT_RE.search(token.value)
+            if m and brace_line == token.line and brace_cls and brace_closed:
+                examples.append([_text(m.group(1)), brace_cls])
+            continue
+
+        window.append(token)
+        n = len(window)
+
+        if token.kind == PUNCT:
+            if token.value == b"{" and brace_line != token.line:
+                brace_line, brace_cls, brace_closed = token.line, None, False
+            elif token.value == b"}" and brace_line == token.line and brace_cls:
+                brace_closed = True
+        elif token.kind == IDENT and brace_line == token.line and brace_cls is None and n >= 3:
+            cls = _classification(window, n - 3)
+            if cls:
+                brace_cls = cls
+
+        if n < 8 or token.kind != PUNCT:
+            continue
+
+        # { "prefix" , EClassification :: X , true|false }
+        if token.value == b"}" and n == _WINDOW:
+            if (
+                _is(window[0], PUNCT, b"{") and window[1].kind == STRING and _is(window[2], PUNCT, b",")
+                and _is(window[6], PUNCT, b",") and window[7].kind == IDENT and window[7].value in (b"true", b"false")
+            ):
+                cls = _classification(window, 3)
+                if cls:
+                    prefix_map.append([_text(window[1].value), cls, window[7].value == b"true"])
+
+        # f_AddDefaultKeyword*( "kw" , EClassification :: X )
+        # ignore( "kw" , EClassification :: X ,
+        elif token.value in (b")", b","):
+            head = window[n - 8]
+            if (
+                head.kind == IDENT and _is(window[n - 7], PUNCT, b"(") and window[n - 6].kind == STRING
+                and _is(window[n - 5], PUNCT, b",")
+            ):
+                cls = _classification(window, n - 4)
+                if cls and token.value == b")" and head.value in _KEYWORD_FUNCTIONS:
+                    registered.append([_text(window[n - 6].value), cls])
+                elif cls and token.value == b"," and head.value == b"ignore":
+                    examples.append([_text(window[n - 6].value), cls])
+
+    return {"prefix_map": prefix_map, "examples": examples, "registered": registered}
+
+
+def _merge_cpp(parts: Sequence[Dict[str, List[list]]]) -> CppTables:
+    """Combine per-region entries, in source order, into the final tables.
+
+    Example identifiers (from ignore()) take precedence over keyword
+    registrations; otherwise the first registration of a keyword wins and a
+    later prefix-map entry for the same prefix replaces an earlier one.
+    """
+    prefix_map: Dict[str, Dict[str, Any]] = {}
+    examples: Dict[str, Dict[str, Any]] = {}
+    registered: Dict[str, Dict[str, Any]] = {}
+    for part in parts:
+        for prefix, cls, variable in part["prefix_map"]:
+            prefix_map[prefix] = {"classification": cls, "variable": variable}
+        for kw, cls in part["examples"]:
+            examples[kw] = {"classification": cls, "example": True}
+        for kw, cls in part["registered"]:
+            registered.setdefault(kw, {"classification": cls})
+
+    keywords = dict(examples)
+    for kw, entry in registered.items():
+        keywords.setdefault(kw, entry)
+    return CppTables(prefix_map, keywords)
+
+
+def scan_cpp(source: Any) -> CppTables:
+    """Extract the prefix map and keyword table from HighlighterrCxx.cpp."""
+    return _merge_cpp([_scan_cpp_entries(source)])
+
+
+def scan_header(source: Any) -> List[str]:
+    """EClassification enumerator names declared in HighlighterrCxx.h."""
+    entries: List[str] = []
+    # 0: looking for "enum class EClassification", 1: before "{",
+    # 2: expecting an enumerator name, 3: inside an enumerator (until ",").
+    state = 0
+    window: Deque[bytes] = collections.deque(maxlen=3)
+    for token in tokens(source):
+        if token.kind == COMMENT:
+            continue
+        if state == 0:
+            window.append(token.value if token.kind == IDENT else b"")
+            if tuple(window) == (b"enum", b"class", b"EClassification"):
+                state = 1
+        elif state == 1:
+            if _is(token, PUNCT, b"{"):
+                state = 2
+            elif _is(token, PUNCT, b";"):  # forward declaration
+                state = 0
+                window.clear()
+        elif _is(token, PUNCT, b"}"):
+            return entries
+        elif state == 2 and token.kind == IDENT:
+            entries.append(_text(token.value))
+            state = 3
+        elif _is(token, PUNCT, b","):
+            state = 2
+
+    raise StageError("Could not locate EClassification enum in header.")
+
+
+def _digest(data: Any) -> str:
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def locate_regions(source: Any, pattern: "re.Pattern[bytes]") -> Optional[List[Tuple[int, int]]]:
+    """(start, end) offsets of the regions ``pattern`` finds in ``source``.
+
+    Returns None when there are no regions, when one is not closed, or when
+    the text between regions needs the lexer (see _HAZARDS); the caller then
+    treats the whole file as a single region.
+    """
+    regions: List[Tuple[int, int]] = []
+    pos = 0
+    while True:
+        m = pattern.search(source, pos)
+        if m is None:
+            return regions or None
+        if m.group("hazard") is not None:
+            return None
+        closing = b"\n" + m.group("indent") + b"}"
+        end = source.find(closing, m.end())
+        if end < 0:
+            return None
+        end = source.find(b"\n", end + len(closing))
+        end = len(source) if end < 0 else end + 1
+        regions.append((m.start(), end))
+        pos = end
+
+
+def _scanner_digest() -> str:
+    here = pathlib.Path(__file__).resolve().parent
+    return _digest(b"".join((here / name).read_bytes() for name in _SCANNER_SOURCES))
+
+
+class _RegionCache:
+    """Parsed entries per region fingerprint for one source file, kept on disk."""
+
+    def __init__(self, source_path: pathlib.Path, kind: str):
+        key = hashlib.sha256(str(source_path.resolve()).encode("utf-8")).hexdigest()[:16]
+        self.path = cache_dir(CACHE_NAME) / f"{kind}-{key}.json"
+        self.source = str(source_path.resolve())
+        self.scanner = _scanner_digest()
+        self.data = self._read()
+
+    def _read(self) -> Dict[str, Any]:
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except (FileNotFoundError, ValueError):
+            return {}
+        if (
+            not isinstance(data, dict)
+            or data.get("version") != CACHE_VERSION
+            or data.get("source") != self.source
+            or data.get("scanner") != self.scanner
+        ):
+            return {}
+        return data
+
+    def save(self, digest: str, layout: List[str], regions: Dict[str, Any]) -> None:
+        self.data = {
+            "version": CACHE_VERSION, "source": self.source, "scanner": self.scanner,
+            "digest": digest, "layout": layout, "regions": regions,
+        }
+        try:
+            write_text_if_changed(self.path, json.dumps(self.data, separators=(",", ":")))
+        except OSError:
+            pass  # The cache is an optimisation only.
+
+
+def _scan_regions(
+    path: pathlib.Path,
+    kind: str,
+    pattern: "re.Pattern[bytes]",
+    scan: Callable[[Any], Any],
+    merge: Callable[[List[Any]], T],
+) -> T:
+    """``merge`` of ``scan`` over each region of ``path``, reusing cached regions.
+
+    An unchanged file costs one hash pass; otherwise the regions are located
+    and only those with an unknown fingerprint are scanned.
+    """
+    cache = _RegionCache(path, kind)
+
+    def run(source: Any) -> T:
+        digest = _digest(source)
+        cached: Dict[str, Any] = cache.data.get("regions", {})
+        if cache.data.get("digest") == digest:
+            return merge([cached[key] for key in cache.data["layout"]])
+
+        located = locate_regions(source, pattern)
+        layout: List[str] = []
+        regions: Dict[str, Any] = {}
+        for start, end in located or [(0, len(source))]:
+            region = source[start:end]
+            key = _digest(region)
+            if key not in regions:
+                regions[key] = cached[key] if key in cached else scan(region)
+            layout.append(key)
+        cache.save(digest, layout, regions)
+        return merge([regions[key] for key in layout])
+
+    return _scan_mapped(path, run)
+
+
+def _concat(parts: List[List[str]]) -> List[str]:
+    return [name for part in parts for name in part]
+
+
+def cpp_tables(context: Context) -> CppTables:
+    """Prefix map and keywords from HighlighterrCxx.cpp, scanned once per context."""
+    def build() -> CppTables:
+        cpp_path = context.path(HIGHLIGHTERR_CPP)
+        if not cpp_path.exists():
+            raise StageError(f"HighlighterrCxx.cpp not found at {cpp_path}")
+        return _scan_regions(cpp_path, "cpp", _CPP_REGION_RE, _scan_cpp_entries, _merge_cpp)
+
+    return context.memo("highlighterr_extract.cpp", build)
+
+
+def classification_names(context: Context) -> List[str]:
+    """EClassification names from HighlighterrCxx.h, scanned once per context."""
+    def build() -> List[str]:
+        header_path = context.path(HIGHLIGHTERR_H)
+        if not header_path.exists():
+            raise StageError(f"Header file not found at {header_path}.")
+        return _scan_regions(header_path, "h", _H_REGION_RE, scan_header, _concat)
+
+    return context.memo("highlighterr_extract.h", build)
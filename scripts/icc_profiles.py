@@ -0,0 +1,163 @@
+"""icc_profiles.py
+Built-in ICC profiles for color_utils, so colour conversion works on machines
+without the macOS ColorSync profiles (Linux CI agents, containers).
+
+Provides:
+    • build_rgb_profile   – serialises a minimal ICC v4 matrix/TRC display
+      profile from chromaticities and a parametric transfer curve
+    • display_p3_profile  – Display P3 (DCI-P3 primaries, D65 white point and
+      the sRGB transfer curve), equivalent to Apple's "Display P3.icc"
+    • srgb_profile        – Pillow's built-in (LittleCMS) sRGB profile
+
+The profiles are generated in code rather than checked in as binaries. They
+are deterministic, so their content hash (used by the conversion cache) is
+stable between runs and machines.
+"""
+from __future__ import annotations
+
+import functools
+import struct
+from typing import List, Sequence, Tuple
+
+Matrix = List[List[float]]
+
+# Chromaticities (x, y)
+D65_WHITE = (0.3127, 0.3290)
+DISPLAY_P3_PRIMARIES = ((0.680, 0.320), (0.265, 0.690), (0.150, 0.060))
+SRGB_PRIMARIES = ((0.640, 0.330), (0.300, 0.600), (0.150, 0.060))
+
+# ICC profile connection space illuminant (D50), as XYZ
+PCS_D50 = (0.9642, 1.0, 0.8249)
+
+# Parameters (g, a, b, c, d) of the sRGB transfer curve as an ICC type 3
+# parametric curve: Y = (aX + b)^g for X >= d, Y = cX otherwise.
+SRGB_CURVE = (2.4, 1 / 1.055, 0.055 / 1.055, 1 / 12.92, 0.04045)
+
+_BRADFORD = [
+    [0.8951, 0.2664, -0.1614],
+    [-0.7502, 1.7135, 0.0367],
+    [0.0389, -0.0685, 1.0296],
+]
+
+
+def _s15fixed16(value: float) -> bytes:
+    return struct.pack(">i", int(round(value * 65536)))
+
+
+def _matmul(a: Matrix, b: Matrix) -> Matrix:
+    return [[sum(a[i][k] * b[k][j] for k in range(3)) for j in range(3)] for i in range(3)]
+
+
+def _matvec(m: Matrix, v: Sequence[float]) -> List[float]:
+    return [sum(m[i][k] * v[k] for k in range(3)) for i in range(3)]
+
+
+def _inverse(m: Matrix) -> Matrix:
+    (a, b, c), (d, e, f), (g, h, i) = m
+    det = a * (e * i - f * h) - b * (d * i - f * g) + c * (d * h - e * g)
+    return [
+        [(e * i - f * h) / det, (c * h - b * i) / det, (b * f - c * e) / det],
+        [(f * g - d * i) / det, (a * i - c * g) / det, (c * d - a * f) / det],
+        [(d * h - e * g) / det, (b * g - a * h) / det, (a * e - b * d) / det],
+    ]
+
+
+def _xy_to_xyz(xy: Tuple[float, float]) -> List[float]:
+    x, y = xy
+    return [x / y, 1.0, (1 - x - y) / y]
+
+
+def _chromatic_adaptation(src_white: Sequence[float], dst_white: Sequence[float]) -> Matrix:
+    """Bradford adaptation matrix from ``src_white`` to ``dst_white`` (XYZ)."""
+    src_cone = _matvec(_BRADFORD, src_white)
+    dst_cone = _matvec(_BRADFORD, dst_white)
+    scale = [[dst_cone[i] / src_cone[i] if i == j else 0.0 for j in range(3)] for i in range(3)]
+    return _matmul(_inverse(_BRADFORD), _matmul(scale, _BRADFORD))
+
+
+def _xyz_tag(xyz: Sequence[float]) -> bytes:
+    return b"XYZ \0\0\0\0" + b"".join(_s15fixed16(v) for v in xyz)
+
+
+def _text_tag(text: str) -> bytes:
+    encoded = text.encode("utf-16-be")
+    return b"mluc\0\0\0\0" + struct.pack(">II", 1, 12) + b"enUS" + struct.pack(">II", len(encoded), 28) + encoded
+
+
+def rgb_to_xyz_matrix(primaries: Sequence[Tuple[float, float]], white: Tuple[float, float]) -> Matrix:
+    """Matrix from linear RGB to XYZ (relative to ``white``, Y of white = 1)."""
+    white_xyz = _xy_to_xyz(white)
+    columns = [_xy_to_xyz(p) for p in primaries]
+    matrix = [[columns[j][i] for j in range(3)] for i in range(3)]
+    weights = _matvec(_inverse(matrix), white_xyz)
+    return [[matrix[i][j] * weights[j] for j in range(3)] for i in range(3)]
+
+
+def build_rgb_profile(
+    primaries: Sequence[Tuple[float, float]],
+    white: Tuple[float, float],
+    curve: Sequence[float],
+    description: str,
+) -> bytes:
+    """Serialise an ICC v4 RGB display profile with a matrix/TRC model.
+
+    ``primaries`` and ``white`` are (x, y) chromaticities; ``curve`` holds the
+    five parameters of an ICC type 3 parametric curve used for all channels.
+    """
+    rgb_to_xyz = rgb_to_xyz_matrix(primaries, white)
+    chad = _chromatic_adaptation(_xy_to_xyz(white), PCS_D50)
+    rgb_to_pcs = _matmul(chad, rgb_to_xyz)
+
+    trc = b"para\0\0\0\0" + struct.pack(">HH", 3, 0) + b"".join(_s15fixed16(v) for v in curve)
+    tags = [
+        (b"desc", _text_tag(description)),
+        (b"cprt", _text_tag("No copyright, use freely")),
+        (b"wtpt", _xyz_tag(PCS_D50)),
+        (b"chad", b"sf32\0\0\0\0" + b"".join(_s15fixed16(chad[i][j]) for i in range(3) for j in range(3))),
+        (b"rXYZ", _xyz_tag([rgb_to_pcs[i][0] for i in range(3)])),
+        (b"gXYZ", _xyz_tag([rgb_to_pcs[i][1] for i in range(3)])),
+        (b"bXYZ", _xyz_tag([rgb_to_pcs[i][2] for i in range(3)])),
+        (b"rTRC", trc),
+        (b"gTRC", trc),
+        (b"bTRC", trc),
+    ]
+
+    # Tag table followed by 4-byte aligned tag data; identical tags share data.
+    data_offset = 128 + 4 + 12 * len(tags)
+    table = b""
+    data = b""
+    offsets = {}
+    for signature, body in tags:
+        if body not in offsets:
+            data += b"\0" * (-(data_offset + len(data)) % 4)
+            offsets[body] = data_offset + len(data)
+            data += body
+        table += signature + struct.pack(">II", offsets[body], len(body))
+    payload = struct.pack(">I", len(tags)) + table + data
+    payload += b"\0" * (-len(payload) % 4)
+
+    header = (
+        struct.pack(">I", 128 + len(payload))
+        + b"\0\0\0\0"  # preferred CMM
+        + struct.pack(">I", 0x04300000)  # version 4.3
+        + b"mntrRGB XYZ "
+        + struct.pack(">6H", 2024, 1, 1, 0, 0, 0)
+        + b"acsp"
+        + b"\0" * 24  # platform, flags, manufacturer, model, attributes
+        + struct.pack(">I", 0)  # perceptual rendering intent
+        + b"".join(_s15fixed16(v) for v in PCS_D50)
+        + b"\0" * 48  # creator, profile ID, reserved
+    )
+    return header + payload
+
+
+@functools.lru_cache(maxsize=None)
+def display_p3_profile() -> bytes:
+    return build_rgb_profile(DISPLAY_P3_PRIMARIES, D65_WHITE, SRGB_CURVE, "Display P3")
+
+
+@functools.lru_cache(maxsize=None)
+def srgb_profile() -> bytes:
+    from PIL import ImageCms
+
+    return ImageCms.ImageCmsProfile(ImageCms.createProfile("sRGB")).tobytes()
@@ -0,0 +1,129 @@
+#!./.venv/bin/python3
+"""identifier_profile.py
+Count identifier occurrences in a C++ source tree, for ordering the
+generated .clangd rules by how often they match (see rule_order.py).
+
+Every C/C++ file under the given paths is tokenized with cpp_lexer, so
+comments, string literals and "#if 0" regions are skipped. Identifiers on
+preprocessor lines are counted as well, except the directive name and the
+rest of #include / #import lines.
+
+identifier-profile.json in the repository root is committed and is an input
+of generate_clangd_config.py, so the .clangd everyone gets is ordered by it.
+It is the canonical profile: the corpus generate_corpus.py builds with
+CANONICAL_LINES lines and seed CANONICAL_SEED, identifiers seen fewer than
+CANONICAL_MIN_COUNT times dropped. Only --canonical writes it, so it does not
+depend on anyone's source tree; rerun that after changing the keyword or
+prefix tables:
+
+    $ python3 scripts/identifier_profile.py --canonical
+
+Profiles of other source trees need --out, so they never replace it. The
+format is the same either way:
+
+    {"version": 1, "files": 2, "tokens": 152000,
+     "identifiers": {"auto": 4100, "m_Value": 310, ...}}
+
+Usage: python3 scripts/identifier_profile.py (--canonical | PATH... --out FILE) [--min-count 1]
+"""
+from __future__ import annotations
+
+import argparse
+import collections
+import json
+import pathlib
+import re
+import sys
+from typing import Counter, Iterable, Iterator
+
+from cpp_lexer import DIRECTIVE, IDENT, tokens
+from output_writer import write_text_if_changed
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+PROFILE_NAME = "identifier-profile.json"
+PROFILE_VERSION = 1
+
+CANONICAL_LINES = 20000
+CANONICAL_SEED = 1
+CANONICAL_MIN_COUNT = 2
+
+EXTENSIONS = frozenset((".c", ".cc", ".cpp", ".cxx", ".c++", ".h", ".hh", ".hpp", ".hxx", ".h++", ".inl", ".ipp", ".m", ".mm"))
+
+_DIRECTIVE_RE = re.compile(rb"[ \t]*#[ \t]*(\w*)")
+_IDENT_RE = re.compile(rb"[A-Za-z_$][A-Za-z0-9_$]*")
+_SKIPPED_DIRECTIVES = (b"include", b"import", b"include_next")
+
+
+def source_files(paths: Iterable[pathlib.Path]) -> Iterator[pathlib.Path]:
+    for path in paths:
+        if path.is_dir():
+            yield from sorted(p for p in path.rglob("*") if p.suffix.lower() in EXTENSIONS and p.is_file())
+        else:
+            yield path
+
+
+def count_identifiers(source: bytes, counts: Counter[str]) -> int:
+    """Add the identifiers of one file to ``counts``; returns how many were added."""
+    added = 0
+    for token in tokens(source):
+        if token.kind == IDENT:
+            counts[token.value.decode("utf-8", "replace")] += 1
+            added += 1
+        elif token.kind == DIRECTIVE:
+            m = _DIRECTIVE_RE.match(token.value)
+            if m is None or m.group(1) in _SKIPPED_DIRECTIVES:
+                continue
+            body = re.sub(rb'//[^\n]*|/\*.*?\*/|"(?:[^"\\\n]|\\.)*"', b" ", token.value[m.end():], flags=re.S)
+            for ident in _IDENT_RE.findall(body):
+                counts[ident.decode("utf-8", "replace")] += 1
+                added += 1
+    return added
+
+
+def canonical_source() -> bytes:
+    """The generated corpus the committed profile is taken from."""
+    from generate_corpus import CorpusGenerator
+
+    writer = CorpusGenerator.load(CANONICAL_SEED).build(CANONICAL_LINES, 1 << 62)
+    return ("\n".join(writer.lines) + "\n").encode("utf-8")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Count identifier occurrences in C++ sources.")
+    parser.add_argument("paths", type=pathlib.Path, nargs="*", help="files or directories to scan")
+    parser.add_argument("--canonical", action="store_true", help=f"write the committed {PROFILE_NAME} from the generated corpus")
+    parser.add_argument("--out", type=pathlib.Path, help=f"output file (default with --canonical: {PROFILE_NAME})")
+    parser.add_argument("--min-count", type=int, help="drop identifiers seen fewer times (default: 1)")
+    args = parser.parse_args()
+    if args.canonical == bool(args.paths):
+        parser.error("give either --canonical or the paths to scan")
+    if args.canonical and (args.out is not None or args.min_count is not None):
+        parser.error("--canonical always writes the canonical profile")
+    if args.paths and args.out is None:
+        parser.error(f"--out is required when scanning paths; {PROFILE_NAME} is the canonical profile")
+
+    counts: Counter[str] = collections.Counter()
+    files = 0
+    total = 0
+    if args.canonical:
+        args.out, args.min_count = ROOT / PROFILE_NAME, CANONICAL_MIN_COUNT
+        total = count_identifiers(canonical_source(), counts)
+        files = 1
+    for path in source_files(args.paths):
+        try:
+            source = path.read_bytes()
+        except OSError as exc:
+            print(f"Skipping {path}: {exc}", file=sys.stderr)
+            continue
+        total += count_identifiers(source, counts)
+        files += 1
+
+    min_count = args.min_count or 1
+    kept = sorted(((name, n) for name, n in counts.items() if n >= min_count), key=lambda item: (-item[1], item[0]))
+    profile = {"version": PROFILE_VERSION, "files": files, "tokens": total, "identifiers": dict(kept)}
+    write_text_if_changed(args.out, json.dumps(profile, indent=0, separators=(",", ":")) + "\n")
+    print(f"{args.out}: {total} identifier tokens in {files} files, {len(kept)} distinct identifiers kept")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""json_loader.py
+Fast loading of the hand-edited JSON5 files (themes/malterlib.json,
+darkModern.json).
+
+Parsing goes through three tiers, cheapest first:
+
+    1. the stdlib json C parser, for files that happen to be strict JSON;
+    2. strip_comments_and_trailing_commas() followed by json.loads(), which
+       covers the JSON5 we actually write (comments, trailing commas);
+    3. the pure-Python json5 package for anything else (unquoted keys,
+       single-quoted strings, hex numbers, ...).
+
+load_relaxed() additionally caches the parsed document in memory, keyed by
+path, mtime and size, and writes a strict-JSON sidecar to cache_dir("json") for
+files that needed tier 2 or 3, so later processes only pay for json.loads().
+Returned objects are shared between callers and must be treated as read-only.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import pathlib
+import re
+from typing import Any, Dict, Optional, Tuple
+
+from output_writer import cache_dir, write_text_if_changed
+
+CACHE_NAME = "json"
+SIDECAR_VERSION = 1
+
+# Strings are matched first so that "//" or "/*" inside them is left alone.
+# Unterminated strings and block comments match up to the end of the text, so
+# every alternative always makes progress and the scan stays linear.
+_COMMENT_RE = re.compile(r'"(?:[^"\\\n]|\\.)*"?|//[^\n]*|/\*[\s\S]*?(?:\*/|\Z)')
+_TRAILING_COMMA_RE = re.compile(r'"(?:[^"\\\n]|\\.)*"?|,(\s*[}\]])')
+
+_memory: Dict[pathlib.Path, Tuple[int, int, Any]] = {}
+
+
+def _drop_comment(match: "re.Match[str]") -> str:
+    token = match.group(0)
+    if token.startswith('"'):
+        return token
+    # Keep line breaks so that parse errors still point at the right line.
+    return "\n" * token.count("\n") if token.startswith("/*") else ""
+
+
+def _drop_comma(match: "re.Match[str]") -> str:
+    closing = match.group(1)
+    return match.group(0) if closing is None else closing
+
+
+def strip_comments_and_trailing_commas(text: str) -> str:
+    """Remove // and /* */ comments and trailing commas outside of strings.
+
+    Runs in linear time; the result is strict JSON if ``text`` only used
+    those JSON5 extensions.
+    """
+    return _TRAILING_COMMA_RE.sub(_drop_comma, _COMMENT_RE.sub(_drop_comment, text))
+
+
+def _parse(text: str) -> Tuple[Any, bool]:
+    """Parse relaxed JSON; the flag tells whether the fast path was enough."""
+    try:
+        return json.loads(text, strict=False), True
+    except ValueError:
+        pass
+    try:
+        return json.loads(strip_comments_and_trailing_commas(text), strict=False), False
+    except ValueError:
+        pass
+    import json5
+
+    return json5.loads(text), False
+
+
+def loads_relaxed(text: str) -> Any:
+    """Parse JSON5 text, using the stdlib parser whenever possible."""
+    return _parse(text)[0]
+
+
+def _sidecar_path(path: pathlib.Path) -> pathlib.Path:
+    return cache_dir(CACHE_NAME) / (hashlib.sha256(str(path).encode("utf-8")).hexdigest()[:32] + ".json")
+
+
+def _read_sidecar(path: pathlib.Path, mtime_ns: int, size: int) -> Optional[Any]:
+    try:
+        sidecar = json.loads(_sidecar_path(path).read_text(encoding="utf-8"))
+    except (FileNotFoundError, ValueError):
+        return None
+    if (
+        isinstance(sidecar, dict)
+        and sidecar.get("version") == SIDECAR_VERSION
+        and sidecar.get("source") == str(path)
+        and sidecar.get("mtime_ns") == mtime_ns
+        and sidecar.get("size") == size
+    ):
+        return sidecar.get("data")
+    return None
+
+
+def _write_sidecar(path: pathlib.Path, mtime_ns: int, size: int, data: Any) -> None:
+    sidecar = {"version": SIDECAR_VERSION, "source": str(path), "mtime_ns": mtime_ns, "size": size, "data": data}
+    try:
+        write_text_if_changed(_sidecar_path(path), json.dumps(sidecar, separators=(",", ":")))
+    except OSError:
+        pass  # The cache is an optimisation only.
+
+
+def clear_memory_cache() -> None:
+    """Forget the documents parsed so far; sidecars on disk are kept."""
+    _memory.clear()
+
+
+def load_relaxed(path: pathlib.Path) -> Any:
+    """Parsed contents of a JSON5 file, cached by path, mtime and size."""
+    path = pathlib.Path(path).resolve()
+    st = os.stat(path)
+    cached = _memory.get(path)
+    if cached is not None and cached[:2] == (st.st_mtime_ns, st.st_size):
+        return cached[2]
+
+    data = _read_sidecar(path, st.st_mtime_ns, st.st_size)
+    if data is None:
+        data, strict = _parse(path.read_text(encoding="utf-8"))
+        if not strict:
+            _write_sidecar(path, st.st_mtime_ns, st.st_size, data)
+    _memory[path] = (st.st_mtime_ns, st.st_size, data)
+    return data
@@ -0,0 +1,290 @@
+#!./.venv/bin/python3
+"""optimize_token_colors.py
+Remove the tokenColors selectors of themes/malterlib.json that cannot change
+how anything is coloured. The file is edited in place: only the lines of the
+removed selectors change, comments and layout are kept.
+
+Two kinds of selector are removed:
+
+    • unreachable – a selector naming a malterlib.* scope (as the scope or a
+      parent) that no scope the extension emits equals or starts with. The
+      emitted scopes are those of scopes.json, semanticScopesForPackage.json,
+      the semanticTokenScopes in package.json (which also cover clangd's own
+      token types) and the names in the grammars under syntaxes/. Other
+      namespaces come from grammars we do not ship and are left alone.
+      Each is listed with the emitted scopes closest to its unreachable names
+      (difflib, NEAR_MISS_CUTOFF). A selector that would colour a near miss
+      differently from the theme once renamed to it is most likely a typo
+      (malterlib.keyword.builtinfloattyp for ...builtinfloattype): it is
+      kept and listed under "Possible typos" so the theme can be fixed.
+    • shadowed – a selector whose removal leaves every resolved style
+      unchanged: a repeated selector whose later copy sets the same values, or
+      a child scope (keyword.operator.c) that resolves like its parent
+      (keyword.operator).
+
+Shadowing is decided with theme_resolver.ThemeModel, the theme trie
+vscode-textmate builds from tokenColors. Every scope the theme names or the
+extension emits is resolved under every chain of parent scopes the theme
+names, before and after each removal; selectors are tried deepest first, so
+children fold into their parents. Semantic tokens resolve through the same
+selectors without parents, which the empty chain covers.
+
+An entry whose selectors are all removed keeps its empty scope array, like
+the colour placeholders already in the theme.
+
+Usage: python3 scripts/optimize_token_colors.py
+"""
+from __future__ import annotations
+
+import difflib
+import json
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+from pipeline import Context, StageError, run_standalone
+from theme_resolver import Selector, Style, ThemeModel, emitted_scopes, parse_settings, probes, resolve_probes, scope_matches
+
+THEME = "themes/malterlib.json"
+NAMESPACE = "malterlib."
+NEAR_MISS_CUTOFF = 0.9
+
+
+# ---------------------------------------------------------------------------
+# Theme text with positions
+# ---------------------------------------------------------------------------
+
+_TOKEN_RE = re.compile(r'\s+|//[^\n]*|/\*[\s\S]*?\*/|"(?:[^"\\\n]|\\.)*"|[{}\[\],:]|[^\s{}\[\],:"/]+|/')
+
+
+@dataclass
+class _Node:
+    """A parsed JSON5 value; strings keep their position in the text."""
+
+    value: Any
+    start: int
+    end: int
+    items: Any = None  # list of _Node for arrays, dict of _Node for objects
+
+
+class _Parser:
+    """Just enough JSON5 for the theme: comments, trailing commas, bare keys."""
+
+    def __init__(self, text: str):
+        self.tokens = [
+            (m.group(0), m.start(), m.end()) for m in _TOKEN_RE.finditer(text)
+            if not m.group(0).isspace() and not m.group(0).startswith(("//", "/*"))
+        ]
+        self.pos = 0
+
+    def parse(self) -> _Node:
+        node = self._value()
+        if self.pos != len(self.tokens):
+            raise self._error("trailing content")
+        return node
+
+    def _error(self, what: str) -> StageError:
+        offset = self.tokens[self.pos][1] if self.pos < len(self.tokens) else "end"
+        return StageError(f"{THEME}: {what} at offset {offset}")
+
+    def _next(self) -> Tuple[str, int, int]:
+        if self.pos >= len(self.tokens):
+            raise self._error("unexpected end")
+        token = self.tokens[self.pos]
+        self.pos += 1
+        return token
+
+    def _value(self) -> _Node:
+        text, start, end = self._next()
+        if text == "{":
+            items: Dict[str, _Node] = {}
+            while self.tokens[self.pos][0] != "}":
+                key, _, _ = self._next()
+                key = json.loads(key) if key.startswith('"') else key
+                if self._next()[0] != ":":
+                    raise self._error("expected ':'")
+                items[key] = self._value()
+                if self.tokens[self.pos][0] == ",":
+                    self.pos += 1
+            end = self._next()[2]
+            return _Node({k: v.value for k, v in items.items()}, start, end, items)
+        if text == "[":
+            elements: List[_Node] = []
+            while self.tokens[self.pos][0] != "]":
+                elements.append(self._value())
+                if self.tokens[self.pos][0] == ",":
+                    self.pos += 1
+            end = self._next()[2]
+            return _Node([e.value for e in elements], start, end, elements)
+        try:
+            return _Node(json.loads(text), start, end)
+        except ValueError:
+            self.pos -= 1
+            raise self._error(f"unsupported JSON5 value {text!r}") from None
+
+
+def _remove_spans(text: str, spans: Iterable[Tuple[int, int]]) -> str:
+    """``text`` without the array elements at ``spans``, each with its comma.
+
+    Lines left empty are dropped whole, so one selector per line disappears
+    without a trace.
+    """
+    by_line: Dict[int, List[Tuple[int, int]]] = {}
+    for start, end in spans:
+        while end < len(text) and text[end] in " \t":
+            end += 1
+        if end < len(text) and text[end] == ",":
+            end += 1
+            while end < len(text) and text[end] in " \t":
+                end += 1
+        by_line.setdefault(text.rfind("\n", 0, start) + 1, []).append((start, end))
+
+    out: List[str] = []
+    pos = 0
+    for line_start in sorted(by_line):
+        line_end = text.find("\n", line_start)
+        line_end = len(text) if line_end < 0 else line_end
+        line: List[str] = []
+        cursor = line_start
+        for start, end in sorted(by_line[line_start]):
+            line.append(text[cursor:start])
+            cursor = end
+        line.append(text[cursor:line_end])
+        kept = "".join(line)
+        out.append(text[pos:line_start])
+        if kept.strip():
+            out.append(kept.rstrip(" \t"))
+            pos = line_end
+        else:
+            pos = line_end + 1
+    out.append(text[pos:])
+    return "".join(out)
+
+
+# ---------------------------------------------------------------------------
+# Optimizer
+# ---------------------------------------------------------------------------
+
+
+def is_reachable(selector: Selector, emitted: Set[str]) -> bool:
+    return not _unreachable_scopes(selector, emitted)
+
+
+def _unreachable_scopes(selector: Selector, emitted: Set[str]) -> List[str]:
+    return [
+        scope for scope in selector.scopes
+        if scope.startswith(NAMESPACE) and not any(scope_matches(name, scope) for name in emitted)
+    ]
+
+
+def near_misses(selector: Selector, emitted: Set[str]) -> Dict[str, List[str]]:
+    """The emitted scopes closest to each unreachable scope of ``selector``."""
+    candidates = sorted(name for name in emitted if name.startswith(NAMESPACE))
+    return {
+        scope: difflib.get_close_matches(scope, candidates, n=3, cutoff=NEAR_MISS_CUTOFF)
+        for scope in _unreachable_scopes(selector, emitted)
+    }
+
+
+def _corrected(selector: Selector, misses: Dict[str, List[str]]) -> Optional[Selector]:
+    """``selector`` with each unreachable scope replaced by its closest near miss."""
+    if not all(misses.values()):
+        return None
+    parts = [misses[scope][0] if scope in misses else scope for scope in reversed(selector.scopes)]
+    return Selector.parse(selector.position, selector.entry, " ".join(parts))
+
+
+@dataclass
+class Optimization:
+    selectors: List[Selector]
+    unreachable: List[Selector]
+    shadowed: List[Selector]
+    typos: List[Selector]
+    near_misses: Dict[Selector, Dict[str, List[str]]]
+    probes: int
+
+    @property
+    def removed(self) -> FrozenSet[Selector]:
+        return frozenset(self.unreachable) | frozenset(self.shadowed)
+
+
+def optimize(selectors: List[Selector], styles: List[Style], emitted: Set[str]) -> Optimization:
+    """Selectors that can go; ``styles`` holds the parsed settings of each entry."""
+    dead = [s for s in selectors if not is_reachable(s, emitted)]
+    live = [s for s in selectors if s not in set(dead)]
+    scopes, chains = probes(live, emitted)
+
+    def model(kept: Iterable[Selector]) -> ThemeModel:
+        return ThemeModel((s, styles[s.entry]) for s in kept)
+
+    misses = {s: near_misses(s, emitted) for s in dead}
+    unreachable: List[Selector] = []
+    typos: List[Selector] = []
+    for selector in dead:
+        corrected = _corrected(selector, misses[selector])
+        if corrected is None:
+            unreachable.append(selector)
+            continue
+        affected = [scope for scope in emitted if scope_matches(scope, corrected.scope)]
+        corrected_chains = {(), tuple(reversed(corrected.parents))}
+        if resolve_probes(model(live), affected, corrected_chains) != resolve_probes(
+                model(live + [corrected]), affected, corrected_chains):
+            typos.append(selector)
+        else:
+            unreachable.append(selector)
+
+    current = list(live)
+    shadowed: List[Selector] = []
+    for candidate in sorted(live, key=lambda s: (-s.scope.count("."), -len(s.parents), -s.position)):
+        if not candidate.scope:
+            continue
+        affected = [scope for scope in scopes if scope_matches(scope, candidate.scope)]
+        kept = [s for s in current if s is not candidate]
+        if resolve_probes(model(current), affected, chains) == resolve_probes(model(kept), affected, chains):
+            current = kept
+            shadowed.append(candidate)
+
+    before = resolve_probes(model(live), scopes, chains)
+    if before != resolve_probes(model(current), scopes, chains):
+        raise StageError("Removing the shadowed selectors changed a resolved style")
+    return Optimization(selectors, unreachable, shadowed, typos, misses, len(before))
+
+
+def run(context: Context) -> None:
+    text = context.read_text(THEME)
+    root = _Parser(text).parse()
+    if root.value != context.load_json(THEME, relaxed=True):
+        raise StageError(f"{THEME}: the position-keeping parser disagrees with json_loader")
+    entries: List[_Node] = root.items["tokenColors"].items
+
+    selectors: List[Selector] = []
+    nodes: Dict[Selector, _Node] = {}
+    styles: List[Style] = []
+    for index, entry in enumerate(entries):
+        styles.append(parse_settings(entry.value.get("settings") or {}))
+        scope = entry.items.get("scope")
+        if scope is None or not entry.value.get("settings"):
+            continue
+        if isinstance(scope.value, str):
+            raise StageError(f"{THEME}: tokenColors entry {index} uses a comma-separated scope string; use an array")
+        for node in scope.items:
+            selector = Selector.parse(len(selectors), index, node.value)
+            selectors.append(selector)
+            nodes[selector] = node
+
+    result = optimize(selectors, styles, emitted_scopes(context))
+    context.write_text(THEME, _remove_spans(text, ((nodes[s].start, nodes[s].end) for s in result.removed)))
+
+    print(f"{len(selectors)} selectors in {len(entries)} tokenColors entries, {result.probes} scope/parent probes")
+    for label, listed in (
+            ("Unreachable", result.unreachable), ("Shadowed", result.shadowed), ("Possible typos (kept)", result.typos)):
+        print(f"{label}: {len(listed)}")
+        for selector in sorted(listed, key=lambda s: s.position):
+            print(f"  entry {selector.entry + 1:3}  {selector.text}")
+            for scope, misses in result.near_misses.get(selector, {}).items():
+                print(f"             {scope}: {', '.join(misses) if misses else 'no emitted scope is close'}")
+    print(f"Kept {len(selectors) - len(result.removed)} selectors")
+
+
+if __name__ == "__main__":
+    run_standalone(run)
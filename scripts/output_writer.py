@@ -0,0 +1,69 @@
+"""output_writer.py
+Atomic, write-if-changed file output shared by all generator scripts.
+
+Generated files are compared byte for byte with what is already on disk and
+only rewritten when they differ, so unchanged outputs keep their mtime and do
+not wake up esbuild watch, VS Code theme reload or clangd config reload. When
+a file does change, the new content is written to a temporary file in the same
+directory and renamed over the old one, so readers never see a partial file.
+
+The on-disk caches (converted colours, JSON sidecars, Highlighterr regions,
+colour LUTs) live under cache_dir(): .cache/ in the repository, or the
+directory in MALTERLIB_CACHE_DIR.
+"""
+from __future__ import annotations
+
+import os
+import pathlib
+import tempfile
+
+CACHE_DIR_ENV_VAR = "MALTERLIB_CACHE_DIR"
+DEFAULT_CACHE_DIR = pathlib.Path(__file__).resolve().parents[1] / ".cache"
+
+
+def cache_dir(name: str = "") -> pathlib.Path:
+    """Directory of the cache ``name``, looked up on every call.
+
+    benchmarks/run_benchmarks.py sets MALTERLIB_CACHE_DIR to keep the caches
+    of its synthetic trees out of the repository.
+    """
+    base = os.environ.get(CACHE_DIR_ENV_VAR)
+    return (pathlib.Path(base) if base else DEFAULT_CACHE_DIR) / name
+
+
+def write_if_changed(path: pathlib.Path, data: bytes) -> bool:
+    """Write ``data`` to ``path`` unless it already holds exactly those bytes.
+
+    Returns True if the file was (re)written.
+    """
+    try:
+        if path.stat().st_size == len(data) and path.read_bytes() == data:
+            return False
+        mode = path.stat().st_mode & 0o777
+    except FileNotFoundError:
+        mode = None
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as tmp:
+            tmp.write(data)
+        if mode is not None:
+            os.chmod(tmp_name, mode)
+        else:
+            umask = os.umask(0)
+            os.umask(umask)
+            os.chmod(tmp_name, 0o666 & ~umask)
+        os.replace(tmp_name, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_name)
+        except FileNotFoundError:
+            pass
+        raise
+    return True
+
+
+def write_text_if_changed(path: pathlib.Path, text: str) -> bool:
+    """UTF-8 variant of write_if_changed()."""
+    return write_if_changed(path, text.encode("utf-8"))
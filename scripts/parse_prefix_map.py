@@ -2,25 +2,16 @@
 """Extract ms_PrefixMap entries (prefix, classification, variable?) from HighlighterrCxx.cpp.
 Outputs prefixmap.json in workspace root.
 """
-import pathlib, re, json, sys
+from highlighterr_extract import cpp_tables
+from pipeline import Context, run_standalone
 
-ROOT = pathlib.Path(__file__).resolve().parents[1]
-CPP_PATH = ROOT.parent / "Highlighterr" / "HighlighterrCxx" / "HighlighterrCxx.cpp"
-OUT_PATH = ROOT / "prefixmap.json"
 
-if not CPP_PATH.exists():
-    print(f"HighlighterrCxx.cpp not found at {CPP_PATH}", file=sys.stderr)
-    sys.exit(1)
+def run(context: Context) -> None:
+    prefix_map = cpp_tables(context).prefix_map
 
-content = CPP_PATH.read_text(encoding="utf-8", errors="ignore")
+    context.write_json("prefixmap.json", dict(sorted(prefix_map.items())))
+    print(f"Wrote {len(prefix_map)} prefixes to prefixmap.json")
 
-# Regex for entries inside ms_PrefixMap array
-pattern: str = r"\{\s*\"([^\"]*)\"\s*,\s*EClassification::(EClassification_[A-Za-z0-9_]+)\s*,\s*(true|false)\s*\}"
-entry_re = re.compile(pattern)
 
-matches = entry_re.findall(content)
-
-prefix_map = {prefix: {"classification": cls, "variable": b == "true"} for prefix, cls, b in matches}
-
-OUT_PATH.write_text(json.dumps(prefix_map, indent=2, sort_keys=True) + "\n", encoding="utf-8")
-print(f"Wrote {len(prefix_map)} prefixes to {OUT_PATH.relative_to(ROOT)}") 
\ No newline at end of file
+if __name__ == "__main__":
+    run_standalone(run)
@@ -0,0 +1,341 @@
+"""pipeline.py
+Stage graph for the generator scripts driven by update_all.py.
+
+Every stage declares the files it reads and writes (paths relative to the
+repository root; the Highlighterr sources live in a sibling checkout). The
+hash manifest stored in .generated-manifest.json records the content hash of
+those files after the last successful run of each stage, and the values of
+the environment variables that configure it, which lets the runner skip
+stages whose inputs, options and outputs are unchanged.
+
+Stages read and write files through a Context, which doubles as an in-memory
+artifact store: a JSON document written by one stage is handed to later
+stages as the same parsed object, every file is parsed at most once per
+context, and nothing is written to disk until the context is flushed. Flushing
+goes through output_writer, so files whose bytes are unchanged are left alone.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import pathlib
+import sys
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from json_loader import load_relaxed, loads_relaxed
+from output_writer import write_text_if_changed
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+MANIFEST_PATH = ROOT / ".generated-manifest.json"
+MANIFEST_VERSION = 1
+
+HIGHLIGHTERR_CPP = "../Highlighterr/HighlighterrCxx/HighlighterrCxx.cpp"
+HIGHLIGHTERR_H = "../Highlighterr/HighlighterrCxx/HighlighterrCxx.h"
+
+# Helper modules every stage imports, directly or through its Context.
+SHARED_MODULES = ("scripts/pipeline.py", "scripts/output_writer.py", "scripts/json_loader.py")
+
+
+@dataclass(frozen=True)
+class Stage:
+    """A generator script together with the files it reads and writes.
+
+    The script itself and SHARED_MODULES are always treated as inputs, so
+    editing a generator or the helpers behind its Context invalidates its
+    outputs. Other helper modules must be listed explicitly. ``options`` names the environment variables
+    the stage reads; changing one of them also invalidates its outputs.
+    """
+
+    script: str
+    inputs: Tuple[str, ...]
+    outputs: Tuple[str, ...]
+    options: Tuple[str, ...] = ()
+
+    @property
+    def all_inputs(self) -> Tuple[str, ...]:
+        return tuple(dict.fromkeys((self.script,) + SHARED_MODULES + self.inputs))
+
+    @property
+    def module(self) -> str:
+        """Import name of the stage script (the scripts directory is on sys.path)."""
+        return pathlib.PurePosixPath(self.script).stem
+
+
+STAGES: Tuple[Stage, ...] = (
+    Stage(
+        "scripts/parse_prefix_map.py",
+        inputs=(HIGHLIGHTERR_CPP, "scripts/highlighterr_extract.py", "scripts/cpp_lexer.py"),
+        outputs=("prefixmap.json",),
+    ),
+    Stage(
+        "scripts/generate_classifications.py",
+        inputs=(HIGHLIGHTERR_H, "scripts/highlighterr_extract.py", "scripts/cpp_lexer.py", "scripts/scope_utils.py"),
+        outputs=("classifications.json",),
+    ),
+    Stage(
+        "scripts/extract_keywords.py",
+        inputs=(HIGHLIGHTERR_CPP, "scripts/highlighterr_extract.py", "scripts/cpp_lexer.py"),
+        outputs=("keywords.json",),
+    ),
+    Stage(
+        "scripts/generate_settings_from_theme.py",
+        inputs=("themes/malterlib.json", "settingsTemplate.json", "scripts/color_utils.py", "scripts/icc_profiles.py"),
+        outputs=("settings.json", "settingsSRGB.json"),
+    ),
+    Stage(
+        "scripts/combine_scopes.py",
+        inputs=(
+            "keywords.json", "prefixmap.json", "classifications.json", "scripts/scope_automaton.py",
+            "scripts/scope_pruning.py", "scripts/classifier.py", "scripts/regex_trie.py", "scripts/rule_order.py",
+        ),
+        outputs=("scopes.json", "classifier.json"),
+        options=("MALTERLIB_PRUNE_SCOPES",),
+    ),
+    Stage(
+        "scripts/convert_theme_to_srgb.py",
+        inputs=("themes/malterlib.json", "scripts/color_utils.py", "scripts/icc_profiles.py"),
+        outputs=("themes/malterlibSRGB.json",),
+    ),
+    Stage(
+        "scripts/generate_theme_no_tokens.py",
+        inputs=("themes/malterlib.json", "darkModern.json", "scripts/color_utils.py", "scripts/icc_profiles.py"),
+        outputs=("themes/malterlibNoTokens.json",),
+    ),
+    Stage(
+        "scripts/generate_clangd_config.py",
+        inputs=(
+            "scopes.json", ".clangd-template", "identifier-profile.json", "scripts/regex_trie.py", "scripts/rule_order.py",
+            "scripts/classifier.py", "scripts/scope_automaton.py", "scripts/identifier_profile.py", "scripts/cpp_lexer.py",
+        ),
+        outputs=(".clangd", "semanticScopesForPackage.json"),
+    ),
+    Stage(
+        "scripts/generate_readme.py",
+        inputs=("README-template.md", "settings.json", "settingsSRGB.json", ".clangd"),
+        outputs=("README.md",),
+    ),
+)
+
+
+class StageError(Exception):
+    """Raised by a stage's run() for expected failures such as missing inputs."""
+
+
+class _Artifact:
+    """Text and/or parsed form of one file held by a Context."""
+
+    __slots__ = ("text", "data", "pending")
+
+    def __init__(self, text: str, data: Any = None, pending: bool = False):
+        self.text = text
+        self.data = data
+        self.pending = pending
+
+
+class Context:
+    """State handed to each stage's run() entry point.
+
+    Standalone scripts get a fresh context; update_all.py --in-process shares
+    one context between all stages that run in the same interpreter, so a
+    document parsed or produced by one stage is reused by the next.
+
+    Objects returned by load_json() are shared between stages and must be
+    treated as read-only; copy them before modifying.
+    """
+
+    def __init__(self, root: pathlib.Path = ROOT):
+        self.root = root
+        self._artifacts: Dict[pathlib.Path, _Artifact] = {}
+        self._memo: Dict[str, Any] = {}
+
+    def path(self, rel: str) -> pathlib.Path:
+        """Absolute path of a file given relative to the repository root."""
+        return (self.root / rel).resolve()
+
+    def _artifact(self, rel: str) -> Optional[_Artifact]:
+        path = self.path(rel)
+        artifact = self._artifacts.get(path)
+        if artifact is None:
+            try:
+                text = path.read_text(encoding="utf-8")
+            except FileNotFoundError:
+                return None
+            artifact = self._artifacts[path] = _Artifact(text)
+        return artifact
+
+    def exists(self, rel: str) -> bool:
+        return self.path(rel) in self._artifacts or self.path(rel).exists()
+
+    def read_text(self, rel: str) -> str:
+        artifact = self._artifact(rel)
+        if artifact is None:
+            raise FileNotFoundError(self.path(rel))
+        return artifact.text
+
+    def load_json(self, rel: str, relaxed: bool = False) -> Any:
+        """Parsed contents of a JSON file; ``relaxed`` accepts JSON5 syntax.
+
+        Relaxed files are parsed by json_loader, which keeps its own cache
+        across contexts (keyed by mtime) and a strict-JSON sidecar on disk.
+        """
+        artifact = self._artifact(rel)
+        if artifact is None:
+            raise FileNotFoundError(self.path(rel))
+        if artifact.data is None:
+            if relaxed and not artifact.pending:
+                artifact.data = load_relaxed(self.path(rel))
+            elif relaxed:
+                artifact.data = loads_relaxed(artifact.text)
+            else:
+                artifact.data = json.loads(artifact.text)
+        return artifact.data
+
+    def memo(self, key: str, build: Callable[[], Any]) -> Any:
+        """Value of ``build()``, computed once per context and shared by stages."""
+        if key not in self._memo:
+            self._memo[key] = build()
+        return self._memo[key]
+
+    def write_text(self, rel: str, text: str, data: Any = None) -> None:
+        """Queue ``text`` to be written to ``rel``; ``data`` is its parsed form, if any."""
+        self._artifacts[self.path(rel)] = _Artifact(text, data, pending=True)
+
+    def write_json(self, rel: str, data: Any, indent: int = 2, trailing_newline: bool = True) -> None:
+        """Queue ``data`` to be written to ``rel`` as JSON.
+
+        Later stages receive ``data`` itself from load_json(), so key order
+        must already be the order wanted on disk.
+        """
+        text = json.dumps(data, indent=indent)
+        self.write_text(rel, text + "\n" if trailing_newline else text, data)
+
+    def digest(self, rel: str) -> Optional[str]:
+        """SHA-256 of a file as this context sees it, or None if it does not exist."""
+        path = self.path(rel)
+        artifact = self._artifacts.get(path)
+        if artifact is not None and artifact.pending:
+            data = artifact.text.encode("utf-8")
+        else:
+            try:
+                data = path.read_bytes()
+            except FileNotFoundError:
+                return None
+        return hashlib.sha256(data).hexdigest()
+
+    def flush(self) -> Tuple[List[pathlib.Path], int]:
+        """Write queued files whose content differs from disk.
+
+        Returns the paths that were actually rewritten and the number of
+        queued files.
+        """
+        changed: List[pathlib.Path] = []
+        queued = 0
+        for path, artifact in self._artifacts.items():
+            if not artifact.pending:
+                continue
+            queued += 1
+            if write_text_if_changed(path, artifact.text):
+                changed.append(path)
+            artifact.pending = False
+        return changed, queued
+
+
+def run_standalone(run: Callable[[Context], None]) -> None:
+    """Entry point used by ``python3 scripts/<stage>.py``."""
+    context = Context()
+    try:
+        run(context)
+    except StageError as exc:
+        print(exc, file=sys.stderr)
+        sys.exit(1)
+    changed, queued = context.flush()
+    print(f"{len(changed)} of {queued} output files changed.")
+
+
+class Manifest:
+    """Content hashes recorded after the last successful run of each stage."""
+
+    def __init__(self, path: pathlib.Path = MANIFEST_PATH, context: Optional[Context] = None):
+        self.path = path
+        self.context = context or Context()
+        self.stages: Dict[str, Dict[str, Dict[str, Optional[str]]]] = {}
+        self._digests: Dict[str, Optional[str]] = {}
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+        except (FileNotFoundError, ValueError):
+            return
+        if isinstance(data, dict) and data.get("version") == MANIFEST_VERSION:
+            self.stages = data.get("stages", {})
+
+    def digest(self, rel: str) -> Optional[str]:
+        if rel not in self._digests:
+            self._digests[rel] = self.context.digest(rel)
+        return self._digests[rel]
+
+    def invalidate(self, paths: Iterable[str]) -> None:
+        """Forget cached digests for files that a stage may have rewritten."""
+        for rel in paths:
+            self._digests.pop(rel, None)
+
+    def _snapshot(self, stage: Stage) -> Dict[str, Dict[str, Optional[str]]]:
+        snapshot = {
+            "inputs": {rel: self.digest(rel) for rel in stage.all_inputs},
+            "outputs": {rel: self.digest(rel) for rel in stage.outputs},
+        }
+        if stage.options:
+            snapshot["options"] = {name: os.environ.get(name) for name in stage.options}
+        return snapshot
+
+    def is_up_to_date(self, stage: Stage) -> bool:
+        """True if the stage's inputs and outputs match the recorded hashes."""
+        recorded = self.stages.get(stage.script)
+        if not recorded:
+            return False
+        current = self._snapshot(stage)
+        if any(digest is None for digest in current["outputs"].values()):
+            return False
+        return current == recorded
+
+    def record(self, stage: Stage) -> None:
+        """Store the current hashes for a stage that has just run successfully."""
+        self.invalidate(stage.outputs)
+        self.stages[stage.script] = self._snapshot(stage)
+
+    def save(self) -> None:
+        data = {"version": MANIFEST_VERSION, "stages": self.stages}
+        write_text_if_changed(self.path, json.dumps(data, indent=2, sort_keys=True) + "\n")
+
+
+def dependencies(stage: Stage, stages: Iterable[Stage] = STAGES) -> Tuple[Stage, ...]:
+    """Stages among ``stages`` that produce one of ``stage``'s inputs."""
+    inputs = set(stage.all_inputs)
+    return tuple(other for other in stages if other is not stage and inputs.intersection(other.outputs))
+
+
+def source_inputs(stages: Iterable[Stage] = STAGES) -> Tuple[str, ...]:
+    """Inputs that no stage produces, i.e. the files edited by hand."""
+    stages = tuple(stages)
+    produced = {rel for stage in stages for rel in stage.outputs}
+    sources: Dict[str, None] = {}
+    for stage in stages:
+        for rel in stage.all_inputs:
+            if rel not in produced:
+                sources[rel] = None
+    return tuple(sources)
+
+
+def affected_stages(changed: Iterable[str], stages: Iterable[Stage] = STAGES) -> Tuple[Stage, ...]:
+    """Stages that read one of ``changed``, plus everything downstream of them.
+
+    The result keeps the order of ``stages``, which is a valid execution order.
+    """
+    stages = tuple(stages)
+    dirty = set(changed)
+    affected = []
+    for stage in stages:
+        if dirty.intersection(stage.all_inputs):
+            affected.append(stage)
+            dirty.update(stage.outputs)
+    return tuple(affected)
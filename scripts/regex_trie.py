@@ -0,0 +1,221 @@
+"""regex_trie.py
+Factor alternations of literals into compact regexes for the generated
+.clangd rules.
+
+    • trie_regex(words)        – a regex for exactly ``words``: common
+                                 prefixes are factored as in a trie, branches
+                                 with the same continuation share one
+                                 character class and a leading character
+                                 some words merely add becomes optional, e.g.
+                                 fp8|fp16|fp32 → fp(16|32|8),
+                                 ufp16|zfp16 → [uz]fp16 and
+                                 zufp8|zfp8|ufp8|fp8 → z?u?fp8
+    • factor_alternatives(...) – the same for (literal, tail regex) pairs:
+                                 pairs with the same tail are factored as
+                                 (trie of the literals)tail
+    • finite_language(pattern) – every string a trie_regex() result matches,
+                                 used to check the result is exact
+
+The output only uses what POSIX extended regular expressions (clangd's
+llvm::Regex) and Python's re agree on: literal characters, backslash-escaped
+metacharacters, (...) groups, |, ? and bracket expressions of letters, digits
+and "_". Factoring only applies a(X|Y) = aX|aY, XT|YT = (X|Y)T and aX|X = a?X, so the
+language is unchanged by construction; generate_clangd_config.py checks it
+anyway.
+"""
+from __future__ import annotations
+
+import functools
+import itertools
+import string
+from typing import Dict, FrozenSet, Iterable, List, Sequence, Set, Tuple
+
+_ERE_SPECIAL = frozenset(".[]\\()*+?{}|^$")
+# Characters that may appear inside a generated bracket expression.
+_CLASS_SAFE = frozenset(string.ascii_letters + string.digits + "_")
+# Ranges a bracket expression may abbreviate (a-c); never across categories.
+_RANGES = (string.digits, string.ascii_uppercase, string.ascii_lowercase)
+
+def escape(text: str) -> str:
+    """``text`` as a literal in both POSIX ERE and Python re."""
+    return "".join("\\" + ch if ch in _ERE_SPECIAL else ch for ch in text)
+
+
+def _char_class(chars: Sequence[str]) -> str:
+    if len(chars) == 1:
+        return escape(chars[0])
+    parts: List[str] = []
+    remaining = set(chars)
+    for alphabet in _RANGES:
+        for _, run in itertools.groupby(enumerate(c for c in alphabet if c in remaining), lambda p: ord(p[1]) - p[0]):
+            run_chars = [c for _, c in run]
+            remaining.difference_update(run_chars)
+            parts.append(f"{run_chars[0]}-{run_chars[-1]}" if len(run_chars) >= 3 else "".join(run_chars))
+    parts.extend(sorted(remaining))
+    return "[" + "".join(parts) + "]"
+
+
+def _is_group(body: str) -> bool:
+    """Whether ``body`` is a single (...) group."""
+    if not (body.startswith("(") and body.endswith(")")):
+        return False
+    depth = 0
+    escaped = False
+    for i, ch in enumerate(body):
+        if escaped:
+            escaped = False
+        elif ch == "\\":
+            escaped = True
+        elif ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+            if depth == 0 and i != len(body) - 1:
+                return False
+    return True
+
+
+def _is_atom(body: str) -> bool:
+    if len(body) == 1 or (len(body) == 2 and body[0] == "\\"):
+        return True
+    if body.startswith("[") and body.endswith("]") and "]" not in body[1:-1]:
+        return True
+    return _is_group(body)
+
+
+def _optional(body: str) -> str:
+    return body + "?" if _is_atom(body) else f"({body})?"
+
+
+def _alternation(alternatives: List[str]) -> str:
+    return alternatives[0] if len(alternatives) == 1 else "(" + "|".join(alternatives) + ")"
+
+
+def _prefix_alternatives(words: FrozenSet[str]) -> List[str]:
+    """Alternatives for non-empty ``words`` grouped by their first character."""
+    by_first: Dict[str, Set[str]] = {}
+    for word in words:
+        by_first.setdefault(word[0], set()).add(word[1:])
+
+    # Characters grouped by the regex of what follows them.
+    by_continuation: Dict[str, List[str]] = {}
+    singles: List[str] = []
+    for ch in sorted(by_first):
+        continuation = _emit(frozenset(by_first[ch]))
+        if ch in _CLASS_SAFE:
+            by_continuation.setdefault(continuation, []).append(ch)
+        else:
+            singles.append(escape(ch) + continuation)
+    return [_char_class(chars) + continuation for continuation, chars in sorted(by_continuation.items())] + singles
+
+
+def _alternatives(words: FrozenSet[str]) -> List[str]:
+    """Alternatives whose union is exactly the non-empty ``words``.
+
+    When the words after a first character ``c`` (M) and the words not
+    starting with ``c`` (R) share a set S, c·M ∪ R is written as
+    c?S | c(M − S) | (R − S), e.g. zfp8|fp8 → z?fp8. The character sharing
+    the most words is factored first.
+    """
+    best: Tuple[int, str, FrozenSet[str]] = (1, "", frozenset())
+    for ch in sorted({word[0] for word in words}):
+        after = frozenset(word[1:] for word in words if word[0] == ch)
+        shared = after & words
+        if len(shared) > best[0]:
+            best = (len(shared), ch, shared)
+    _, ch, shared = best
+    if not shared:
+        return _prefix_alternatives(words)
+
+    with_ch = frozenset(word for word in words if word[0] == ch)
+    alternatives = [_optional(escape(ch)) + _emit(shared)]
+    remaining_after = frozenset(word[1:] for word in with_ch) - shared
+    if remaining_after:
+        alternatives.append(escape(ch) + _emit(remaining_after))
+    others = words - with_ch - shared
+    if others:
+        alternatives.extend(_alternatives(others))
+    return alternatives
+
+
+@functools.lru_cache(maxsize=None)
+def _emit(words: FrozenSet[str]) -> str:
+    """Regex for exactly ``words`` ("" if only the empty word)."""
+    non_empty = words - {""}
+    if not non_empty:
+        return ""
+    body = _alternation(_alternatives(non_empty))
+    return _optional(body) if "" in words else body
+
+
+def trie_regex(words: Iterable[str]) -> str:
+    """Unanchored regex matching exactly ``words`` (the empty word included)."""
+    return _emit(frozenset(words))
+
+
+def factor_alternatives(pairs: Sequence[Tuple[str, str]]) -> str:
+    """Unanchored regex for the union of ``literal`` + ``tail`` over ``pairs``.
+
+    Tails are kept as given, in order of first appearance; literals sharing
+    a tail are merged with trie_regex().
+    """
+    by_tail: Dict[str, List[str]] = {}
+    for literal, tail in pairs:
+        by_tail.setdefault(tail, []).append(literal)
+    return _alternation([trie_regex(literals) + tail for tail, literals in by_tail.items()])
+
+
+def _parse_alternation(pattern: str, pos: int) -> Tuple[Set[str], int]:
+    language: Set[str] = set()
+    while True:
+        branch, pos = _parse_concatenation(pattern, pos)
+        language |= branch
+        if pos < len(pattern) and pattern[pos] == "|":
+            pos += 1
+            continue
+        return language, pos
+
+
+def _parse_concatenation(pattern: str, pos: int) -> Tuple[Set[str], int]:
+    language = {""}
+    while pos < len(pattern) and pattern[pos] not in "|)":
+        ch = pattern[pos]
+        if ch == "(":
+            atom, pos = _parse_alternation(pattern, pos + 1)
+            if pos >= len(pattern) or pattern[pos] != ")":
+                raise ValueError(f"Unbalanced group in {pattern!r}")
+            pos += 1
+        elif ch == "[":
+            end = pattern.index("]", pos + 1)
+            atom = set()
+            body = pattern[pos + 1:end]
+            i = 0
+            while i < len(body):
+                if i + 2 < len(body) and body[i + 1] == "-":
+                    atom.update(chr(c) for c in range(ord(body[i]), ord(body[i + 2]) + 1))
+                    i += 3
+                else:
+                    atom.add(body[i])
+                    i += 1
+            pos = end + 1
+        elif ch == "\\":
+            atom = {pattern[pos + 1]}
+            pos += 2
+        elif ch in _ERE_SPECIAL:
+            raise ValueError(f"Unsupported construct {ch!r} in {pattern!r}")
+        else:
+            atom = {ch}
+            pos += 1
+        if pos < len(pattern) and pattern[pos] == "?":
+            atom = atom | {""}
+            pos += 1
+        language = {a + b for a in language for b in atom}
+    return language, pos
+
+
+def finite_language(pattern: str) -> Set[str]:
+    """All strings matched by a trie_regex() result (no *, + or anchors)."""
+    language, pos = _parse_alternation(pattern, 0)
+    if pos != len(pattern):
+        raise ValueError(f"Unbalanced group in {pattern!r}")
+    return language
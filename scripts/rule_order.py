@@ -0,0 +1,268 @@
+"""rule_order.py
+Order the generated .clangd rules so the ones that match most often come
+first, without changing which rule matches any identifier.
+
+clangd tries the rules of a section in order and uses the first that
+matches, so rule j may only move before rule i if no identifier matches both
+or both give the same scope. overlap_witness() decides this exactly: each
+anchored rule regex is compiled to an automaton (the subset the generator
+emits: literals, escapes, bracket expressions, groups, |, ?, * and +) and
+the product of two automata is searched breadth first, which yields the
+shortest identifier both accept (the witness) or None.
+
+    • overlap(a, b)             – overlap_witness() of two rule regexes
+    • precedence(rules)         – (i, j, witness) for every i < j whose
+                                  rules overlap with different scopes; i must
+                                  stay before j (e.g. the keyword rule with
+                                  NULL before the N[A-Z]... namespace rule)
+    • order_rules(weights, ...) – rule indices, most matches first as far as
+                                  the precedence pairs allow
+    • evaluations_per_token(...) – average number of regexes tried per token
+
+The weights come from an identifier profile (identifier_profile.py), which
+counts identifier occurrences in a source tree or corpus.
+"""
+from __future__ import annotations
+
+from collections import deque
+from typing import Deque, Dict, FrozenSet, Iterable, List, Optional, Sequence, Set, Tuple
+
+from pipeline import StageError
+
+_REPEAT = "?*+"
+
+
+class _Automaton:
+    """NFA for an anchored rule regex, explored as a DFA on demand."""
+
+    def __init__(self, regex: str):
+        if not (regex.startswith("^") and regex.endswith("$")):
+            raise ValueError(f"Rule is not anchored: {regex!r}")
+        self._pattern = regex[1:-1]
+        self._pos = 0
+        self._moves: List[List[Tuple[FrozenSet[str], int]]] = []
+        self._epsilon: List[List[int]] = []
+        start, self.accept = self._alternation()
+        if self._pos != len(self._pattern):
+            raise ValueError(f"Unbalanced group in {regex!r}")
+        self.alphabet = frozenset(ch for moves in self._moves for chars, _ in moves for ch in chars)
+        self.start = self._closure([start])
+        self._steps: Dict[Tuple[FrozenSet[int], str], FrozenSet[int]] = {}
+
+    # -- Thompson construction ---------------------------------------------
+
+    def _state(self) -> int:
+        self._moves.append([])
+        self._epsilon.append([])
+        return len(self._moves) - 1
+
+    def _alternation(self) -> Tuple[int, int]:
+        branches = [self._concatenation()]
+        while self._peek() == "|":
+            self._pos += 1
+            branches.append(self._concatenation())
+        if len(branches) == 1:
+            return branches[0]
+        start, end = self._state(), self._state()
+        for branch_start, branch_end in branches:
+            self._epsilon[start].append(branch_start)
+            self._epsilon[branch_end].append(end)
+        return start, end
+
+    def _concatenation(self) -> Tuple[int, int]:
+        start = end = self._state()
+        while self._peek() not in ("", "|", ")"):
+            atom_start, atom_end = self._repetition()
+            self._epsilon[end].append(atom_start)
+            end = atom_end
+        return start, end
+
+    def _repetition(self) -> Tuple[int, int]:
+        start, end = self._atom()
+        while self._peek() and self._peek() in _REPEAT:
+            op = self._pattern[self._pos]
+            self._pos += 1
+            outer_start, outer_end = self._state(), self._state()
+            self._epsilon[outer_start].append(start)
+            self._epsilon[end].append(outer_end)
+            if op in "?*":
+                self._epsilon[outer_start].append(outer_end)
+            if op in "*+":
+                self._epsilon[end].append(start)
+            start, end = outer_start, outer_end
+        return start, end
+
+    def _atom(self) -> Tuple[int, int]:
+        ch = self._peek()
+        if ch == "(":
+            self._pos += 3 if self._pattern.startswith("(?:", self._pos) else 1
+            fragment = self._alternation()
+            if self._peek() != ")":
+                raise ValueError(f"Unbalanced group in {self._pattern!r}")
+            self._pos += 1
+            return fragment
+        if ch == "[":
+            chars = self._bracket()
+        elif ch == "\\":
+            chars = frozenset(self._pattern[self._pos + 1])
+            self._pos += 2
+        elif ch in ".^$" or ch in _REPEAT:
+            raise ValueError(f"Unsupported construct {ch!r} in {self._pattern!r}")
+        else:
+            chars = frozenset(ch)
+            self._pos += 1
+        start, end = self._state(), self._state()
+        self._moves[start].append((chars, end))
+        return start, end
+
+    def _bracket(self) -> FrozenSet[str]:
+        pattern = self._pattern
+        pos = self._pos + 1
+        if pattern[pos] == "^":
+            raise ValueError(f"Negated bracket expressions are not supported: {pattern!r}")
+        chars: Set[str] = set()
+        first = True
+        while first or pattern[pos] != "]":
+            first = False
+            ch = pattern[pos]
+            if ch == "\\":
+                ch = pattern[pos + 1]
+                pos += 1
+            if pattern[pos + 1] == "-" and pattern[pos + 2] != "]":
+                chars.update(chr(c) for c in range(ord(ch), ord(pattern[pos + 2]) + 1))
+                pos += 3
+            else:
+                chars.add(ch)
+                pos += 1
+        self._pos = pos + 1
+        return frozenset(chars)
+
+    def _peek(self) -> str:
+        return self._pattern[self._pos] if self._pos < len(self._pattern) else ""
+
+    # -- subset construction -------------------------------------------------
+
+    def _closure(self, states: Iterable[int]) -> FrozenSet[int]:
+        seen = set(states)
+        stack = list(seen)
+        while stack:
+            for target in self._epsilon[stack.pop()]:
+                if target not in seen:
+                    seen.add(target)
+                    stack.append(target)
+        return frozenset(seen)
+
+    def step(self, states: FrozenSet[int], ch: str) -> FrozenSet[int]:
+        key = (states, ch)
+        result = self._steps.get(key)
+        if result is None:
+            result = self._steps[key] = self._closure(
+                target for state in states for chars, target in self._moves[state] if ch in chars)
+        return result
+
+
+def overlap_witness(a: _Automaton, b: _Automaton) -> Optional[str]:
+    """Shortest string both automata accept, or None if there is none."""
+    alphabet = sorted(a.alphabet & b.alphabet)
+    start = (a.start, b.start)
+    parents: Dict[Tuple[FrozenSet[int], FrozenSet[int]], Optional[Tuple[Tuple[FrozenSet[int], FrozenSet[int]], str]]] = {
+        start: None}
+    queue: Deque[Tuple[FrozenSet[int], FrozenSet[int]]] = deque([start])
+    while queue:
+        pair = queue.popleft()
+        if a.accept in pair[0] and b.accept in pair[1]:
+            witness: List[str] = []
+            parent = parents[pair]
+            while parent is not None:
+                pair, ch = parent
+                witness.append(ch)
+                parent = parents[pair]
+            return "".join(reversed(witness))
+        for ch in alphabet:
+            next_a = a.step(pair[0], ch)
+            if not next_a:
+                continue
+            next_b = b.step(pair[1], ch)
+            if not next_b:
+                continue
+            following = (next_a, next_b)
+            if following not in parents:
+                parents[following] = (pair, ch)
+                queue.append(following)
+    return None
+
+
+def overlap(a: str, b: str) -> Optional[str]:
+    """Shortest identifier both anchored rule regexes match, or None."""
+    return overlap_witness(_Automaton(a), _Automaton(b))
+
+
+def precedence(rules: Sequence[Tuple[str, str]]) -> List[Tuple[int, int, str]]:
+    """(i, j, witness) for each pair of overlapping rules with different scopes, i < j."""
+    automata = [_Automaton(regex) for regex, _ in rules]
+    pairs: List[Tuple[int, int, str]] = []
+    for j, (_, scope_j) in enumerate(rules):
+        for i in range(j):
+            if rules[i][1] == scope_j:
+                continue
+            witness = overlap_witness(automata[i], automata[j])
+            if witness is not None:
+                pairs.append((i, j, witness))
+    return pairs
+
+
+def order_rules(weights: Sequence[float], pairs: Iterable[Tuple[int, int, str]]) -> List[int]:
+    """Rule indices, heaviest first where ``pairs`` (i before j) allow.
+
+    A greedy Sidney-style order: each step finds the rule that, together
+    with its unplaced predecessors, has the highest weight per rule, and
+    places the heaviest of those whose own predecessors are all placed. Ties
+    keep the original order.
+    """
+    count = len(weights)
+    predecessors: List[Set[int]] = [set() for _ in range(count)]
+    for i, j, _ in pairs:
+        predecessors[j].add(i)
+    # Pairs always point forward, so one pass in index order closes them.
+    ancestors: List[Set[int]] = [set() for _ in range(count)]
+    for j in range(count):
+        for i in predecessors[j]:
+            ancestors[j] |= ancestors[i] | {i}
+
+    placed: Set[int] = set()
+    order: List[int] = []
+    while len(order) < count:
+        best_density = -1.0
+        best_needed: List[int] = []
+        for j in range(count):
+            if j in placed:
+                continue
+            needed = sorted((ancestors[j] - placed) | {j})
+            density = sum(weights[k] for k in needed) / len(needed)
+            if density > best_density:
+                best_density, best_needed = density, needed
+        ready = [k for k in best_needed if predecessors[k] <= placed]
+        chosen = max(ready, key=lambda k: (weights[k], -k))
+        placed.add(chosen)
+        order.append(chosen)
+
+    position = {rule: index for index, rule in enumerate(order)}
+    for i, j, witness in pairs:
+        if position[i] > position[j]:
+            raise StageError(f"Rule {j} was placed before rule {i}, which it overlaps on {witness!r}")
+    return order
+
+
+def evaluations_per_token(first_matches: Dict[int, int], order: Sequence[int]) -> float:
+    """Average regexes tried per token.
+
+    ``first_matches`` maps a rule index (-1 for no match) to the number of
+    tokens it matches first. A token is tested against every rule up to its
+    match, or against all of them.
+    """
+    position = {rule: index for index, rule in enumerate(order)}
+    tokens = sum(first_matches.values())
+    if not tokens:
+        return 0.0
+    total = sum(count * (position[rule] + 1 if rule >= 0 else len(order)) for rule, count in first_matches.items())
+    return total / tokens
@@ -0,0 +1,202 @@
+"""scope_automaton.py
+Compile the keyword and prefix tables of scopes.json into the flat integer
+tables src/semanticTokens.ts classifies identifiers with (classifier.json).
+
+    • prefixes – a character trie stored as one transition array,
+                 ``next[state * columnCount + columns[charCode]]`` (0 = no
+                 edge; state 0 is the root, i.e. the empty prefix). Per state,
+                 ``scope`` / ``variableScope`` hold the scope id of the
+                 non-variable / variable prefix ending there (-1 if none) and
+                 ``rule`` the index of a special case in ``rules`` (-1 if none).
+                 ``conceptChars`` flags the lowercase letters a variable
+                 prefix may be followed by before the uppercase letter
+    • keywords – a minimal perfect hash (hash and displace): bucket
+                 ``h1 % seeds.length`` holds a seed ``d``; the keyword's slot
+                 is ``-d - 1`` if ``d < 0``, else ``fmix32(h2 ^ d) % keys.length``.
+                 ``keys[slot]`` is compared to confirm the match
+    • scope ids index ``scopes``, which is also the semantic token legend
+
+h1 and h2 are FNV-1a over the identifier's UTF-16 code units with different
+offset bases, so the runtime computes both, walks the trie and notes what
+the special cases need in a single left-to-right pass without allocating.
+"""
+from __future__ import annotations
+
+import json
+from typing import Any, Dict, Iterable, List, Sequence, Tuple
+
+from pipeline import StageError
+
+CLASSIFIER_VERSION = 1
+
+FNV_PRIME = 0x01000193
+FNV_OFFSET_1 = 0x811C9DC5
+FNV_OFFSET_2 = 0x050C5D1F
+_MASK = 0xFFFFFFFF
+
+# Keywords per first-level bucket, on average.
+_BUCKET_LOAD = 2
+_MAX_SEED = 1 << 20
+
+# Special cases Highlighterr applies after a non-variable prefix matched:
+# prefix -> (rule, argument, classification used when the rule holds).
+SPECIAL_PREFIXES: Dict[str, Tuple[str, str, str]] = {
+    "E": ("noUnderscore", "", "EClassification_Enum"),   # ETest is an enum, ETest_Value an enumerator
+    "CF": ("suffix", "Ref", "EClassification_Type"),     # CoreFoundation CFStringRef etc.
+}
+
+# Letters allowed between a variable prefix and the uppercase letter that
+# starts the name (Highlighterr's "binpfro"), e.g. m_bEnabled, m_pObject.
+CONCEPT_CHARS = "binpfro"
+
+
+def utf16_units(text: str) -> Sequence[int]:
+    """UTF-16 code units of ``text``, as JavaScript's charCodeAt() sees them."""
+    encoded = text.encode("utf-16-le")
+    return memoryview(encoded).cast("H")
+
+
+def fnv1a(units: Iterable[int], offset: int) -> int:
+    h = offset
+    for unit in units:
+        h = ((h ^ unit) * FNV_PRIME) & _MASK
+    return h
+
+
+def fmix32(h: int) -> int:
+    """MurmurHash3 finalizer."""
+    h ^= h >> 16
+    h = (h * 0x85EBCA6B) & _MASK
+    h ^= h >> 13
+    h = (h * 0xC2B2AE35) & _MASK
+    return h ^ (h >> 16)
+
+
+def build_keyword_hash(keywords: Dict[str, int]) -> Dict[str, List[Any]]:
+    """Minimal perfect hash of ``keywords`` (keyword -> scope id)."""
+    keys = list(keywords)
+    n = len(keys)
+    if n == 0:
+        return {"seeds": [0], "keys": [], "scopes": []}
+    m = n // _BUCKET_LOAD + 1
+
+    buckets: List[List[Tuple[str, int]]] = [[] for _ in range(m)]
+    for key in keys:
+        units = utf16_units(key)
+        buckets[fnv1a(units, FNV_OFFSET_1) % m].append((key, fnv1a(units, FNV_OFFSET_2)))
+
+    seeds = [0] * m
+    slots: List[Any] = [None] * n
+    # Largest buckets first, while the table is still empty.
+    order = sorted(range(m), key=lambda b: (-len(buckets[b]), b))
+    free = (i for i in range(n) if slots[i] is None)
+    for b in order:
+        bucket = buckets[b]
+        if not bucket:
+            continue
+        if len(bucket) == 1:
+            slot = next(free)
+            slots[slot] = bucket[0][0]
+            seeds[b] = -slot - 1
+            continue
+        for seed in range(_MAX_SEED):
+            candidate = [fmix32(h2 ^ seed) % n for _, h2 in bucket]
+            if len(set(candidate)) == len(candidate) and all(slots[i] is None for i in candidate):
+                break
+        else:
+            raise StageError(f"Could not build a perfect hash for {n} keywords")
+        for (key, _), slot in zip(bucket, candidate):
+            slots[slot] = key
+        seeds[b] = seed
+
+    return {"seeds": seeds, "keys": slots, "scopes": [keywords[key] for key in slots]}
+
+
+def build_prefix_trie(
+    prefixes: Dict[str, Dict[str, Any]],
+    scope_ids: Dict[str, int],
+    special: Dict[str, Tuple[str, str, int]],
+) -> Dict[str, Any]:
+    """Flat trie over ``prefixes`` (prefix -> {scope, variable}).
+
+    ``special`` maps a non-variable prefix to its rule, argument and scope id.
+    """
+    alphabet = sorted({ch for prefix in prefixes for ch in prefix})
+    if any(ord(ch) >= 128 for ch in alphabet):
+        raise StageError("Prefixes must be ASCII")
+    columns = [-1] * 128
+    for column, ch in enumerate(alphabet):
+        columns[ord(ch)] = column
+    width = len(alphabet)
+
+    next_state: List[int] = [0] * width
+    states: Dict[str, int] = {"": 0}
+    for prefix in sorted(prefixes, key=lambda p: (len(p), p)):
+        state = 0
+        for i, ch in enumerate(prefix):
+            edge = state * width + columns[ord(ch)]
+            if next_state[edge] == 0:
+                next_state[edge] = len(states)
+                states[prefix[: i + 1]] = len(states)
+                next_state.extend([0] * width)
+            state = next_state[edge]
+
+    count = len(states)
+    scope = [-1] * count
+    variable_scope = [-1] * count
+    rule = [-1] * count
+    rules: List[Dict[str, Any]] = []
+    for prefix, info in prefixes.items():
+        state = states[prefix]
+        if info["variable"]:
+            variable_scope[state] = scope_ids[info["scope"]]
+            continue
+        scope[state] = scope_ids[info["scope"]]
+        if prefix in special:
+            kind, argument, rule_scope = special[prefix]
+            rule[state] = len(rules)
+            rules.append({"kind": kind, "argument": argument, "scope": rule_scope})
+
+    return {
+        "columns": columns,
+        "columnCount": width,
+        "next": next_state,
+        "scope": scope,
+        "variableScope": variable_scope,
+        "rule": rule,
+        "rules": rules,
+        "conceptChars": [int(chr(code) in CONCEPT_CHARS) for code in range(128)],
+    }
+
+
+def compile_classifier(scopes: Dict[str, Any], classifications: Dict[str, str]) -> Dict[str, Any]:
+    """classifier.json contents for the combined ``scopes`` (see scopes.json).
+
+    Special-case rules name a classification; its scope id is -1 (no token)
+    when that scope is not part of the legend.
+    """
+    scope_list: List[str] = scopes["scopes"]
+    scope_ids = {scope: i for i, scope in enumerate(scope_list)}
+    special = {
+        prefix: (kind, argument, scope_ids.get(classifications.get(cls, ""), -1))
+        for prefix, (kind, argument, cls) in SPECIAL_PREFIXES.items()
+    }
+
+    return {
+        "version": CLASSIFIER_VERSION,
+        "scopes": scope_list,
+        "prefixes": build_prefix_trie(scopes["prefixes"], scope_ids, special),
+        "keywords": build_keyword_hash({k: scope_ids[v] for k, v in scopes["keywords"].items()}),
+    }
+
+
+def dumps(classifier: Dict[str, Any]) -> str:
+    """classifier.json text: one line per table, so regenerated files diff well."""
+    def section(value: Any, indent: str) -> str:
+        if isinstance(value, dict):
+            inner = indent + "  "
+            body = ",\n".join(f"{inner}{json.dumps(k)}: {section(v, inner)}" for k, v in value.items())
+            return "{\n" + body + "\n" + indent + "}"
+        return json.dumps(value, separators=(",", ":"))
+
+    return section(classifier, "") + "\n"
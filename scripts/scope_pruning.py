@@ -0,0 +1,152 @@
+"""scope_pruning.py
+Find entries of the combined scope tables that do not change how any
+identifier is classified, so combine_scopes.py can leave them out
+(MALTERLIB_PRUNE_SCOPES=1).
+
+    • a keyword is redundant when the prefix rules alone give it the same
+      scope, e.g. a keyword NFoo with the scope of the N prefix
+    • a prefix is redundant when, without it, every identifier it classifies
+      gets the same scope from the next shorter prefix that applies, e.g.
+      ND next to N with the same scope
+
+Both use classifier.Classifier (longest prefix first, the concept letters of
+variable prefixes, the E / CF special cases). Which prefix applies to an
+identifier depends only on the character classes right after each candidate
+prefix (uppercase, concept letter, other), and the special cases on whether
+the identifier contains "_" or ends with "Ref". A prefix is therefore tested
+on itself followed by one representative of each combination (PROBE_HEADS x
+PROBE_TAILS). Prefixes are removed one at a time, longest first, each tested
+against the table without the ones removed before it; one Classifier is
+built per pass and each candidate is only dropped from its prefix table.
+
+The .clangd rules approximate the classifier, so the result is also checked
+with the rules classifier.build_rules() makes from the pruned tables.
+Entries whose removal changes the first matching rule's scope for any probe
+are kept. Dropping an alternative from an anchored rule only
+changes how identifiers starting with it match, so unless the order of the
+prefix rules changes, only the probes starting with a removed prefix and the
+removed keywords are classified again. Nothing is checked when there is
+nothing to remove.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from classifier import ClangdRules, Classifier, build_rules
+from scope_automaton import CONCEPT_CHARS, SPECIAL_PREFIXES
+
+# What follows a prefix in the identifiers it is tested on: an uppercase
+# letter, a digit, an uppercase Latin-1 letter (all count as uppercase), a
+# concept letter before an uppercase letter, a lowercase letter, "_" and
+# nothing; then "_" or not, "Ref" or not.
+PROBE_HEADS = ("A", "0", "À") + tuple(ch + "A" for ch in CONCEPT_CHARS) + ("a", "_", "")
+PROBE_TAILS = ("", "b", "_b", "Ref", "_Ref")
+
+
+@dataclass
+class Pruning:
+    """Redundant entries: keyword -> scope and prefix -> scope."""
+
+    keywords: Dict[str, str] = field(default_factory=dict)
+    prefixes: Dict[str, str] = field(default_factory=dict)
+
+    def apply(self, scopes: Dict[str, Any]) -> Dict[str, Any]:
+        """``scopes`` (see scopes.json) without the redundant entries."""
+        keywords = {k: v for k, v in scopes["keywords"].items() if k not in self.keywords}
+        prefixes = {p: v for p, v in scopes["prefixes"].items() if p not in self.prefixes}
+        scope_list = sorted(set(keywords.values()) | {info["scope"] for info in prefixes.values()})
+        return {"keywords": keywords, "prefixes": prefixes, "scopes": scope_list}
+
+    def report(self, scopes: Dict[str, Any]) -> List[str]:
+        lines = [
+            f"Redundant entries: {len(self.keywords)} of {len(scopes['keywords'])} keywords, "
+            f"{len(self.prefixes)} of {len(scopes['prefixes'])} prefixes"
+        ]
+        for prefix, scope in sorted(self.prefixes.items()):
+            lines.append(f"  prefix  {prefix:<12} {scope}")
+        for keyword, scope in sorted(self.keywords.items()):
+            lines.append(f"  keyword {keyword:<12} {scope}")
+        return lines
+
+
+def probes(prefix: str) -> List[str]:
+    return [prefix + head + tail for head in PROBE_HEADS for tail in PROBE_TAILS]
+
+
+def _all_probes(scopes: Dict[str, Any]) -> List[str]:
+    names: Set[str] = set(scopes["keywords"])
+    for prefix in scopes["prefixes"]:
+        names.update(probes(prefix))
+    return sorted(names)
+
+
+def _clangd(scopes: Dict[str, Any]) -> Tuple[ClangdRules, List[str]]:
+    """The .clangd rules of ``scopes`` and the scopes of its prefix rules, in order."""
+    rules = build_rules(scopes["keywords"], scopes["prefixes"])
+    keyword_rules = len(set(scopes["keywords"].values()))
+    return ClangdRules(rules), [scope for _, scope in rules[keyword_rules:]]
+
+
+def _classifier_candidates(scopes: Dict[str, Any], classifications: Dict[str, str], keep: Set[str]) -> Pruning:
+    keywords: Dict[str, str] = scopes["keywords"]
+    classifier = Classifier(keywords, scopes["prefixes"], classifications)
+    pruning = Pruning()
+
+    for prefix in sorted(scopes["prefixes"], key=lambda p: (-len(p), p)):
+        # The special prefixes depend on more than what follows them.
+        if prefix in SPECIAL_PREFIXES or prefix in keep:
+            continue
+        names = probes(prefix)
+        before = classifier.classify_many(names)
+        entry = classifier.prefixes.pop(prefix)
+        if classifier.classify_many(names) == before:
+            pruning.prefixes[prefix] = scopes["prefixes"][prefix]["scope"]
+        else:
+            classifier.prefixes[prefix] = entry
+
+    classifier.keywords = {}
+    for keyword, scope in keywords.items():
+        if keyword not in keep and classifier.classify(keyword) == scope:
+            pruning.keywords[keyword] = scope
+    return pruning
+
+
+def _affected(names: List[str], pruning: Pruning) -> List[str]:
+    """Probes whose .clangd rule can change when ``pruning`` only removes alternatives."""
+    removed = tuple(pruning.prefixes)
+    return [name for name in names if name in pruning.keywords or name.startswith(removed)]
+
+
+def find_redundant(scopes: Dict[str, Any], classifications: Dict[str, str]) -> Pruning:
+    """Entries of ``scopes`` whose removal changes neither the classifier nor the .clangd rules."""
+    names = _all_probes(scopes)
+    original: Optional[Tuple[ClangdRules, List[str]]] = None
+    keep: Set[str] = set()
+    while True:
+        pruning = _classifier_candidates(scopes, classifications, keep)
+        if not pruning.keywords and not pruning.prefixes:
+            return pruning
+        original = original or _clangd(scopes)
+        pruned, order = _clangd(pruning.apply(scopes))
+        reordered = [scope for scope in original[1] if scope in order] != order
+        checked = names if reordered else _affected(names, pruning)
+        expected = original[0].classify_many(checked)
+        actual = pruned.classify_many(checked)
+        changed = [name for name, want, got in zip(checked, expected, actual) if want != got]
+        if not changed:
+            return pruning
+        # Keep every entry a changed identifier depends on, then try again.
+        before = len(keep)
+        keep.update(_entries_for(changed, pruning))
+        if len(keep) == before:
+            keep.update(pruning.keywords, pruning.prefixes)
+
+
+def _entries_for(names: Iterable[str], pruning: Pruning) -> Set[str]:
+    entries: Set[str] = set()
+    for name in names:
+        if name in pruning.keywords:
+            entries.add(name)
+        entries.update(prefix for prefix in pruning.prefixes if name.startswith(prefix))
+    return entries
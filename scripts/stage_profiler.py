@@ -0,0 +1,133 @@
+"""stage_profiler.py
+Per-stage resource profiling for update_all.py --profile.
+
+Each stage runs in a freshly spawned interpreter so that its peak RSS is its
+own and not the high-water mark of earlier stages. Inside that interpreter the
+stage is imported (import-time work such as ICC transform setup is counted),
+run and flushed with tracemalloc enabled, and optionally under cProfile.
+
+Timings include the overhead of tracemalloc (and cProfile when requested),
+which is large for allocation-heavy stages such as json5 parsing. Pass top=0
+(update_all.py --profile-top 0) to skip tracemalloc and get undistorted
+timings.
+"""
+from __future__ import annotations
+
+import json
+import pathlib
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None  # type: ignore[assignment]
+
+
+def _peak_rss_bytes() -> Optional[int]:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and in kilobytes on Linux.
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def profile_stage(module_name: str, cprofile_path: Optional[str] = None, top: int = 5) -> Dict[str, Any]:
+    """Import and run one stage, returning its resource usage.
+
+    Meant to be called in a dedicated child process.
+    """
+    import cProfile
+    import importlib
+    import traceback
+    import tracemalloc
+
+    from pipeline import Context, StageError
+
+    result: Dict[str, Any] = {"module": module_name, "status": "ok"}
+    profiler = cProfile.Profile() if cprofile_path else None
+
+    if top > 0:
+        tracemalloc.start()
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    snapshot = None
+    try:
+        if profiler:
+            profiler.enable()
+        try:
+            context = Context()
+            importlib.import_module(module_name).run(context)
+            if top > 0:
+                snapshot = tracemalloc.take_snapshot()
+            changed, _ = context.flush()
+            result["files_changed"] = len(changed)
+        finally:
+            if profiler:
+                profiler.disable()
+    except StageError as exc:
+        result.update(status="failed", error=str(exc))
+    except Exception:
+        result.update(status="failed", error=traceback.format_exc())
+    result["wall_s"] = time.perf_counter() - wall_start
+    result["cpu_s"] = time.process_time() - cpu_start
+    result["traced_peak_bytes"] = tracemalloc.get_traced_memory()[1] if top > 0 else None
+    tracemalloc.stop()
+    result["peak_rss_bytes"] = _peak_rss_bytes()
+
+    allocations: List[Dict[str, Any]] = []
+    if snapshot is not None:
+        snapshot = snapshot.filter_traces((
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+            tracemalloc.Filter(False, tracemalloc.__file__),
+        ))
+        for stat in snapshot.statistics("lineno")[:top]:
+            frame = stat.traceback[0]
+            allocations.append({"site": f"{frame.filename}:{frame.lineno}", "size_bytes": stat.size, "count": stat.count})
+    result["top_allocations"] = allocations
+
+    if profiler and cprofile_path:
+        pathlib.Path(cprofile_path).parent.mkdir(parents=True, exist_ok=True)
+        profiler.dump_stats(cprofile_path)
+        result["cprofile"] = cprofile_path
+    return result
+
+
+def _mib(value: Optional[int]) -> str:
+    return "n/a" if value is None else f"{value / (1024 * 1024):.1f}"
+
+
+def format_summary(results: List[Dict[str, Any]]) -> str:
+    """Table of stage results sorted by wall time, slowest first."""
+    rows = sorted(results, key=lambda r: r.get("wall_s", 0.0), reverse=True)
+    name_width = max([len("Stage")] + [len(r["stage"]) for r in rows])
+    header = f"{'Stage':<{name_width}}  {'Wall (s)':>8}  {'CPU (s)':>8}  {'Peak RSS (MiB)':>14}  {'Traced (MiB)':>12}  Status"
+    lines = [header, "-" * len(header)]
+    for r in rows:
+        lines.append(
+            f"{r['stage']:<{name_width}}  {r.get('wall_s', 0.0):>8.3f}  {r.get('cpu_s', 0.0):>8.3f}  "
+            f"{_mib(r.get('peak_rss_bytes')):>14}  {_mib(r.get('traced_peak_bytes')):>12}  {r['status']}"
+        )
+    total_wall = sum(r.get("wall_s", 0.0) for r in rows)
+    total_cpu = sum(r.get("cpu_s", 0.0) for r in rows)
+    lines.append("-" * len(header))
+    lines.append(f"{'Total':<{name_width}}  {total_wall:>8.3f}  {total_cpu:>8.3f}")
+
+    for r in rows:
+        if r.get("top_allocations"):
+            lines.append(f"\nTop allocation sites for {r['stage']}:")
+            for alloc in r["top_allocations"]:
+                lines.append(f"  {alloc['size_bytes'] / 1024:>10.1f} KiB  {alloc['count']:>7} blocks  {alloc['site']}")
+    return "\n".join(lines)
+
+
+def write_report(path: pathlib.Path, results: List[Dict[str, Any]]) -> None:
+    report = {
+        "generated": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": sys.version.split()[0],
+        "platform": sys.platform,
+        "stages": results,
+    }
+    path.write_text(json.dumps(report, indent=2) + "\n", encoding="utf-8")
@@ -0,0 +1,447 @@
+#!./.venv/bin/python3
+"""theme_resolver.py
+Resolve TextMate scopes to the foreground and font style a VS Code colour
+theme gives them, following vscode-textmate's theme matching, so rewrites of
+a theme's tokenColors can be proven colour-identical and resolution can be
+timed (benchmarks/bench_theme_resolver.py).
+
+    • parse_rules(token_colors) – one (Selector, Style) per selector; a string
+                                  scope is a comma list, array elements are
+                                  taken whole, entries without a scope or
+                                  settings are skipped, like VS Code does
+    • ThemeModel(rules)         – the trie vscode-textmate builds: a node per
+                                  dotted scope segment, each attribute
+                                  inherited from the closest ancestor that sets
+                                  it, later rules overwriting earlier ones for
+                                  the same selector, and rules with parent
+                                  scopes ranked by specificity (deeper scope,
+                                  then longer parent names, then more parents).
+                                  match(path, scope) is the style of one scope
+                                  pushed on a stack, with unset attributes
+                                  left unset
+    • Theme.load(path)          – a ThemeModel plus the defaults VS Code takes
+                                  from editor.foreground / editor.background;
+                                  resolve(stack) gives the final style of the
+                                  innermost scope
+    • emitted_stacks(context)   – the scope stacks the extension produces:
+                                  every semantic token scope (scopes.json,
+                                  semanticScopesForPackage.json, package.json)
+                                  on its own, and every grammar name under its
+                                  grammar's root scope
+    • differences(a, b, ...)    – scope / parent chain probes on which two rule
+                                  lists match differently (see probes())
+
+Usage: python3 scripts/theme_resolver.py [THEME ...] [--list] [--against OTHER [--emitted]]
+
+Without --against, each theme (default: the three in themes/) is summarised
+and --list prints the resolved style of every emitted stack. With --against,
+one theme is compared with OTHER on the scopes both name (--emitted: only
+the scopes the extension emits) and the differing scopes are listed; the
+exit status is 1 if there are any.
+"""
+from __future__ import annotations
+
+import argparse
+import functools
+import pathlib
+import re
+import sys
+from dataclasses import dataclass, field
+from itertools import product
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from json_loader import load_relaxed
+from pipeline import ROOT, Context
+
+THEMES = ("themes/malterlib.json", "themes/malterlibSRGB.json", "themes/malterlibNoTokens.json")
+GRAMMARS = ("syntaxes/malterlib-build.tmLanguage.json", "syntaxes/markdown-malterlib.injection.json")
+
+NOT_SET = -1
+FONT_STYLES = {"italic": 1, "bold": 2, "underline": 4, "strikethrough": 8}
+_HEX_COLOR_RE = re.compile(r"#(?:[0-9a-fA-F]{3,4}|[0-9a-fA-F]{6}|[0-9a-fA-F]{8})")
+
+# editor.foreground / editor.background when a theme does not set them
+DEFAULT_COLORS = {
+    "dark": ("#CCCCCC", "#1F1F1F"),
+    "light": ("#3B3B3B", "#FFFFFF"),
+    "hc-black": ("#FFFFFF", "#000000"),
+    "hc-light": ("#292929", "#FFFFFF"),
+}
+
+# (font style, foreground, background); NOT_SET / None where a rule leaves them
+Style = Tuple[int, Optional[str], Optional[str]]
+Probe = Tuple[Tuple[str, ...], str]
+
+
+@dataclass(frozen=True)
+class Selector:
+    """One scope selector of a tokenColors entry; ``position`` counts selectors through the theme."""
+
+    position: int
+    entry: int
+    text: str
+    scope: str
+    parents: Tuple[str, ...]  # innermost first, as vscode-textmate stores them
+
+    @classmethod
+    def parse(cls, position: int, entry: int, text: str) -> "Selector":
+        parts = text.strip().split(" ")
+        return cls(position, entry, text, parts[-1], tuple(reversed(parts[:-1])))
+
+    @property
+    def scopes(self) -> Tuple[str, ...]:
+        return self.parents + (self.scope,)
+
+
+def parse_settings(settings: Dict[str, Any]) -> Style:
+    font_style = NOT_SET
+    if isinstance(settings.get("fontStyle"), str):
+        font_style = 0
+        for word in settings["fontStyle"].split(" "):
+            font_style |= FONT_STYLES.get(word, 0)
+    colors = []
+    for key in ("foreground", "background"):
+        value = settings.get(key)
+        colors.append(value.upper() if isinstance(value, str) and _HEX_COLOR_RE.fullmatch(value) else None)
+    return font_style, colors[0], colors[1]
+
+
+def font_style_name(font_style: int) -> str:
+    return " ".join(name for name, bit in FONT_STYLES.items() if font_style > 0 and font_style & bit)
+
+
+def parse_rules(token_colors: Sequence[Dict[str, Any]]) -> List[Tuple[Selector, Style]]:
+    rules: List[Tuple[Selector, Style]] = []
+    for index, entry in enumerate(token_colors):
+        scope, settings = entry.get("scope"), entry.get("settings")
+        if not scope or not isinstance(settings, dict):
+            continue
+        style = parse_settings(settings)
+        texts = scope.strip(",").split(",") if isinstance(scope, str) else scope
+        for text in texts:
+            rules.append((Selector.parse(len(rules), index, text), style))
+    return rules
+
+
+# ---------------------------------------------------------------------------
+# vscode-textmate theme trie
+# ---------------------------------------------------------------------------
+
+
+@dataclass
+class _TrieRule:
+    depth: int
+    parents: Tuple[str, ...]
+    font_style: int
+    foreground: Optional[str]
+    background: Optional[str]
+
+    def overwrite(self, depth: int, font_style: int, foreground: Optional[str], background: Optional[str]) -> None:
+        self.depth = max(self.depth, depth)
+        if font_style != NOT_SET:
+            self.font_style = font_style
+        if foreground is not None:
+            self.foreground = foreground
+        if background is not None:
+            self.background = background
+
+    def copy(self) -> "_TrieRule":
+        return _TrieRule(self.depth, self.parents, self.font_style, self.foreground, self.background)
+
+
+def _cmp_specificity(a: _TrieRule, b: _TrieRule) -> int:
+    """ThemeTrieElement._cmpBySpecificity: deeper scope, then longer parent scopes, then more of them."""
+    if a.depth != b.depth:
+        return b.depth - a.depth
+    i = j = 0
+    while True:
+        if i < len(a.parents) and a.parents[i] == ">":
+            i += 1
+        if j < len(b.parents) and b.parents[j] == ">":
+            j += 1
+        if i >= len(a.parents) or j >= len(b.parents):
+            break
+        difference = len(b.parents[j]) - len(a.parents[i])
+        if difference:
+            return difference
+        i += 1
+        j += 1
+    return len(b.parents) - len(a.parents)
+
+
+@dataclass
+class _TrieNode:
+    main: _TrieRule
+    with_parents: List[_TrieRule]
+    children: Dict[str, "_TrieNode"] = field(default_factory=dict)
+
+
+def scope_matches(scope: str, pattern: str) -> bool:
+    """True if selector segment ``pattern`` matches ``scope`` (equal, or a dotted prefix)."""
+    return scope == pattern or (scope.startswith(pattern) and scope[len(pattern):len(pattern) + 1] == ".")
+
+
+def _matches_parents(path: Tuple[str, ...], parents: Tuple[str, ...]) -> bool:
+    """``path`` (outermost first, without the token's own scope) against ``parents`` (innermost first)."""
+    index = len(path) - 1
+    i = 0
+    while i < len(parents):
+        pattern = parents[i]
+        must_match = False
+        if pattern == ">":
+            if i == len(parents) - 1:
+                return False
+            i += 1
+            pattern = parents[i]
+            must_match = True
+        while index >= 0 and not scope_matches(path[index], pattern):
+            if must_match:
+                return False
+            index -= 1
+        if index < 0:
+            return False
+        index -= 1
+        i += 1
+    return True
+
+
+class ThemeModel:
+    """The trie vscode-textmate's Theme builds from tokenColors, and its match()."""
+
+    def __init__(self, rules: Iterable[Tuple[Selector, Style]]):
+        parsed = sorted(
+            ((selector, style) for selector, style in rules if selector.scope),
+            key=lambda item: (item[0].scope, len(item[0].parents), item[0].parents, item[0].entry),
+        )
+        self.selectors = len(parsed)
+        self.root = _TrieNode(_TrieRule(0, (), NOT_SET, None, None), [])
+        for selector, style in parsed:
+            self._insert(selector, style)
+        # Like Theme._cachedMatchRoot: the ranked rules of each scope name
+        self._ranked: Dict[str, List[_TrieRule]] = {}
+
+    def _insert(self, selector: Selector, style: Style) -> None:
+        node = self.root
+        depth = 0
+        for head in selector.scope.split("."):
+            child = node.children.get(head)
+            if child is None:
+                child = node.children[head] = _TrieNode(node.main.copy(), [rule.copy() for rule in node.with_parents])
+            node = child
+            depth += 1
+        font_style, foreground, background = style
+        if not selector.parents:
+            node.main.overwrite(depth, font_style, foreground, background)
+            return
+        for rule in node.with_parents:
+            if rule.parents == selector.parents:
+                rule.overwrite(depth, font_style, foreground, background)
+                return
+        node.with_parents.append(_TrieRule(
+            depth, selector.parents,
+            node.main.font_style if font_style == NOT_SET else font_style,
+            foreground or node.main.foreground,
+            background or node.main.background,
+        ))
+
+    def _rank(self, scope: str) -> List[_TrieRule]:
+        node = self.root
+        for head in scope.split("."):
+            child = node.children.get(head)
+            if child is None:
+                break
+            node = child
+        # sorted() is stable, like Array.prototype.sort
+        return sorted(node.with_parents + [node.main], key=functools.cmp_to_key(_cmp_specificity))
+
+    def match(self, path: Tuple[str, ...], scope: str) -> Style:
+        """Style of ``scope`` pushed on top of ``path`` (outermost first)."""
+        ranked = self._ranked.get(scope)
+        if ranked is None:
+            ranked = self._ranked[scope] = self._rank(scope)
+        for rule in ranked:
+            if not rule.parents or _matches_parents(path, rule.parents):
+                return rule.font_style, rule.foreground, rule.background
+        raise AssertionError("the main rule always matches")
+
+
+@dataclass(frozen=True)
+class Resolved:
+    foreground: str
+    font_style: str
+
+
+class Theme:
+    """A colour theme's token colours as VS Code applies them."""
+
+    def __init__(self, theme: Dict[str, Any]):
+        colors = theme.get("colors") or {}
+        default_foreground, default_background = DEFAULT_COLORS.get(theme.get("type", "dark"), DEFAULT_COLORS["dark"])
+        # ColorThemeData puts this rule first and ignores tokenColors entries without a scope
+        _, foreground, background = parse_settings({
+            "foreground": colors.get("editor.foreground", default_foreground),
+            "background": colors.get("editor.background", default_background),
+        })
+        self.defaults: Style = (0, foreground or default_foreground, background or default_background)
+        self.rules = parse_rules(theme.get("tokenColors") or [])
+        self.model = ThemeModel(self.rules)
+
+    @classmethod
+    def load(cls, path: pathlib.Path) -> "Theme":
+        return cls(load_relaxed(path))
+
+    def resolve(self, stack: Sequence[str]) -> Resolved:
+        """Final style of the innermost scope of ``stack`` (outermost first).
+
+        Each pushed scope keeps the attributes its own match leaves unset from
+        the scope it is pushed on, like AttributedScopeStack.mergeAttributes.
+        """
+        font_style, foreground, _ = self.defaults
+        for depth, scope in enumerate(stack):
+            style = self.model.match(tuple(stack[:depth]), scope)
+            if style[0] != NOT_SET:
+                font_style = style[0]
+            if style[1] is not None:
+                foreground = style[1]
+        return Resolved(foreground or "", font_style_name(font_style))
+
+
+# ---------------------------------------------------------------------------
+# Scopes the extension emits
+# ---------------------------------------------------------------------------
+
+
+def emitted_stacks(context: Context) -> List[Tuple[str, ...]]:
+    """Scope stacks (outermost first) the extension's semantic tokens and grammars produce.
+
+    Missing source files are skipped, so partial trees (benchmarks/synthetic.py) work.
+    """
+    stacks: Dict[Tuple[str, ...], None] = {}
+    semantic: List[str] = []
+    if context.exists("scopes.json"):
+        semantic.extend(scope.replace("-", ".") for scope in context.load_json("scopes.json")["scopes"])
+    entries: List[Dict[str, Any]] = []
+    if context.exists("semanticScopesForPackage.json"):
+        entries.extend(context.load_json("semanticScopesForPackage.json")["semanticTokenScopes"])
+    if context.exists("package.json"):
+        entries.extend(context.load_json("package.json")["contributes"].get("semanticTokenScopes", []))
+    for entry in entries:
+        for values in entry["scopes"].values():
+            semantic.extend(values)
+    for scope in semantic:
+        stacks[(scope,)] = None
+
+    def names(value: Any, root: str) -> None:
+        if isinstance(value, dict):
+            for key, item in value.items():
+                if key in ("name", "contentName") and isinstance(item, str):
+                    stacks[(root,) + tuple(item.split())] = None
+                else:
+                    names(item, root)
+        elif isinstance(value, list):
+            for item in value:
+                names(item, root)
+
+    for grammar in GRAMMARS:
+        if not context.exists(grammar):
+            continue
+        data = context.load_json(grammar)
+        stacks[(data["scopeName"],)] = None
+        names({k: v for k, v in data.items() if k != "name"}, data["scopeName"])
+    return list(stacks)
+
+
+def emitted_scopes(context: Context) -> Set[str]:
+    """Every scope name in emitted_stacks()."""
+    return {scope for stack in emitted_stacks(context) for scope in stack}
+
+
+# ---------------------------------------------------------------------------
+# Comparing rule lists
+# ---------------------------------------------------------------------------
+
+
+def probes(selectors: Iterable[Selector], emitted: Iterable[str]) -> Tuple[Set[str], Set[Tuple[str, ...]]]:
+    """Scopes to match and the parent chains (outermost first) to match them under.
+
+    The scopes are those the selectors name plus ``emitted``; the chains are
+    the parent scopes of each selector, each pair of those, and the empty
+    chain. A rule with parents can only win on a chain it matches, so these
+    reach every rule of both lists being compared.
+    """
+    selectors = list(selectors)
+    scopes = {s.scope for s in selectors if s.scope} | set(emitted)
+    chains = {tuple(reversed(s.parents)) for s in selectors if s.parents}
+    chains |= {a + b for a, b in product(chains, repeat=2) if a != b}
+    return scopes, chains | {()}
+
+
+def resolve_probes(model: ThemeModel, scopes: Iterable[str], chains: Iterable[Tuple[str, ...]]) -> Dict[Probe, Style]:
+    chains = list(chains)
+    return {(chain, scope): model.match(chain, scope) for scope in scopes for chain in chains}
+
+
+def differences(
+    a: Sequence[Tuple[Selector, Style]], b: Sequence[Tuple[Selector, Style]], emitted: Iterable[str],
+    only: Optional[Iterable[str]] = None,
+) -> Tuple[int, List[Tuple[Probe, Style, Style]]]:
+    """Number of probes and those on which rule lists ``a`` and ``b`` match differently.
+
+    ``only`` limits the probed scopes, e.g. to the emitted ones.
+    """
+    scopes, chains = probes([s for s, _ in a] + [s for s, _ in b], emitted)
+    if only is not None:
+        scopes &= set(only)
+    before = resolve_probes(ThemeModel(a), scopes, chains)
+    after = resolve_probes(ThemeModel(b), scopes, chains)
+    changed = [(probe, before[probe], after[probe]) for probe in sorted(before) if before[probe] != after[probe]]
+    return len(before), changed
+
+
+def describe(style: Style) -> str:
+    font_style, foreground, _ = style
+    parts = [foreground or "-"]
+    if font_style != NOT_SET:
+        parts.append(f'"{font_style_name(font_style)}"')
+    return " ".join(parts)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Resolve the extension's scopes against colour themes.")
+    parser.add_argument("themes", type=pathlib.Path, nargs="*", help=f"theme files (default: {', '.join(THEMES)})")
+    parser.add_argument("--list", action="store_true", help="print the style of every emitted scope stack")
+    parser.add_argument("--against", type=pathlib.Path, help="compare the theme with this one")
+    parser.add_argument("--emitted", action="store_true", help="with --against, only compare the scopes the extension emits")
+    args = parser.parse_args()
+    paths = args.themes or [ROOT / rel for rel in THEMES]
+
+    context = Context()
+    stacks = emitted_stacks(context)
+    if args.against is not None:
+        if len(paths) != 1:
+            parser.error("--against compares exactly one theme")
+        a, b = Theme.load(paths[0]), Theme.load(args.against)
+        emitted = emitted_scopes(context)
+        count, changed = differences(a.rules, b.rules, emitted, emitted if args.emitted else None)
+        by_scope: Dict[str, List[Tuple[Probe, Style, Style]]] = {}
+        for item in changed:
+            by_scope.setdefault(item[0][1], []).append(item)
+        for scope, items in sorted(by_scope.items()):
+            (chain, _), before, after = items[0]
+            example = f" (e.g. under {' '.join(chain)})" if chain else ""
+            print(f"  {scope:<56} {describe(before)} -> {describe(after)} on {len(items)} parent chains{example}")
+        print(f"{len(changed)} of {count} scope/parent probes differ, in {len(by_scope)} scopes")
+        sys.exit(1 if changed else 0)
+
+    for path in paths:
+        theme = Theme.load(path)
+        resolved = {stack: theme.resolve(stack) for stack in stacks}
+        print(f"{path}: {theme.model.selectors} selectors, {len(stacks)} emitted scope stacks, "
+              f"{len(set(resolved.values()))} distinct styles")
+        if args.list:
+            for stack, style in resolved.items():
+                print(f"  {' '.join(stack):<72} {style.foreground} {style.font_style}".rstrip())
+
+
+if __name__ == "__main__":
+    main()
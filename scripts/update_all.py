@@ -2,26 +2,309 @@
 """Convenience wrapper to refresh all generated artefacts (prefixmap, keywords,
 classifications, grammar) and then run coverage verification.
 
-Usage: python3 scripts/update_all.py
+The stages form a DAG (see pipeline.py); every stage whose inputs are ready is
+started immediately, with at most -j N child processes at a time. Output of
+each stage is captured and printed as one block when the stage finishes. If a
+stage fails, no further stages are started and the runner exits once the
+stages already running have finished.
+
+With --in-process every stage is imported once and its run(context) entry
+point is called in sequence inside this interpreter, so interpreter startup,
+the json5 import and the colour transform setup are paid only once. The stages
+share one artifact store, so each document is parsed at most once and outputs
+are written only after the last stage. -j is ignored in that mode.
+
+Stages whose inputs and outputs are unchanged since their last successful run
+(according to .generated-manifest.json) are skipped. Pass --force to run every
+stage regardless.
+
+--watch keeps running after the first pass and polls the hand-edited inputs
+(Highlighterr sources, themes/malterlib.json, the templates, the generator
+scripts). After a burst of saves has settled it re-runs only the stages
+downstream of the files that changed.
+
+--profile runs every stage once, each in a fresh interpreter, and records wall
+time, CPU time, peak RSS and the top tracemalloc allocation sites per stage in
+pipeline-profile.json, followed by a summary table. --cprofile-dir DIR also
+writes a cProfile DIR/<stage>.prof for each stage.
+
+Usage: python3 scripts/update_all.py [--force] [-j N | --in-process] [--watch | --profile]
 """
-import subprocess, sys, pathlib
-
-ROOT = pathlib.Path(__file__).resolve().parents[1]
-SCRIPTS = [
-    "scripts/parse_prefix_map.py",
-    "scripts/generate_classifications.py",
-    "scripts/extract_keywords.py",
-    "scripts/generate_settings_from_theme.py",
-    "scripts/combine_scopes.py",
-    "scripts/convert_theme_to_srgb.py",
-    "scripts/generate_theme_no_tokens.py",
-    "scripts/generate_clangd_config.py",
-    "scripts/generate_readme.py",
-]
-
-for script in SCRIPTS:
-    print("\n==>", script)
-    res = subprocess.run([sys.executable, script], cwd=ROOT)
-    if res.returncode != 0:
-        print(f"Script {script} failed", file=sys.stderr)
-        sys.exit(res.returncode)
+import argparse, importlib, multiprocessing, os, pathlib, re, subprocess, sys, time, traceback
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from pipeline import (
+    ROOT, STAGES, Context, Manifest, Stage, StageError, affected_stages, dependencies, source_inputs,
+)
+
+
+# Last line printed by pipeline.run_standalone()
+_CHANGED_RE = re.compile(r"^(\d+) of (\d+) output files changed\.$", re.M)
+
+
+def run_script(stage: Stage) -> Tuple[int, str]:
+    """Run one stage in a child interpreter and return (exit code, output)."""
+    env = dict(os.environ, PYTHONIOENCODING="utf-8")
+    res = subprocess.run(
+        [sys.executable, stage.script],
+        cwd=ROOT,
+        env=env,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        encoding="utf-8",
+        errors="replace",
+    )
+    return res.returncode, res.stdout
+
+
+def run_stages(stages: Sequence[Stage], manifest: Manifest, jobs: int, force: bool = False) -> int:
+    """Run ``stages`` in dependency order and return the first failing exit code (0 on success)."""
+    pending: List[Stage] = list(stages)
+    waiting_on: Dict[Stage, set] = {stage: set(dependencies(stage, stages)) for stage in stages}
+    running: Dict[Future, Stage] = {}
+    failure = 0
+    ran = skipped = 0
+    changed = queued = 0
+
+    def finish(stage: Stage) -> None:
+        for deps in waiting_on.values():
+            deps.discard(stage)
+
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        while pending or running:
+            if not failure:
+                # Start (or skip) everything whose dependencies have completed.
+                progress = True
+                while progress:
+                    progress = False
+                    for stage in list(pending):
+                        if waiting_on[stage] or len(running) >= jobs:
+                            continue
+                        pending.remove(stage)
+                        if not force and manifest.is_up_to_date(stage):
+                            print(f"\n==> {stage.script} (up to date)")
+                            skipped += 1
+                            finish(stage)
+                            progress = True
+                        else:
+                            running[pool.submit(run_script, stage)] = stage
+            elif not running:
+                break
+
+            if not running:
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage = running.pop(future)
+                returncode, output = future.result()
+                print("\n==>", stage.script)
+                if output:
+                    print(output, end="" if output.endswith("\n") else "\n")
+                sys.stdout.flush()
+                if returncode != 0:
+                    print(f"Script {stage.script} failed", file=sys.stderr)
+                    failure = failure or returncode
+                    continue
+                ran += 1
+                for match in _CHANGED_RE.finditer(output):
+                    changed += int(match.group(1))
+                    queued += int(match.group(2))
+                manifest.record(stage)
+                manifest.save()
+                finish(stage)
+
+    if failure:
+        print(f"\nStopped after failure; {len(pending)} stages not started.", file=sys.stderr)
+    else:
+        print(f"\n{ran} stages run, {skipped} up to date, {changed} of {queued} output files changed.")
+    return failure
+
+
+def run_in_process(stages: Sequence[Stage], manifest: Manifest, force: bool = False) -> int:
+    """Run ``stages`` (already in dependency order) inside this interpreter.
+
+    All stages share the manifest's context, so parsed documents and produced
+    artifacts are handed from stage to stage in memory. Files are written once
+    all stages have run (or up to the first failure).
+    """
+    context = manifest.context
+    ran = skipped = 0
+    failure = 0
+
+    for stage in stages:
+        if not force and manifest.is_up_to_date(stage):
+            print(f"\n==> {stage.script} (up to date)")
+            skipped += 1
+            continue
+        print("\n==>", stage.script)
+        try:
+            importlib.import_module(stage.module).run(context)
+        except StageError as exc:
+            print(exc, file=sys.stderr)
+        except Exception:
+            traceback.print_exc()
+        else:
+            ran += 1
+            manifest.record(stage)
+            continue
+        print(f"Script {stage.script} failed", file=sys.stderr)
+        failure = 1
+        break
+
+    changed, queued = context.flush()
+    manifest.save()
+    if not failure:
+        print(f"\n{ran} stages run, {skipped} up to date, {len(changed)} of {queued} output files changed.")
+    return failure
+
+
+def run_profiled(
+    stages: Sequence[Stage],
+    manifest: Manifest,
+    report_path: pathlib.Path,
+    cprofile_dir: Optional[pathlib.Path] = None,
+    top: int = 5,
+) -> int:
+    """Run every stage in its own spawned interpreter and report its resource usage."""
+    from stage_profiler import format_summary, profile_stage, write_report
+
+    spawn = multiprocessing.get_context("spawn")
+    results = []
+    failure = 0
+
+    for stage in stages:
+        print("\n==>", stage.script)
+        sys.stdout.flush()
+        prof_path = str(cprofile_dir / f"{stage.module}.prof") if cprofile_dir else None
+        with ProcessPoolExecutor(max_workers=1, mp_context=spawn) as pool:
+            result = pool.submit(profile_stage, stage.module, prof_path, top).result()
+        result["stage"] = stage.script
+        results.append(result)
+        if result["status"] != "ok":
+            print(result.get("error", ""), file=sys.stderr)
+            print(f"Script {stage.script} failed", file=sys.stderr)
+            failure = 1
+            break
+        manifest.record(stage)
+        manifest.save()
+
+    write_report(report_path, results)
+    print(f"\n{format_summary(results)}")
+    print(f"\n{sum(r.get('files_changed', 0) for r in results)} output files changed.")
+    print(f"\nWrote {report_path}")
+    return failure
+
+
+def reload_scripts() -> None:
+    """Re-import generator modules already loaded, helpers before stages."""
+    stage_modules = {stage.module for stage in STAGES}
+    loaded = [
+        module for module in list(sys.modules.values())
+        if getattr(module, "__file__", None)
+        and os.path.dirname(os.path.abspath(module.__file__)) == os.path.dirname(os.path.abspath(__file__))
+        and module.__name__ != "__main__"
+    ]
+    for module in sorted(loaded, key=lambda m: m.__name__ in stage_modules):
+        importlib.reload(module)
+
+
+def _stat(rel: str) -> Optional[Tuple[int, int]]:
+    try:
+        st = (ROOT / rel).stat()
+    except FileNotFoundError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def watch(run_batch, interval: float, debounce: float) -> None:
+    """Poll the hand-edited inputs and run the stages affected by each change.
+
+    ``run_batch(stages, changed)`` is called once a burst of saves has been
+    quiet for ``debounce`` seconds.
+    """
+    watched = source_inputs()
+    state = {rel: _stat(rel) for rel in watched}
+    print(f"\nWatching {len(watched)} files for changes (Ctrl+C to stop)...")
+    try:
+        while True:
+            time.sleep(interval)
+            changed = set()
+            last_change = 0.0
+            while True:
+                for rel in watched:
+                    current = _stat(rel)
+                    if current != state[rel]:
+                        state[rel] = current
+                        changed.add(rel)
+                        last_change = time.monotonic()
+                if not changed or time.monotonic() - last_change >= debounce:
+                    break
+                time.sleep(interval)
+            if not changed:
+                continue
+            stages = affected_stages(changed)
+            print(f"\nChanged: {', '.join(sorted(changed))}")
+            if stages:
+                run_batch(stages, changed)
+            else:
+                print("No stage reads the changed files.")
+            print("\nWatching for changes...")
+    except KeyboardInterrupt:
+        print()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Refresh all generated artefacts.")
+    parser.add_argument("--force", action="store_true", help="run every stage even if it is up to date")
+    parser.add_argument(
+        "-j", "--jobs", type=int, default=os.cpu_count() or 1,
+        help="maximum number of stages to run at the same time (default: CPU count)",
+    )
+    parser.add_argument(
+        "--in-process", action="store_true",
+        help="import every stage once and run it inside this interpreter",
+    )
+    parser.add_argument("--watch", action="store_true", help="keep running and regenerate on changes")
+    parser.add_argument(
+        "--debounce", type=float, default=0.5,
+        help="seconds without further changes before a watch rebuild starts (default: 0.5)",
+    )
+    parser.add_argument("--profile", action="store_true", help="run every stage once and report its resource usage")
+    parser.add_argument(
+        "--profile-output", type=pathlib.Path, default=ROOT / "pipeline-profile.json",
+        help="where --profile writes its JSON report (default: pipeline-profile.json)",
+    )
+    parser.add_argument("--cprofile-dir", type=pathlib.Path, help="with --profile, write a cProfile .prof per stage here")
+    parser.add_argument(
+        "--profile-top", type=int, default=5,
+        help="with --profile, number of allocation sites to record per stage; 0 disables tracemalloc (default: 5)",
+    )
+    args = parser.parse_args()
+    if args.jobs < 1:
+        parser.error("-j must be at least 1")
+    if args.profile and args.watch:
+        parser.error("--profile cannot be combined with --watch")
+
+    if args.profile:
+        manifest = Manifest(context=Context())
+        sys.exit(run_profiled(STAGES, manifest, args.profile_output, args.cprofile_dir, args.profile_top))
+
+    def run_batch(stages: Sequence[Stage], changed: Sequence[str] = (), force: bool = False) -> int:
+        # A fresh manifest and context per batch so every file is re-read from disk.
+        manifest = Manifest(context=Context())
+        if args.in_process:
+            if any(rel.startswith("scripts/") for rel in changed):
+                reload_scripts()
+            return run_in_process(stages, manifest, force=force)
+        return run_stages(stages, manifest, args.jobs, force=force)
+
+    returncode = run_batch(STAGES, force=args.force)
+    if args.watch:
+        watch(run_batch, interval=0.2, debounce=args.debounce)
+        returncode = 0
+    sys.exit(returncode)
+
+
+if __name__ == "__main__":
+    main()
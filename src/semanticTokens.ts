@@ -2,97 +2,124 @@ import * as vscode from 'vscode';
 import * as fs from 'fs';
 import * as path from 'path';
 
-export function registerSemanticTokens(context: vscode.ExtensionContext, output: vscode.OutputChannel): vscode.Disposable {
-  const extensionRoot = context.extensionPath;
-
-  function readJSON(rel: string) {
-    const abs = path.join(extensionRoot, rel);
-    try {
-      return JSON.parse(fs.readFileSync(abs, 'utf8'));
-    } catch {
-      return {};
-    }
-  }
-
-  const scopesJson = readJSON('scopes.json');
-  const keywords: Record<string, string> = scopesJson.keywords || {};
-  const prefixes: string[] = Object.keys(scopesJson.prefixes || {});
-  const prefixInfo: Record<string, { scope: string; variable: boolean }> = scopesJson.prefixes || {};
-  const scopeArray: string[] = Array.isArray(scopesJson.scopes) ? scopesJson.scopes : [];
-
-  // Prefix maps: variable and non-variable
-  const maxPrefixLen = 6;
-  const prefixMapInfoVar: Record<number, Record<string, string>> = {};
-  const prefixMapInfo: Record<number, Record<string, string>> = {};
-  for (let i = 0; i <= maxPrefixLen; ++i) {
-    prefixMapInfoVar[i] = {};
-    prefixMapInfo[i] = {};
-  }
-  for (const prefix of prefixes) {
-    const { scope, variable } = prefixInfo[prefix];
-    const len = prefix.length;
-    if (variable)
-      prefixMapInfoVar[len][prefix] = scope;
-    else
-      prefixMapInfo[len][prefix] = scope;
+// classifyIdentifier() over the keyword and prefix tables scripts/scope_automaton.py compiles
+// into classifier.json; it returns an index into classifier.scopes, or -1
+export function createIdentifierClassifier(classifier: any): (name: string) => number {
+  const trie = classifier.prefixes || {};
+  const trieColumns = Int32Array.from(trie.columns || []);
+  const trieColumnCount: number = trie.columnCount || 0;
+  const trieNext = Int32Array.from(trie.next || []);
+  const prefixScope = Int32Array.from(trie.scope || []);
+  const variablePrefixScope = Int32Array.from(trie.variableScope || []);
+  const prefixRule = Int32Array.from(trie.rule || []);
+  const prefixRules: Array<{ kind: string; argument: string; scope: number }> = trie.rules || [];
+  const conceptChars = Uint8Array.from(trie.conceptChars || []);
+  const keywordTable = classifier.keywords || {};
+  const keywordSeeds = Int32Array.from(keywordTable.seeds || [0]);
+  const keywordKeys: string[] = keywordTable.keys || [];
+  const keywordScopes = Int32Array.from(keywordTable.scopes || []);
+
+  // Trie states along the identifier; index = prefix length
+  let pathStates = new Int32Array(64);
+
+  function isUpperCase(code: number) {
+    return (code >= 65 && code <= 90) || (code >= 48 && code <= 57) || (code >= 0xc0 && code <= 0xdf);
   }
 
   // Concept valid chars (from C++: "binpfro")
-  const validConceptChars = new Set('binpfro'.split(''));
-  function isUpperCase(ch: string) {
-    const code = ch.charCodeAt(0);
-    return (code >= 65 && code <= 90) || (code >= 48 && code <= 57) || (code >= 0xc0 && code <= 0xdf);
+  function isConceptChar(code: number) {
+    return code < 128 && conceptChars[code] === 1;
   }
 
-  function matchVariablePrefix(identifier: string, prefix: string): boolean {
-    if (!identifier.startsWith(prefix)) return false;
-    const matchLen = prefix.length;
-    const identLen = identifier.length;
-    if (identLen <= matchLen) return false;
-    let ch = identifier[matchLen];
-    if (isUpperCase(ch)) return true;
-    if (!validConceptChars.has(ch)) return false;
-    if (identLen <= matchLen + 1) return false;
-    ch = identifier[matchLen + 1];
-    if (isUpperCase(ch)) return true;
-    return false;
+  function fmix32(h: number) {
+    h ^= h >>> 16;
+    h = Math.imul(h, 0x85ebca6b);
+    h ^= h >>> 13;
+    h = Math.imul(h, 0xc2b2ae35);
+    return (h ^ (h >>> 16)) >>> 0;
   }
 
-  function matchOtherPrefix(identifier: string, prefix: string): boolean {
-    const matchLen = prefix.length;
-    const identLen = identifier.length;
-    if (identLen <= matchLen) return false;
-    return identifier.startsWith(prefix) && isUpperCase(identifier[matchLen]);
-  }
+  // Returns a scope index, or -1
+  function classifyIdentifier(name: string): number {
+    const len = name.length;
+    if (len >= pathStates.length)
+      pathStates = new Int32Array(len * 2);
+
+    // One pass: both keyword hashes (FNV-1a), the trie walk and the underscore check
+    let h1 = 0x811c9dc5;
+    let h2 = 0x050c5d1f;
+    let state = 0;
+    let depth = 0;
+    let hasUnderscore = false;
+    pathStates[0] = 0;
+    for (let i = 0; i < len; ++i) {
+      const code = name.charCodeAt(i);
+      h1 = Math.imul(h1 ^ code, 0x01000193);
+      h2 = Math.imul(h2 ^ code, 0x01000193);
+      if (code === 95)
+        hasUnderscore = true;
+      if (state >= 0) {
+        const column = code < 128 ? trieColumns[code] : -1;
+        state = column >= 0 ? trieNext[state * trieColumnCount + column] || -1 : -1;
+        if (state >= 0)
+          pathStates[++depth] = state;
+      }
+    }
 
-  function classifyIdentifier(name: string): string | undefined {
     // 1. Exact keyword match
-    if (keywords[name])
-      return keywords[name];
+    if (keywordKeys.length) {
+      const seed = keywordSeeds[(h1 >>> 0) % keywordSeeds.length];
+      const slot = seed < 0 ? -seed - 1 : fmix32((h2 ^ seed) >>> 0) % keywordKeys.length;
+      if (keywordKeys[slot] === name)
+        return keywordScopes[slot];
+    }
+
     // 2. Prefix match (longest first)
-    const len = name.length;
-    for (let i = Math.min(maxPrefixLen, len); i >= 0; --i) {
-      const prefix = name.substring(0, i);
-      if (prefixMapInfo[i][prefix]) {
-        if (matchOtherPrefix(name, prefix)) {
-          // Special case for E/CF
-          if (i === 1 && prefix === 'E' && !name.includes('_'))
-            return 'malterlib-enum'; // Enum
-          if (i === 2 && prefix === 'CF' && name.endsWith('Ref'))
-            return 'malterlib-type'; // CoreFoundation type
-          return prefixMapInfo[i][prefix];
+    for (let matchLen = depth; matchLen >= 0; --matchLen) {
+      const s = pathStates[matchLen];
+      if (len <= matchLen)
+        continue;
+      const next = name.charCodeAt(matchLen);
+      if (prefixScope[s] >= 0 && isUpperCase(next)) {
+        const ruleIndex = prefixRule[s];
+        if (ruleIndex >= 0) {
+          const rule = prefixRules[ruleIndex];
+          if (rule.kind === 'noUnderscore' && !hasUnderscore)
+            return rule.scope;
+          if (rule.kind === 'suffix' && name.endsWith(rule.argument))
+            return rule.scope;
         }
+        return prefixScope[s];
       }
-      if (prefixMapInfoVar[i][prefix]) {
-        if (matchVariablePrefix(name, prefix))
-          return prefixMapInfoVar[i][prefix];
+      if (variablePrefixScope[s] >= 0) {
+        if (isUpperCase(next))
+          return variablePrefixScope[s];
+        if (isConceptChar(next) && len > matchLen + 1 && isUpperCase(name.charCodeAt(matchLen + 1)))
+          return variablePrefixScope[s];
       }
     }
-    return undefined;
+    return -1;
+  }
+
+  return classifyIdentifier;
+}
+
+export function registerSemanticTokens(context: vscode.ExtensionContext, output: vscode.OutputChannel): vscode.Disposable {
+  const extensionRoot = context.extensionPath;
+
+  function readJSON(rel: string) {
+    const abs = path.join(extensionRoot, rel);
+    try {
+      return JSON.parse(fs.readFileSync(abs, 'utf8'));
+    } catch {
+      return {};
+    }
   }
 
-  const scopeToIndex = new Map<string, number>();
-  scopeArray.forEach((scope, idx) => scopeToIndex.set(scope, idx));
+  // Keyword and prefix tables compiled by scripts/scope_automaton.py
+  const classifier = readJSON('classifier.json');
+  const scopeArray: string[] = Array.isArray(classifier.scopes) ? classifier.scopes : [];
+  const classifyIdentifier = createIdentifierClassifier(classifier);
 
   const legend = new vscode.SemanticTokensLegend(scopeArray, []);
 
@@ -191,12 +218,9 @@ export function registerSemanticTokens(context: vscode.ExtensionContext, output:
           const end = m.index + ident.length;
           if (isInRegion(start, end))
             continue; // skip if inside comment/string/include
-          const scope = classifyIdentifier(ident);
-          if (scope) {
-            const tokenType = scopeToIndex.get(scope);
-            if (tokenType !== undefined)
-              builder.push(line, m.index, ident.length, tokenType, 0);
-          }
+          const tokenType = classifyIdentifier(ident);
+          if (tokenType >= 0)
+            builder.push(line, m.index, ident.length, tokenType, 0);
         }
       }
       return builder.build();
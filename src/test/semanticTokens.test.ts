@@ -0,0 +1,88 @@
+import * as assert from 'assert';
+import * as fs from 'fs';
+import * as path from 'path';
+
+import { createIdentifierClassifier } from '../semanticTokens';
+
+// Expected scopes from scripts/classifier.py (Classifier.load().classify()), the reference the
+// compiled tables in classifier.json must agree with
+const expected: Array<[string, string | null]> = [
+	// Keywords
+	['mint', 'malterlib-keyword-builtin-integer-types'],
+	['NULL', 'malterlib-keyword-builtin-constants'],
+	['#include', 'malterlib-preprocessor-directive'],
+	['[[', 'malterlib-keyword-property-modifiers-brackets'],
+	['memory_order', 'malterlib-enum'],
+	['CFStr', 'malterlib-type'],
+
+	// Prefixes
+	['NFoo', 'malterlib-namespace'],
+	['CFoo', 'malterlib-type'],
+	['TCVector', 'malterlib-template-type'],
+	['ICInterface', 'malterlib-type-interface'],
+	['fg_Function', 'malterlib-function'],
+	['gc_Value', 'malterlib-global-constant'],
+	['t_TType', 'malterlib-template-non-type-param'],
+	['CFStrName', 'malterlib-type'],
+	['CF', 'malterlib-type'],
+
+	// Variable prefixes, with and without a concept char
+	['m_Value', 'malterlib-member-variable-public'],
+	['ms_Instance', 'malterlib-member-static-variable-public'],
+	['_Param', 'malterlib-function-parameter'],
+	['p_Pack', 'malterlib-function-parameter-pack'],
+	['_fCallback', 'malterlib-function-parameter-functor'],
+	['m_fFunctor', 'malterlib-member-variable-public-functor'],
+	['fLocal', 'malterlib-variable-functor'],
+
+	// Digits count as uppercase after a prefix
+	['N0', 'malterlib-namespace'],
+	['C2DPoint', 'malterlib-type'],
+
+	// E: enum without an underscore, enumerator with one
+	['ETest', 'malterlib-enum'],
+	['ETest_Value', 'malterlib-enumerator'],
+	['E_Test', 'malterlib-variable'],
+	['Etest', 'malterlib-variable'],
+
+	// CF: function unless it ends in Ref
+	['CFString', 'malterlib-function'],
+	['CFStringRef', 'malterlib-type'],
+	['CFRef', 'malterlib-type'],
+	['CFStrx', 'malterlib-function'],
+
+	// U+00C0-U+00DF count as uppercase, U+00E0 and above do not
+	['CÀ', 'malterlib-type'],
+	['CÉcole', 'malterlib-type'],
+	['NÞName', 'malterlib-namespace'],
+	['Cà', 'malterlib-variable'],
+
+	// Unclassified
+	['foo', null],
+	['Nfoo', 'malterlib-variable'],
+	['x', null],
+	['', null],
+];
+
+suite('Semantic Tokens Test Suite', () => {
+	const classifier = JSON.parse(fs.readFileSync(path.join(__dirname, '..', '..', 'classifier.json'), 'utf8'));
+	const scopes: string[] = classifier.scopes;
+	const classifyIdentifier = createIdentifierClassifier(classifier);
+
+	function classify(name: string): string | null {
+		const index = classifyIdentifier(name);
+		return index >= 0 ? scopes[index] : null;
+	}
+
+	for (const [name, scope] of expected) {
+		test(`classifies ${JSON.stringify(name)}`, () => {
+			assert.strictEqual(classify(name), scope);
+		});
+	}
+
+	test('classifies the same identifier repeatedly', () => {
+		const name = 'C' + 'x'.repeat(200);
+		assert.strictEqual(classify(name), 'malterlib-variable');
+		assert.strictEqual(classify('CFStringRef'), 'malterlib-type');
+	});
+});